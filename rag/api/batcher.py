@@ -0,0 +1,101 @@
+import asyncio
+
+class QueueTimeout(Exception):
+    """A requisição esperou na fila mais que max_queue_ms e foi rejeitada."""
+
+class QueryBatcher:
+    """Agrupa requisições concorrentes em lotes (micro-batching).
+
+    As requisições que chegam dentro de uma janela de max_wait_ms (ou até
+    max_batch_size) são processadas juntas por run_batch, executada em uma
+    thread para não bloquear o event loop. Enquanto um lote é processado, o
+    próximo é acumulado. max_wait_ms limita apenas a janela de agrupamento:
+    sob carga, uma requisição também espera os lotes que já estão em
+    execução. Com max_queue_ms, requisições que esperaram mais que isso
+    quando seu lote começaria são rejeitadas com QueueTimeout, limitando a
+    espera na fila.
+    """
+
+    def __init__(self, run_batch, max_batch_size=32, max_wait_ms=5.0, max_queue_ms=0.0):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item):
+        """Enfileira um item e aguarda o resultado do lote em que ele entrar."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((item, future, self._loop.time()))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _reject_expired(self, batch):
+        """Remove do lote as requisições que esperaram mais que max_queue_ms."""
+        if not self.max_queue:
+            return batch
+        now = self._loop.time()
+        kept = []
+        for item, future, enqueued in batch:
+            if now - enqueued <= self.max_queue:
+                kept.append((item, future, enqueued))
+            elif not future.done():
+                self.rejected += 1
+                future.set_exception(QueueTimeout(f"{(now - enqueued) * 1000:.0f} ms na fila"))
+        return kept
+
+    async def _run(self):
+        while True:
+            batch = self._reject_expired(await self._collect())
+            if not batch:
+                continue
+            items = [item for item, _, _ in batch]
+            try:
+                results = await self._loop.run_in_executor(None, self.run_batch, items)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_queue_ms": self.max_queue * 1000,
+            "rejected": self.rejected,
+        }
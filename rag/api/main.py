@@ -1,95 +1,420 @@
-from fastapi import FastAPI
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List
+import torch
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import faiss
-import pickle
 from sentence_transformers import SentenceTransformer
+from chunk_store import ChunkStore
+from vector_index import load_reranker, read_index, search
+from stats import compute_stats, load_stats
+from lookup import LookupIndex
+from index_versions import current_version, version_dir
+from api.query_cache import QueryEmbeddingCache
+from api.batcher import QueryBatcher, QueueTimeout
+from api.metrics import Metrics, RequestTimer
 
-INDEX_DIR = "index"
-MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+INDEX_DIR = os.environ.get("RAG_INDEX_DIR", "index")
+MODEL_NAME = os.environ.get("RAG_MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+QUERY_CACHE_SIZE = 1024  # Perguntas com embedding em cache (LRU)
+BATCH_MAX_SIZE = int(os.environ.get("RAG_BATCH_MAX_SIZE", "32"))              # Máximo de perguntas de /ask agrupadas em um lote
+BATCH_MAX_WAIT_MS = float(os.environ.get("RAG_BATCH_MAX_WAIT_MS", "5"))        # Janela de agrupamento de um lote
+BATCH_MAX_QUEUE_MS = float(os.environ.get("RAG_BATCH_MAX_QUEUE_MS", "1000"))  # Espera máxima na fila antes do 503 (0 = sem limite)
+TIMING_HEADERS = os.environ.get("RAG_TIMING_HEADERS") == "1"  # Cabeçalho Server-Timing em cada resposta
+REQUEST_LOG = os.environ.get("RAG_REQUEST_LOG", "1") == "1"    # Log JSON por requisição, com os IDs dos chunks
+TORCH_THREADS = int(os.environ.get("RAG_TORCH_THREADS", "0"))  # Threads do torch por worker (0 = padrão do torch)
+INDEX_POLL_SECONDS = float(os.environ.get("RAG_INDEX_POLL_SECONDS", "5"))  # Intervalo de verificação de nova versão (0 = não verifica)
+WARMUP_QUESTION = "apartamento com garagem em São Paulo"
 
-app = FastAPI()
-model = SentenceTransformer(MODEL_NAME)
-index = faiss.read_index(f"{INDEX_DIR}/faiss.index")
-with open(f"{INDEX_DIR}/chunks.pkl", "rb") as f:
-    chunks = pickle.load(f)
+metrics = Metrics()
+metrics.describe("rag_requests_total", "counter", "Requisições respondidas, por endpoint")
+metrics.describe("rag_questions_total", "counter", "Perguntas respondidas, por endpoint e tipo de busca")
+metrics.describe("rag_results_total", "counter", "Resultados retornados, por endpoint")
+metrics.describe("rag_request_seconds", "histogram", "Latência das requisições (do início do handler à resposta serializada)")
+metrics.describe("rag_stage_seconds", "histogram", "Latência por etapa: queue, lookup, encode, search, filter, serialize")
+metrics.describe("rag_search_hits_total", "counter", "Vizinhos retornados pela busca vetorial")
+metrics.describe("rag_search_hits_discarded_total", "counter",
+                 "Vizinhos descartados após a busca (chunk removido ou grupo sem ocorrência que atenda aos filtros)")
+metrics.describe("rag_index_vectors", "gauge", "Vetores no índice FAISS")
+metrics.describe("rag_index_chunks", "gauge", "Chunks no chunk store")
+metrics.describe("rag_index_size_bytes", "gauge", "Tamanho em disco do diretório do índice")
+metrics.describe("rag_load_seconds", "gauge", "Tempo de carga do modelo, do índice e do chunk store")
+metrics.describe("rag_ready", "gauge", "1 quando o carregamento terminou e a API aceita perguntas")
+metrics.describe("rag_batch_rejected_total", "counter", "Perguntas de /ask rejeitadas (503) por esperar demais na fila")
+metrics.describe("rag_index_swaps_total", "counter", "Trocas de versão do índice, por resultado (ok ou erro)")
 
-class Question(BaseModel):
-    question: str
+logger = logging.getLogger("rag.api")
+if REQUEST_LOG and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+class IndexSnapshot:
+    """Índice FAISS, reranker, chunk store e lookup de uma versão do índice.
+
+    O índice FAISS e as colunas e textos do chunk store são mapeados em
+    memória somente leitura: com vários workers do uvicorn, todos usam as
+    mesmas páginas do page cache.
+    """
+
+    def __init__(self, root):
+        self.version = current_version(root)
+        self.dir = version_dir(root, self.version) if self.version else root
+        self.index = read_index(self.dir)
+        self.reranker = load_reranker(self.dir)
+        self.chunks = ChunkStore(self.dir)
+        self.lookup = LookupIndex.load(self.dir, self.chunks)
+        self.size_bytes = sum(os.path.getsize(os.path.join(self.dir, f)) for f in os.listdir(self.dir)
+                              if os.path.isfile(os.path.join(self.dir, f)))
+        self._stats = None
+
+    def stats(self):
+        if self._stats is None:
+            # Índices antigos, sem snapshot: calcular uma vez a partir do chunk store
+            self._stats = load_stats(self.dir) or compute_stats(self.chunks)
+        return self._stats
+
+# Carregados em segundo plano ao iniciar a API (ver load_resources). Cada
+# requisição lê `current` uma única vez e usa essa versão até responder; a
+# troca de versão apenas substitui a referência, então requisições em
+# andamento terminam na versão anterior, liberada quando deixa de ser usada.
+model = None
+current = None
+query_cache = None
+_ready = threading.Event()
+_load_state = {"seconds": None, "error": None, "failed_version": None}
+metrics.set("rag_ready", 0)
+
+def set_index_metrics(snapshot):
+    metrics.set("rag_index_vectors", snapshot.index.ntotal)
+    metrics.set("rag_index_chunks", len(snapshot.chunks))
+    metrics.set("rag_index_size_bytes", snapshot.size_bytes)
+
+def load_resources():
+    """Carrega o índice, o chunk store e o modelo, e aquece o modelo.
+
+    Cada worker guarda apenas o modelo e as tabelas pequenas (leilões,
+    lookup, cache de perguntas); o restante é compartilhado pelo page cache.
+    """
+    global model, current, query_cache
+    start = time.perf_counter()
+    try:
+        if TORCH_THREADS:
+            torch.set_num_threads(TORCH_THREADS)
+        current = IndexSnapshot(INDEX_DIR)
+        model = SentenceTransformer(MODEL_NAME)
+        query_cache = QueryEmbeddingCache(model.encode, QUERY_CACHE_SIZE)
+        # Aquecimento: a primeira pergunta não paga a inicialização do modelo
+        model.encode([WARMUP_QUESTION])
+    except Exception as e:
+        _load_state["error"] = str(e)
+        print(f"[ERRO] Falha ao carregar a API: {e}")
+        return
+
+    _load_state["seconds"] = time.perf_counter() - start
+    metrics.set("rag_load_seconds", _load_state["seconds"])
+    set_index_metrics(current)
+    metrics.set("rag_ready", 1)
+    _ready.set()
+    print(f"[INFO] API pronta em {_load_state['seconds']:.2f}s (pid {os.getpid()}, versão {current.version}, "
+          f"{current.index.ntotal} vetores)")
+
+def swap_index():
+    """Carrega a versão apontada por CURRENT, se mudou, e passa a servi-la.
+
+    A nova versão é carregada inteira antes da troca; se a carga falhar, a
+    versão atual continua sendo servida e a nova não é tentada de novo.
+    Retorna True se a versão foi trocada.
+    """
+    global current
+    version = current_version(INDEX_DIR)
+    if version is None or version == current.version or version == _load_state["failed_version"]:
+        return False
+    start = time.perf_counter()
+    try:
+        snapshot = IndexSnapshot(INDEX_DIR)
+    except Exception as e:
+        _load_state["failed_version"] = version
+        metrics.inc("rag_index_swaps_total", result="erro")
+        print(f"[ERRO] Falha ao carregar a versão {version} do índice: {e}")
+        return False
+    previous, current = current, snapshot
+    set_index_metrics(snapshot)
+    metrics.inc("rag_index_swaps_total", result="ok")
+    print(f"[INFO] Índice trocado: versão {previous.version} -> {snapshot.version} "
+          f"({snapshot.index.ntotal} vetores, carregada em {time.perf_counter() - start:.2f}s)")
+    return True
+
+def watch_index(stop):
+    """Verifica CURRENT a cada INDEX_POLL_SECONDS e troca o índice quando há uma nova versão."""
+    _ready.wait()
+    while not stop.wait(INDEX_POLL_SECONDS):
+        try:
+            swap_index()
+        except Exception as e:
+            print(f"[ERRO] Falha ao verificar nova versão do índice: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    # O servidor aceita conexões (e responde /ready) enquanto carrega
+    threading.Thread(target=load_resources, name="load_resources", daemon=True).start()
+    stop = threading.Event()
+    if INDEX_POLL_SECONDS > 0:
+        threading.Thread(target=watch_index, args=(stop,), name="watch_index", daemon=True).start()
+    yield
+    stop.set()
+
+def require_ready():
+    """Versão do índice que a requisição vai usar (503 enquanto a API carrega)."""
+    if not _ready.is_set():
+        detail = f"Falha no carregamento: {_load_state['error']}" if _load_state["error"] else "API carregando"
+        raise HTTPException(status_code=503, detail=detail)
+    return current
+
+app = FastAPI(lifespan=lifespan)
+
+class Filters(BaseModel):
     top_k: int = 5
     filter_cidade: str = None
     filter_tipo_imovel: str = None
+    filter_bairro: str = None
     max_preco: float = None
 
-@app.post("/ask")
-def ask(q: Question):
-    query_vec = model.encode([q.question])
-    D, I = index.search(query_vec, q.top_k * 2)  # Buscar mais para filtrar depois
-    
+class Question(Filters):
+    question: str
+
+class BatchQuestion(Filters):
+    questions: List[str]
+
+def filter_mask(snapshot, q):
+    # Filtros aplicados dentro da busca: sempre retornam até top_k resultados válidos
+    return snapshot.chunks.filter_mask(
+        cidade=q.filter_cidade,
+        tipo_imovel=q.filter_tipo_imovel,
+        bairro=q.filter_bairro,
+        max_preco=q.max_preco,
+    )
+
+def filters_applied(q):
+    return {
+        "cidade": q.filter_cidade,
+        "tipo_imovel": q.filter_tipo_imovel,
+        "bairro": q.filter_bairro,
+        "max_preco": q.max_preco
+    }
+
+def collect_results(snapshot, ids, mask=None):
+    # Cada vetor representa um grupo de quase duplicatas: exibe o chunk do
+    # grupo que atende aos filtros (as demais ocorrências vão em "refs")
     results = []
-    for idx in I[0]:
-        chunk = chunks[idx]
-        
-        # Aplicar filtros se especificados
-        if q.filter_cidade and chunk.get('cidade', '').lower() != q.filter_cidade.lower():
-            continue
-        if q.filter_tipo_imovel and chunk.get('tipo_imovel', '').lower() != q.filter_tipo_imovel.lower():
-            continue
-        if q.max_preco and chunk.get('preco'):
-            try:
-                preco = float(chunk['preco'])
-                if preco > q.max_preco:
-                    continue
-            except:
-                pass
-        
-        results.append(chunk)
-        
-        # Parar quando atingir o número desejado de resultados
-        if len(results) >= q.top_k:
-            break
+    for idx in ids:
+        chunk = snapshot.chunks.resolve(idx, mask) if idx >= 0 else None
+        if chunk is not None:
+            results.append(chunk)
+    return results
+
+def vector_results(snapshot, ids, mask=None):
+    """collect_results para os IDs da busca vetorial, contando os vizinhos descartados."""
+    results = collect_results(snapshot, ids, mask)
+    hits = int((ids >= 0).sum())
+    metrics.inc("rag_search_hits_total", hits)
+    metrics.inc("rag_search_hits_discarded_total", hits - len(results))
+    return results
+
+def exact_lookup(snapshot, question, q):
+    """Busca exata (código do imóvel, endereço, bairro), sem passar pelo modelo.
+
+    Retorna (tipo da busca, resultados) ou None se a pergunta não é uma
+    busca exata.
+    """
+    match = snapshot.lookup.match(question)
+    if match is None:
+        return None
+    kind, leilao_ids = match
+    # O chunk do próprio leilão (chunk_ids já aplica os filtros), nunca o
+    # representante do grupo de quase duplicatas, que pode ser de outro leilão
+    ids = snapshot.lookup.chunk_ids(leilao_ids, filter_mask(snapshot, q), q.top_k)
+    return kind, [chunk for chunk in map(snapshot.chunks.get, ids) if chunk is not None]
+
+def answer_questions(items):
+    """Responde um lote de perguntas de /ask.
+
+    items são pares (pergunta, versão do índice da requisição). Todas as
+    perguntas são codificadas em um único forward pass; perguntas com a mesma
+    versão e os mesmos filtros compartilham uma única busca multi-query.
+    Retorna, para cada pergunta, (resultados, segundos por etapa do seu grupo).
+    """
+    questions = [q for q, _ in items]
+    start = time.perf_counter()
+    query_vecs = query_cache.encode([q.question for q in questions])
+    encode_time = time.perf_counter() - start
     
-    return {
+    groups = {}
+    for i, (q, snapshot) in enumerate(items):
+        key = (id(snapshot), q.filter_cidade, q.filter_tipo_imovel, q.filter_bairro, q.max_preco)
+        groups.setdefault(key, []).append(i)
+    
+    answers = [None] * len(questions)
+    for positions in groups.values():
+        first, snapshot = items[positions[0]]
+        top_k = max(questions[i].top_k for i in positions)
+        t0 = time.perf_counter()
+        mask = filter_mask(snapshot, first)
+        vector_mask = snapshot.chunks.vector_mask(mask)
+        t1 = time.perf_counter()
+        D, I = search(snapshot.index, query_vecs[positions], top_k, vector_mask, snapshot.reranker)
+        t2 = time.perf_counter()
+        group_results = [vector_results(snapshot, ids[:questions[i].top_k], mask) for i, ids in zip(positions, I)]
+        t3 = time.perf_counter()
+        timings = {"encode": encode_time, "search": t2 - t1, "filter": (t1 - t0) + (t3 - t2)}
+        for i, results in zip(positions, group_results):
+            answers[i] = (results, timings)
+    return answers
+
+def respond(endpoint, payload, timer, answered):
+    """Serializa a resposta e registra métricas, cabeçalho de tempos e log.
+
+    answered é a lista de (pergunta, tipo de busca exata ou None, resultados).
+    """
+    with timer.stage("serialize"):
+        response = JSONResponse(payload)
+    total = timer.total()
+
+    metrics.inc("rag_requests_total", endpoint=endpoint)
+    metrics.observe("rag_request_seconds", total, endpoint=endpoint)
+    for stage, seconds in timer.stages.items():
+        metrics.observe("rag_stage_seconds", seconds, endpoint=endpoint, stage=stage)
+    for _, kind, results in answered:
+        metrics.inc("rag_questions_total", endpoint=endpoint, lookup=kind or "vetorial")
+        metrics.inc("rag_results_total", len(results), endpoint=endpoint)
+
+    if TIMING_HEADERS:
+        response.headers["Server-Timing"] = timer.server_timing()
+    if REQUEST_LOG:
+        logger.info(json.dumps({
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "endpoint": endpoint,
+            "filters": {k: v for k, v in payload["filters_applied"].items() if v is not None},
+            "questions": [{"question": question, "lookup": kind, "chunk_ids": [r["chunk_id"] for r in results]}
+                          for question, kind, results in answered],
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in timer.stages.items()},
+            "total_ms": round(total * 1000, 3),
+        }, ensure_ascii=False))
+    return response
+
+batcher = QueryBatcher(answer_questions, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, BATCH_MAX_QUEUE_MS)
+
+@app.post("/ask")
+async def ask(q: Question):
+    snapshot = require_ready()
+    timer = RequestTimer()
+    # Buscas exatas são respondidas direto, sem entrar no lote do modelo
+    with timer.stage("lookup"):
+        exact = exact_lookup(snapshot, q.question, q)
+    if exact:
+        kind, results = exact
+    else:
+        submitted = time.perf_counter()
+        try:
+            results, stages = await batcher.submit((q, snapshot))
+        except QueueTimeout as e:
+            # Sobrecarga: rejeitar em vez de deixar a latência crescer sem limite
+            metrics.inc("rag_batch_rejected_total")
+            raise HTTPException(status_code=503, detail=f"Fila de perguntas cheia ({e})")
+        for stage, seconds in stages.items():
+            timer.add(stage, seconds)
+        # Espera na fila do micro-batching (e pelas demais perguntas do lote)
+        timer.add("queue", max(0.0, time.perf_counter() - submitted - sum(stages.values())))
+        kind = None
+    
+    payload = {
         "question": q.question,
         "total_results": len(results),
-        "filters_applied": {
-            "cidade": q.filter_cidade,
-            "tipo_imovel": q.filter_tipo_imovel,
-            "max_preco": q.max_preco
-        },
+        "filters_applied": filters_applied(q),
+        "lookup": kind,
+        "index_version": snapshot.version,
         "results": results
     }
+    return respond("/ask", payload, timer, [(q.question, kind, results)])
 
-@app.get("/stats")
-def get_stats():
-    """Endpoint para obter estatísticas do índice."""
-    tipos_imoveis = {}
-    cidades = {}
-    precos = []
+@app.post("/ask/batch")
+def ask_batch(q: BatchQuestion):
+    """Várias perguntas com os mesmos filtros: um forward pass e uma busca.
+
+    Perguntas que são buscas exatas não entram no forward pass.
+    """
+    snapshot = require_ready()
+    timer = RequestTimer()
+    if not q.questions:
+        payload = {"total_questions": 0, "filters_applied": filters_applied(q), "index_version": snapshot.version,
+                   "answers": []}
+        return respond("/ask/batch", payload, timer, [])
     
-    for chunk in chunks:
-        if chunk.get('tipo_imovel'):
-            tipo = chunk['tipo_imovel']
-            tipos_imoveis[tipo] = tipos_imoveis.get(tipo, 0) + 1
-        
-        if chunk.get('cidade'):
-            cidade = chunk['cidade']
-            cidades[cidade] = cidades.get(cidade, 0) + 1
-        
-        if chunk.get('preco'):
-            try:
-                preco = float(chunk['preco'])
-                precos.append(preco)
-            except:
-                pass
+    with timer.stage("lookup"):
+        exact = [exact_lookup(snapshot, question, q) for question in q.questions]
+    pending = [i for i, e in enumerate(exact) if e is None]
+    found = {i: e for i, e in enumerate(exact) if e is not None}
+    if pending:
+        with timer.stage("encode"):
+            query_vecs = query_cache.encode([q.questions[i] for i in pending])
+        with timer.stage("filter"):
+            mask = filter_mask(snapshot, q)
+            vector_mask = snapshot.chunks.vector_mask(mask)
+        with timer.stage("search"):
+            D, I = search(snapshot.index, query_vecs, q.top_k, vector_mask, snapshot.reranker)
+        with timer.stage("filter"):
+            for i, ids in zip(pending, I):
+                found[i] = (None, vector_results(snapshot, ids, mask))
     
-    return {
-        "total_chunks": len(chunks),
-        "tipos_imoveis": dict(sorted(tipos_imoveis.items(), key=lambda x: x[1], reverse=True)),
-        "cidades": dict(sorted(cidades.items(), key=lambda x: x[1], reverse=True)),
-        "preco_stats": {
-            "min": min(precos) if precos else 0,
-            "max": max(precos) if precos else 0,
-            "avg": sum(precos) / len(precos) if precos else 0,
-            "total_com_preco": len(precos)
-        }
+    answers = []
+    answered = []
+    for i, question in enumerate(q.questions):
+        kind, results = found[i]
+        answers.append({"question": question, "total_results": len(results), "lookup": kind, "results": results})
+        answered.append((question, kind, results))
+    
+    payload = {
+        "total_questions": len(q.questions),
+        "filters_applied": filters_applied(q),
+        "index_version": snapshot.version,
+        "answers": answers
     }
+    return respond("/ask/batch", payload, timer, answered)
+
+@app.get("/ready")
+def get_ready():
+    """Prontidão: 200 depois que modelo, índice e chunk store foram carregados, 503 antes."""
+    if not _ready.is_set():
+        return JSONResponse({"ready": False, "error": _load_state["error"]}, status_code=503)
+    snapshot = current
+    return {"ready": True, "load_seconds": _load_state["seconds"], "pid": os.getpid(), "index_version": snapshot.version,
+            "vectors": snapshot.index.ntotal}
+
+@app.get("/metrics")
+def get_metrics():
+    """Métricas no formato texto do Prometheus."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Tamanho e acertos do cache de embeddings de perguntas e do micro-batching."""
+    require_ready()
+    return {**query_cache.stats(), "batching": batcher.stats()}
+
+@app.get("/stats")
+def get_stats():
+    """Endpoint para obter estatísticas do índice.
+
+    Serve o snapshot gerado na indexação da versão ativa do índice (None em
+    "index_version" para índices sem versões).
+    """
+    snapshot = require_ready()
+    return {"index_version": snapshot.version, **snapshot.stats()}
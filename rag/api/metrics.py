@@ -0,0 +1,110 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Limites dos buckets dos histogramas de latência, em segundos
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """Contagens acumuladas por bucket, soma e total de observações."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """Registro de métricas no formato texto do Prometheus.
+
+    Contadores, gauges e histogramas são identificados pelo nome e pelos
+    rótulos (keyword arguments). Cada métrica precisa ser declarada com
+    describe() antes de ser usada.
+    """
+
+    def __init__(self):
+        self._help = {}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text):
+        """Declara uma métrica: kind é "counter", "gauge" ou "histogram"."""
+        self._help[name] = (kind, help_text)
+        self._values.setdefault(name, {})
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[name][key] = self._values[name].get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[name][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._values[name].get(key)
+            if histogram is None:
+                histogram = self._values[name][key] = Histogram()
+            histogram.observe(value)
+
+    def render(self):
+        """Texto servido em /metrics."""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in self._help.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._values[name].items()):
+                    if kind != "histogram":
+                        lines.append(f"{name}{_label_text(labels)} {_format_value(value)}")
+                        continue
+                    for bound, count in zip(value.buckets, value.counts):
+                        lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {count}")
+                    lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {value.count}")
+                    lines.append(f"{name}_sum{_label_text(labels)} {_format_value(value.sum)}")
+                    lines.append(f"{name}_count{_label_text(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+class RequestTimer:
+    """Tempo de cada etapa de uma requisição, em segundos."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def total(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """Valor do cabeçalho Server-Timing (durações em ms)."""
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.total() * 1000:.2f}")
+        return ", ".join(parts)
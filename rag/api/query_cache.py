@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+def normalize_question(question):
+    """Normaliza a pergunta para a chave do cache (minúsculas, espaços simples)."""
+    return " ".join(question.lower().split())
+
+class QueryEmbeddingCache:
+    """Cache LRU de pergunta normalizada -> embedding, com limite de tamanho.
+
+    As perguntas ausentes são codificadas juntas, em um único forward pass.
+    """
+
+    def __init__(self, encode, maxsize=1024):
+        self._encode = encode
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, questions):
+        """Retorna os embeddings das perguntas (uma linha por pergunta)."""
+        keys = [normalize_question(q) for q in questions]
+        vectors = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    vectors[key] = self._entries[key]
+            missing = list(dict.fromkeys(k for k in keys if k not in vectors))
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            encoded = np.asarray(self._encode(missing), dtype=np.float32)
+            with self._lock:
+                for key, vector in zip(missing, encoded):
+                    vectors[key] = vector
+                    self._entries[key] = vector
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        return np.stack([vectors[k] for k in keys])
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -1,61 +1,188 @@
-import faiss
-import pickle
+import sys
+import time
+import argparse
 import torch
 from transformers import AutoModel, AutoTokenizer
-import numpy as np
+from chunk_store import ChunkStore
+from lookup import LookupIndex
+from index_versions import resolve_index_dir
+from ingest import get_embedding as embed_texts, prepare_tokenizer
+from vector_index import load_reranker, read_index, search as search_index
 
 INDEX_DIR = "index"
 MODEL_NAME = "deepseek-ai/deepseek-coder-1.3b-base"
+TOP_K = 10
 
-# Carregar modelo e tokenizer globalmente (mais eficiente)
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModel.from_pretrained(MODEL_NAME)
+class QueryEngine:
+    """Motor de consultas de longa duração.
+
+    Carrega o modelo, o índice FAISS (mapeado em memória) e o chunk store uma
+    única vez e responde a quantas perguntas forem necessárias.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR, model_name=MODEL_NAME, num_threads=None):
+        start = time.perf_counter()
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.tokenizer = prepare_tokenizer(AutoTokenizer.from_pretrained(model_name))
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+        index_dir = resolve_index_dir(index_dir)
+        self.index = read_index(index_dir)
+        self.reranker = load_reranker(index_dir)
+        self.chunks = ChunkStore(index_dir)
+        self.lookup = LookupIndex.load(index_dir, self.chunks)
+        self.load_time = time.perf_counter() - start
+
+    def embed(self, queries):
+        """Gera os embeddings de várias perguntas em lote."""
+        return embed_texts(queries, self.model, self.tokenizer, verbose=False)
+
+    def search_vectors(self, query_vecs, top_k=TOP_K):
+        """Busca os vizinhos de vários vetores de uma vez."""
+        _, I = search_index(self.index, query_vecs, top_k, reranker=self.reranker)
+        results = []
+        for row in I:
+            hits = []
+            for idx in row:
+                # -1 indica vizinho inexistente; None indica chunk removido na indexação incremental
+                if idx < 0:
+                    continue
+                chunk = self.chunks.resolve(idx)
+                if chunk is not None:
+                    hits.append(chunk)
+            results.append(hits)
+        return results
+
+    def search_batch(self, queries, top_k=TOP_K):
+        """Responde várias perguntas com um único embedding em lote.
+
+        Perguntas que são buscas exatas (código do imóvel, endereço, bairro)
+        são respondidas pelo índice de lookup, sem passar pelo modelo.
+        Retorna (resultados por pergunta, tempos em segundos por etapa).
+        """
+        t0 = time.perf_counter()
+        results = [None] * len(queries)
+        for i, query in enumerate(queries):
+            match = self.lookup.match(query)
+            if match:
+                results[i] = [self.chunks[idx] for idx in self.lookup.chunk_ids(match[1], top_k=top_k)]
+        pending = [i for i, r in enumerate(results) if r is None]
+        t1 = time.perf_counter()
+        timings = {"lookup": t1 - t0}
+        if pending:
+            query_vecs = self.embed([queries[i] for i in pending])
+            t2 = time.perf_counter()
+            for i, hits in zip(pending, self.search_vectors(query_vecs, top_k)):
+                results[i] = hits
+            timings.update(embed=t2 - t1, search=time.perf_counter() - t2)
+        return results, timings
+
+    def search(self, query, top_k=TOP_K):
+        """Responde uma pergunta. Retorna (resultados, tempos por etapa)."""
+        results, timings = self.search_batch([query], top_k)
+        return results[0], timings
+
+    def close(self):
+        self.chunks.close()
+
+_engine = None
+
+def get_engine():
+    """Retorna o motor de consultas padrão, criando-o na primeira chamada."""
+    global _engine
+    if _engine is None:
+        _engine = QueryEngine()
+    return _engine
 
 def get_embedding(text):
     """Gera embedding usando DeepSeek"""
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    # Usar mean pooling do último hidden state
-    embeddings = outputs.last_hidden_state.mean(dim=1)
-    return embeddings.numpy()
-
-def search(query, top_k=10):
-    index = faiss.read_index(f"{INDEX_DIR}/faiss.index")
-    with open(f"{INDEX_DIR}/chunks.pkl", "rb") as f:
-        chunks = pickle.load(f)
-    
-    query_vec = get_embedding(query)
-    D, I = index.search(query_vec, top_k)
-    
-    results = []
-    for idx in I[0]:
-        results.append(chunks[idx])
-    return results
+    return get_engine().embed([text])
+
+def search(query, top_k=TOP_K):
+    return get_engine().search(query, top_k)[0]
 
 def format_result(chunk):
     """Formata um resultado de busca de forma mais legível."""
     header = f"[{chunk['doc_id']} - pág. {chunk['page']}]"
-    
+
     if chunk.get('codigo_zuk'):
         header += f" Código: {chunk['codigo_zuk']}"
-    
+
     if chunk.get('preco'):
         header += f" | Preço: R$ {chunk['preco']}"
-    
+
     if chunk.get('cidade') and chunk.get('bairro'):
         header += f" | {chunk['cidade']} - {chunk['bairro']}"
-    
+
     text_preview = chunk['text'][:300] + "..." if len(chunk['text']) > 300 else chunk['text']
-    
+
     return f"{header}\n{text_preview}\n{'-'*80}"
 
-if __name__ == "__main__":
-    q = input("Digite sua pergunta: ")
-    hits = search(q)
-    print(f"\n=== Resultados para: '{q}' ===\n")
-    
+def format_timings(timings):
+    return " | ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in timings.items())
+
+def print_results(question, hits, timings):
+    """Exibe os resultados de uma pergunta e a latência de cada etapa."""
+    start = time.perf_counter()
+    output = [f"\n=== Resultados para: '{question}' ===\n"]
     for i, h in enumerate(hits, 1):
-        print(f"RESULTADO {i}:")
-        print(format_result(h))
-        print()
\ No newline at end of file
+        output.append(f"RESULTADO {i}:")
+        output.append(format_result(h))
+        output.append("")
+    print("\n".join(output))
+    timings = dict(timings, format=time.perf_counter() - start)
+    print(f"[TEMPO] {format_timings(timings)}")
+
+def run_repl(engine, top_k=TOP_K):
+    """Modo interativo: responde perguntas até uma linha vazia, 'sair' ou EOF."""
+    while True:
+        try:
+            q = input("Digite sua pergunta: ").strip()
+        except EOFError:
+            break
+        if not q or q.lower() == "sair":
+            break
+        hits, timings = engine.search(q, top_k)
+        print_results(q, hits, timings)
+
+def run_batch(engine, questions, top_k=TOP_K):
+    """Modo em lote: todas as perguntas são codificadas juntas."""
+    if not questions:
+        print("[AVISO] Nenhuma pergunta encontrada.")
+        return
+    results, timings = engine.search_batch(questions, top_k)
+    print(f"[INFO] {len(questions)} perguntas: {format_timings(timings)}")
+    # Tempos por pergunta amortizados sobre o lote
+    per_query = {stage: seconds / len(questions) for stage, seconds in timings.items()}
+    for q, hits in zip(questions, results):
+        print_results(q, hits, per_query)
+
+def read_questions(path):
+    """Lê uma pergunta por linha de um arquivo ('-' para stdin)."""
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Consulta semântica nos editais de leilões")
+    parser.add_argument("--batch", metavar="ARQUIVO",
+                        help="Responde as perguntas do arquivo (uma por linha; '-' para stdin) em lote")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="Resultados por pergunta")
+    parser.add_argument("--threads", type=int, default=None, help="Número de threads do torch em CPU")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    engine = QueryEngine(num_threads=args.threads)
+    print(f"[INFO] Modelo, índice e chunks carregados em {engine.load_time:.2f}s "
+          f"({engine.index.ntotal} vetores)")
+
+    if args.batch:
+        run_batch(engine, read_questions(args.batch), args.top_k)
+    else:
+        run_repl(engine, args.top_k)
+    engine.close()
@@ -0,0 +1,151 @@
+import json
+import time
+import argparse
+import faiss
+import numpy as np
+from chunk_store import ChunkStore
+from index_versions import resolve_index_dir
+from vector_index import (COMPRESSED_TYPES, INDEX_TYPES, RERANK_FACTOR, Reranker, build_index, index_params,
+                          index_vectors, load_config, load_full_vectors, read_index, search, train_index)
+
+INDEX_DIR = "index"
+TOP_K = 10
+NUM_QUERIES = 200
+
+def load_corpus(index_dir, vectors_path=None):
+    """Vetores do corpus: de um .npy, dos vetores completos salvos para o
+    re-ranking ou reconstruídos do índice flat atual."""
+    if vectors_path:
+        return np.load(vectors_path).astype(np.float32)
+    config = load_config(index_dir)
+    if "dim" in config:
+        stored = load_full_vectors(index_dir, config["dim"], config.get("vector_rows"))
+        if stored is not None:
+            # vectors.bin só recebe acréscimos: as linhas de chunks removidos
+            # continuam no arquivo e ficam fora do corpus
+            ids, vectors = stored
+            store = ChunkStore(index_dir)
+            live = store.live_mask()[ids]
+            store.close()
+            return np.array(vectors[live])
+    _, vectors = index_vectors(read_index(index_dir, mmap=False))
+    return vectors
+
+def expand_corpus(vectors, size, noise=0.05, seed=1234):
+    """Gera um corpus sintético maior perturbando vetores reais.
+
+    Útil para estimar o comportamento dos índices em um corpus muitas vezes
+    maior que o atual.
+    """
+    rng = np.random.default_rng(seed)
+    base = vectors[rng.integers(0, len(vectors), size)]
+    scale = noise * vectors.std(axis=0, keepdims=True)
+    return (base + rng.standard_normal(base.shape).astype(np.float32) * scale).astype(np.float32)
+
+def sample_queries(vectors, num_queries, noise=0.05, seed=4321):
+    """Consultas próximas de vetores do corpus (mas não idênticas a eles)."""
+    return expand_corpus(vectors, num_queries, noise=noise, seed=seed)
+
+def index_size(index):
+    """Tamanho do índice serializado, em bytes."""
+    return int(faiss.serialize_index(index).nbytes)
+
+def recall_at_k(ground_truth, found):
+    """Fração dos k vizinhos exatos encontrados pela busca aproximada."""
+    hits = sum(len(set(gt) & set(f)) for gt, f in zip(ground_truth, found))
+    return hits / ground_truth.size
+
+def measure_search(index, queries, ground_truth, top_k, reranker=None):
+    """Recall e latência (p50/p99) de uma consulta por vez."""
+    latencies = []
+    found = np.zeros_like(ground_truth)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, I = search(index, query[None, :], top_k, reranker=reranker)
+        latencies.append(time.perf_counter() - start)
+        found[i] = I[0]
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        f"recall@{top_k}": recall_at_k(ground_truth, found),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+def benchmark_spec(index_type, vectors, queries, ground_truth, top_k, params=None, rerank_factor=0):
+    """Constrói um índice do tipo informado e mede construção, recall e latência.
+
+    Em tipos comprimidos com rerank_factor, mede também a busca com
+    re-ranking pelos vetores float32 completos. Retorna uma lista de
+    resultados (um por variante).
+    """
+    build_start = time.perf_counter()
+    index, config = build_index(index_type, vectors.shape[1], len(vectors), params)
+    train_index(index, vectors, config["train_size"])
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+    build_time = time.perf_counter() - build_start
+
+    base = {"index_type": index_type, "config": config, "build_s": build_time,
+            "size_mb": index_size(index) / 1e6, "vectors_mb": 0.0}
+    results = [{**base, **measure_search(index, queries, ground_truth, top_k)}]
+    if rerank_factor and index_type in COMPRESSED_TYPES:
+        reranker = Reranker(np.arange(len(vectors)), vectors, rerank_factor)
+        results.append({**base, "index_type": f"{index_type}+rr{rerank_factor}", "vectors_mb": vectors.nbytes / 1e6,
+                        **measure_search(index, queries, ground_truth, top_k, reranker)})
+    return results
+
+def run_benchmark(vectors, index_types, num_queries=NUM_QUERIES, top_k=TOP_K, params=None,
+                  rerank_factor=RERANK_FACTOR):
+    """Compara os tipos de índice com a busca exata (IndexFlatL2)."""
+    queries = sample_queries(vectors, num_queries)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, ground_truth = exact.search(queries, top_k)
+    return [r for t in index_types
+            for r in benchmark_spec(t, vectors, queries, ground_truth, top_k, params, rerank_factor)]
+
+def print_results(results, top_k=TOP_K):
+    print(f"\n{'índice':<12} {'recall@' + str(top_k):>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'tamanho (MB)':>13} "
+          f"{'vetores (MB)':>13} {'build (s)':>10}")
+    for r in results:
+        print(f"{r['index_type']:<12} {r[f'recall@{top_k}']:>10.3f} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f} "
+              f"{r['size_mb']:>13.2f} {r['vectors_mb']:>13.2f} {r['build_s']:>10.2f}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de recall/latência dos tipos de índice FAISS")
+    parser.add_argument("--vectors", help="Arquivo .npy com os vetores (padrão: reconstruir do índice flat)")
+    parser.add_argument("--index-types", default=",".join(INDEX_TYPES),
+                        help="Tipos a comparar, separados por vírgula")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiplica o corpus com vetores sintéticos (ex.: 100 para 100x)")
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES, help="Número de consultas")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--nprobe", type=int)
+    parser.add_argument("--pq-m", type=int)
+    parser.add_argument("--hnsw-m", type=int)
+    parser.add_argument("--ef-search", type=int)
+    parser.add_argument("--rerank-factor", type=int, default=RERANK_FACTOR,
+                        help="Re-ranking dos tipos comprimidos (fp16, sq8, ivf-pq): candidatos por resultado (0 desliga)")
+    parser.add_argument("--output", help="Salva os resultados em JSON")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    vectors = load_corpus(resolve_index_dir(INDEX_DIR), args.vectors)
+    if args.scale != 1.0:
+        vectors = expand_corpus(vectors, int(len(vectors) * args.scale))
+    print(f"[INFO] Corpus: {len(vectors)} vetores de dimensão {vectors.shape[1]}")
+
+    params = index_params({
+        "nlist": args.nlist, "nprobe": args.nprobe, "pq_m": args.pq_m,
+        "hnsw_m": args.hnsw_m, "ef_search": args.ef_search,
+    })
+    results = run_benchmark(vectors, args.index_types.split(","), args.queries, args.top_k, params,
+                            args.rerank_factor)
+    print_results(results, args.top_k)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"num_vectors": len(vectors), "dim": int(vectors.shape[1]), "results": results}, f, indent=2)
+        print(f"[INFO] Resultados salvos em {args.output}")
@@ -0,0 +1,540 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import resource
+import contextlib
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import fitz
+import numpy as np
+import ingest
+from ask import QueryEngine
+from chunk_store import ChunkStore
+from chunking import DEFAULT_CHUNKING
+from dedup import dedup_config
+from index_versions import resolve_index_dir
+
+BENCH_DIR = "bench"           # Corpus sintético, índice e resultados do benchmark
+CORPUS_VERSION = 1            # Incrementar ao mudar o gerador (corpus gerados antes são refeitos)
+NUM_LEILOES = 50
+PAGES_PER_PDF = 8
+PDFS_PER_LEILAO = 2
+BOILERPLATE_RATIO = 0.5       # Fração das páginas copiada do texto padrão dos editais
+PARAGRAPHS_PER_PAGE = 12    # ~850 palavras por página, como nos editais reais
+NUM_QUERIES = 100
+EMBED_SAMPLE = 512            # Chunks usados na medição isolada dos embeddings
+REGRESSION_TOLERANCE = 0.10   # Piora relativa a partir da qual uma métrica é regressão
+API_STARTUP_TIMEOUT = 120
+
+TIPOS = ["Apartamento", "Casa", "Terreno", "Imóvel Comercial", "Sítio"]
+CIDADES = {
+    "São Paulo": ["Vila Independência", "Cidade Dutra", "Santo Amaro", "Mooca", "Tatuapé", "Butantã"],
+    "Campinas": ["Cambuí", "Taquaral", "Barão Geraldo"],
+    "Guarulhos": ["Centro", "Vila Galvão"],
+    "Itatiba": ["Jardim Ipê", "Centro"],
+    "Santos": ["Gonzaga", "Ponta da Praia"],
+}
+COMITENTES = ["Caixa Econômica Federal", "Banco Santander", "Tribunal de Justiça do Estado de São Paulo", "Itaú Unibanco"]
+
+# Cláusulas no estilo dos editais, repetidas (com pequenas variações) em todos os documentos
+BOILERPLATE_SENTENCES = [
+    "O COMPRADOR declara ter pleno conhecimento das condições do imóvel, adquirindo-o no estado em que se encontra",
+    "as despesas com transferência, incluindo ITBI, registro e certidões, correrão por conta do COMPRADOR",
+    "a comissão do leiloeiro corresponde a 5% do valor do lance vencedor e deverá ser paga em até 24 horas",
+    "o pagamento poderá ser realizado à vista ou mediante financiamento, conforme as condições deste edital",
+    "nos termos da Lei 9.514/97, ao devedor fiduciante é assegurado o direito de preferência na aquisição do imóvel",
+    "os dados pessoais informados serão tratados de acordo com a Lei Geral de Proteção de Dados",
+    "eventuais débitos de condomínio e IPTU anteriores à arrematação serão de responsabilidade do VENDEDOR",
+    "a desocupação do imóvel, quando ocupado, ficará a cargo do COMPRADOR, observada a legislação vigente",
+    "o VENDEDOR poderá cancelar a venda por impossibilidade documental ou determinação judicial",
+    "os lances serão recebidos exclusivamente pela plataforma eletrônica, no prazo indicado no site",
+    "a escritura definitiva será outorgada após a quitação integral do preço e das demais obrigações",
+    "as fotos e descrições divulgadas são meramente ilustrativas e não vinculam o VENDEDOR",
+]
+ROOMS = ["SALA", "COZINHA", "DORMITÓRIO", "BANHEIRO", "ÁREA DE SERVIÇO", "GARAGEM", "DEPÓSITO", "VARANDA", "QUINTAL"]
+FINISHES = [
+    "piso cerâmico", "piso em concreto desempenado", "piso laminado", "paredes com pintura látex",
+    "paredes revestidas em azulejo", "forro de madeira", "forro de gesso", "laje pintada",
+    "esquadrias de alumínio com vidro liso", "esquadrias de madeira com vidro fantasia", "grade de proteção de ferro",
+]
+QUERY_TEMPLATES = [
+    "{tipo} em {bairro} com {quartos} dormitórios",
+    "{tipo} à venda em {cidade}",
+    "imóvel com garagem e área de serviço em {bairro}",
+    "quem paga o ITBI e o registro da escritura",
+    "como funciona o direito de preferência do devedor fiduciante",
+    "débitos de condomínio e IPTU anteriores à arrematação",
+    "{tipo} ocupado em {cidade}, desocupação por conta do comprador",
+    "comissão do leiloeiro e prazo de pagamento",
+]
+
+def boilerplate_pages(count=8, seed=7):
+    """Páginas de cláusulas padronizadas, idênticas em todos os editais do corpus."""
+    rng = random.Random(seed)
+    pages = []
+    for page in range(count):
+        paragraphs = []
+        for clause in range(page * PARAGRAPHS_PER_PAGE + 1, (page + 1) * PARAGRAPHS_PER_PAGE + 1):
+            paragraphs.append(f"CLÁUSULA {clause}. " + "; ".join(rng.sample(BOILERPLATE_SENTENCES, 5)) + ".")
+        pages.append(paragraphs)
+    return pages
+
+def property_paragraph(rng, imovel):
+    """Parágrafo descritivo, único para cada imóvel."""
+    rooms = []
+    for room in rng.sample(ROOMS, 4):
+        rooms.append(f"{room} {rng.randint(1, 3)}: " + "; ".join(rng.sample(FINISHES, 3)))
+    return (f"{imovel['tipo_imovel']} localizado em {imovel['bairro']}, {imovel['cidade']}/SP, matrícula "
+            f"{rng.randint(10000, 999999)}, com área de {rng.randint(40, 900)} m² e {rng.randint(1, 4)} vagas. "
+            + ". ".join(rooms) + ".")
+
+def generate_leilao(folder, rng, codigo, pages, pdfs, boilerplate, ratio):
+    """Cria uma pasta leilao_<codigo>_ com metadata.json e editais em PDF."""
+    cidade = rng.choice(sorted(CIDADES))
+    imovel = {"tipo_imovel": rng.choice(TIPOS), "cidade": cidade, "bairro": rng.choice(CIDADES[cidade])}
+    metadata = {
+        "leilao_id": str(codigo - 250),
+        "codigo_zuk": str(codigo),
+        "product_id": str(200000 + codigo),
+        "preco": f"{rng.uniform(30000, 3000000):.2f}",
+        "tipo_imovel": imovel["tipo_imovel"],
+        "uf": "SP",
+        "cidade": cidade,
+        "bairro": imovel["bairro"],
+        "comitente": rng.choice(COMITENTES),
+        "titulo": f"Leilão de {imovel['tipo_imovel']} - {imovel['bairro']} - {cidade}/SP cod: {200000 + codigo} | Zuk",
+        "endereco_completo": f"Rua Sintética, {rng.randint(1, 2000)} - {imovel['bairro']}, {cidade}/SP",
+        "url": f"https://www.portalzuk.com.br/imovel/sp/sintetico/{codigo - 250}-{200000 + codigo}",
+        "documentos_pdf": [],
+        "total_documentos": pdfs,
+        "data_extracao": "2025-01-01 00:00:00",
+    }
+    os.makedirs(folder, exist_ok=True)
+
+    cursor = 0
+    for doc_index in range(pdfs):
+        label = "Edital de venda" if doc_index == 0 else f"Anexo {doc_index}"
+        filename = f"{doc_index + 1:02d}_{label.replace(' ', '_')}.pdf"
+        doc = fitz.open()
+        for _ in range(pages):
+            if rng.random() < ratio:
+                paragraphs = boilerplate[cursor % len(boilerplate)]
+                cursor += 1
+            else:
+                paragraphs = [property_paragraph(rng, imovel) for _ in range(PARAGRAPHS_PER_PAGE)]
+            page = doc.new_page()
+            page.insert_textbox(page.rect + (40, 40, -40, -40), "\n\n".join(paragraphs), fontsize=7, fontname="helv")
+        doc.save(os.path.join(folder, filename))
+        doc.close()
+        metadata["documentos_pdf"].append({"url": f"https://exemplo.invalid/{filename}", "label": label,
+                                           "filename": filename})
+
+    with open(os.path.join(folder, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    return imovel
+
+def corpus_params(num_leiloes, pages, pdfs, ratio, seed):
+    return {"version": CORPUS_VERSION, "leiloes": num_leiloes, "pages": pages, "pdfs": pdfs, "paragraphs_per_page": PARAGRAPHS_PER_PAGE,
+            "boilerplate_ratio": ratio, "seed": seed}
+
+def generate_corpus(data_dir, num_leiloes=NUM_LEILOES, pages=PAGES_PER_PDF, pdfs=PDFS_PER_LEILAO,
+                    ratio=BOILERPLATE_RATIO, seed=42):
+    """Gera (ou reaproveita, se os parâmetros forem os mesmos) o corpus sintético.
+
+    O corpus é determinístico: os mesmos parâmetros geram os mesmos PDFs,
+    então execuções em commits diferentes medem exatamente o mesmo trabalho.
+    Retorna a lista de imóveis (tipo, cidade, bairro) usada para as perguntas.
+    """
+    params = corpus_params(num_leiloes, pages, pdfs, ratio, seed)
+    params_path = os.path.join(data_dir, "corpus.json")
+    if os.path.exists(params_path):
+        with open(params_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["params"] == params:
+            print(f"[INFO] Corpus sintético existente reaproveitado ({num_leiloes} leilões)")
+            return saved["imoveis"]
+
+    print(f"[INFO] Gerando corpus sintético: {num_leiloes} leilões, {pdfs} PDFs de {pages} páginas, "
+          f"{ratio:.0%} de texto padrão...")
+    if os.path.exists(data_dir):
+        for folder in os.listdir(data_dir):
+            if folder.startswith("leilao_"):
+                for name in os.listdir(os.path.join(data_dir, folder)):
+                    os.remove(os.path.join(data_dir, folder, name))
+                os.rmdir(os.path.join(data_dir, folder))
+    os.makedirs(data_dir, exist_ok=True)
+
+    rng = random.Random(seed)
+    boilerplate = boilerplate_pages()
+    imoveis = []
+    for i in range(num_leiloes):
+        codigo = 90000 + i
+        folder = os.path.join(data_dir, f"leilao_{codigo}_")
+        imoveis.append(generate_leilao(folder, rng, codigo, pages, pdfs, boilerplate, ratio))
+
+    with open(params_path, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "imoveis": imoveis}, f, ensure_ascii=False, indent=2)
+    return imoveis
+
+def generate_queries(imoveis, num_queries=NUM_QUERIES, seed=99):
+    """Perguntas semânticas (sem códigos ou endereços, que iriam para o lookup exato)."""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(num_queries):
+        imovel = rng.choice(imoveis)
+        queries.append(QUERY_TEMPLATES[i % len(QUERY_TEMPLATES)].format(
+            tipo=imovel["tipo_imovel"].lower(), cidade=imovel["cidade"], bairro=imovel["bairro"],
+            quartos=rng.randint(1, 4)))
+    return queries
+
+def peak_rss_mb():
+    """Pico de memória residente deste processo e dos processos filhos já encerrados."""
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss: bytes no macOS, KB no Linux
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return self_rss, children_rss
+
+def percentiles(latencies):
+    latencies_ms = np.array(latencies) * 1000
+    return {"p50_ms": float(np.percentile(latencies_ms, 50)), "p99_ms": float(np.percentile(latencies_ms, 99))}
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)
+               if os.path.isfile(os.path.join(path, f)))
+
+def bench_extraction(data_dir, chunking):
+    """Throughput de extract_text_chunks (um processo, sem o pool de extração)."""
+    pdfs = sorted(os.path.join(data_dir, folder, name)
+                  for folder in os.listdir(data_dir) if folder.startswith("leilao_")
+                  for name in os.listdir(os.path.join(data_dir, folder)) if name.endswith(".pdf"))
+    pages = 0
+    for path in pdfs:
+        with fitz.open(path) as doc:
+            pages += doc.page_count
+
+    texts = []
+    start = time.perf_counter()
+    for path in pdfs:
+        texts.extend(c["text"] for c in ingest.extract_text_chunks(path, chunking))
+    elapsed = time.perf_counter() - start
+    return {
+        "pdfs": len(pdfs),
+        "pages": pages,
+        "chunks": len(texts),
+        "seconds": elapsed,
+        "pages_per_s": pages / elapsed,
+        "chunks_per_s": len(texts) / elapsed,
+    }, texts
+
+def bench_embedding(texts, num_threads, batch_size, sample=EMBED_SAMPLE):
+    """Throughput de get_embedding em uma amostra dos chunks (sem cache)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        model, tokenizer, _ = ingest.load_model(num_threads)
+    texts = texts[:sample]
+    start = time.perf_counter()
+    ingest.get_embedding(texts, model, tokenizer, batch_size=batch_size, verbose=False)
+    elapsed = time.perf_counter() - start
+    return {"chunks": len(texts), "seconds": elapsed, "chunks_per_s": len(texts) / elapsed}
+
+def bench_ingest(index_type, workers, num_threads, batch_size, chunking, dedup):
+    """Indexação completa do corpus (ingest.main), reconstruindo o índice do zero."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest.main(batch_size=batch_size, num_threads=num_threads, workers=workers, index_type=index_type,
+                    use_cache=False, chunking=chunking, dedup=dedup, keep_versions=1)
+    elapsed = time.perf_counter() - start
+    index_dir = resolve_index_dir(ingest.INDEX_DIR)
+    store = ChunkStore(index_dir)
+    chunks = len(store)
+    store.close()
+    return {"chunks": chunks, "seconds": elapsed, "chunks_per_s": chunks / elapsed,
+            "index_mb": dir_size(index_dir) / 1e6}
+
+def bench_queries(index_dir, model_name, queries, top_k, num_threads):
+    """Latência de QueryEngine.search (o caminho de ask.search), uma pergunta por vez."""
+    engine = QueryEngine(index_dir, model_name, num_threads)
+    engine.search(queries[0], top_k)  # Aquecimento
+    latencies = []
+    stages = {}
+    for query in queries:
+        start = time.perf_counter()
+        _, timings = engine.search(query, top_k)
+        latencies.append(time.perf_counter() - start)
+        for stage, seconds in timings.items():
+            stages.setdefault(stage, []).append(seconds)
+    engine.close()
+    result = {"queries": len(queries), "load_s": engine.load_time, **percentiles(latencies)}
+    for stage, seconds in stages.items():
+        result[f"{stage}_p50_ms"] = float(np.percentile(seconds, 50) * 1000)
+    return result
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _post_json(url, payload, timeout=60):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+def _proc_fields(path, fields):
+    """Campos em kB de /proc/<pid>/status ou smaps_rollup (Linux), em MB."""
+    values = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                name = line.split(":", 1)[0]
+                if name in fields:
+                    values[name] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return values
+
+def _server_processes(pid):
+    """O processo do uvicorn e seus workers (Linux)."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+            return [pid] + [int(child) for child in f.read().split()]
+    except OSError:
+        return [pid]
+
+def server_memory(pid):
+    """Memória somada do servidor e dos workers.
+
+    RSS conta as páginas compartilhadas (índice e chunk store mapeados) uma
+    vez por processo; PSS divide cada página compartilhada entre os processos
+    que a usam, então mede o custo real de acrescentar workers.
+    """
+    memory = {"rss_mb": 0.0, "pss_mb": 0.0, "peak_rss_mb": 0.0}
+    for process in _server_processes(pid):
+        rollup = _proc_fields(f"/proc/{process}/smaps_rollup", ("Rss", "Pss"))
+        status = _proc_fields(f"/proc/{process}/status", ("VmHWM",))
+        memory["rss_mb"] += rollup.get("Rss", 0.0)
+        memory["pss_mb"] += rollup.get("Pss", 0.0)
+        memory["peak_rss_mb"] = max(memory["peak_rss_mb"], status.get("VmHWM", 0.0))
+    return {k: (v or None) for k, v in memory.items()}
+
+def wait_ready(base_url, server, workers):
+    """Aguarda /ready responder 200 em todos os workers. Retorna os segundos de espera."""
+    start = time.perf_counter()
+    ready_pids = set()
+    while len(ready_pids) < workers:
+        if server.poll() is not None:
+            raise RuntimeError(f"A API encerrou ao iniciar (código {server.returncode})")
+        if time.perf_counter() - start > API_STARTUP_TIMEOUT:
+            raise RuntimeError("A API não ficou pronta a tempo")
+        try:
+            with urllib.request.urlopen(f"{base_url}/ready", timeout=5) as response:
+                ready_pids.add(json.loads(response.read())["pid"])
+                continue
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return time.perf_counter() - start
+
+def bench_api(index_dir, model_name, queries, top_k, workers=1, clients=4):
+    """Latência e vazão do endpoint /ask, com a API (uvicorn) em um subprocesso.
+
+    A latência é medida com uma pergunta por vez; a vazão, com clients
+    requisições simultâneas (perguntas distintas, fora do cache de embeddings).
+    """
+    port = _free_port()
+    env = dict(os.environ, RAG_INDEX_DIR=os.path.abspath(index_dir), RAG_MODEL_NAME=model_name,
+               RAG_REQUEST_LOG="0", RAG_TORCH_THREADS=str(max(1, (os.cpu_count() or 1) // workers)))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        startup = wait_ready(base_url, server, workers)
+
+        _post_json(f"{base_url}/ask", {"question": queries[0], "top_k": top_k})  # Aquecimento
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            _post_json(f"{base_url}/ask", {"question": query, "top_k": top_k})
+            latencies.append(time.perf_counter() - start)
+
+        load = [f"{query} ({i})" for i, query in enumerate(queries)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            list(executor.map(lambda query: _post_json(f"{base_url}/ask", {"question": query, "top_k": top_k}), load))
+        throughput = len(load) / (time.perf_counter() - start)
+
+        return {"queries": len(queries), "workers": workers, "clients": clients, "startup_s": startup,
+                **percentiles(latencies), "requests_per_s": throughput, **server_memory(server.pid)}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def git_revision():
+    """(commit, árvore com alterações não commitadas) do repositório, ou (None, None)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+# Métricas comparadas entre execuções: (caminho, maior é melhor)
+METRICS = [
+    ("extraction.pages_per_s", True),
+    ("extraction.chunks_per_s", True),
+    ("embedding.chunks_per_s", True),
+    ("ingest.seconds", False),
+    ("ingest.chunks_per_s", True),
+    ("ingest.index_mb", False),
+    ("query.p50_ms", False),
+    ("query.p99_ms", False),
+    ("api.p50_ms", False),
+    ("api.p99_ms", False),
+    ("api.requests_per_s", True),
+    ("api.pss_mb", False),
+    ("api.peak_rss_mb", False),
+    ("peak_rss_mb", False),
+]
+
+def metric(results, path):
+    value = results
+    for key in path.split("."):
+        if not isinstance(value, dict) or value.get(key) is None:
+            return None
+        value = value[key]
+    return value
+
+def compare_results(previous, current, tolerance=REGRESSION_TOLERANCE):
+    """Compara duas execuções e lista as métricas que pioraram além da tolerância."""
+    print(f"\n=== Comparação com {previous.get('commit')} ({previous.get('timestamp')}) ===")
+    if previous.get("corpus") != current.get("corpus"):
+        print("[AVISO] Os corpus das duas execuções são diferentes; a comparação não é direta.")
+    regressions = []
+    for path, higher_is_better in METRICS:
+        old, new = metric(previous["results"], path), metric(current["results"], path)
+        if old is None or new is None or not old:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > tolerance:
+            flag = "  [REGRESSÃO]"
+            regressions.append(path)
+        print(f"{path:<26} {old:>12.2f} -> {new:>12.2f}  ({change:+.1%}){flag}")
+    return regressions
+
+def print_results(results):
+    r = results["results"]
+    print(f"\n=== Benchmark ({results['commit']}{' +alterações' if results['dirty'] else ''}) ===")
+    e = r["extraction"]
+    print(f"Extração: {e['pdfs']} PDFs, {e['pages']} páginas, {e['chunks']} chunks | "
+          f"{e['pages_per_s']:.1f} páginas/s, {e['chunks_per_s']:.1f} chunks/s")
+    print(f"Embeddings: {r['embedding']['chunks_per_s']:.1f} chunks/s ({r['embedding']['chunks']} chunks)")
+    i = r["ingest"]
+    print(f"Indexação: {i['seconds']:.2f}s ({i['chunks_per_s']:.1f} chunks/s) | índice {i['index_mb']:.2f} MB")
+    q = r["query"]
+    print(f"Consultas (ask): p50 {q['p50_ms']:.2f} ms | p99 {q['p99_ms']:.2f} ms")
+    if r.get("api"):
+        a = r["api"]
+        print(f"API (/ask, {a['workers']} workers): p50 {a['p50_ms']:.2f} ms | p99 {a['p99_ms']:.2f} ms | "
+              f"{a['requests_per_s']:.1f} req/s com {a['clients']} clientes | pronta em {a['startup_s']:.1f}s")
+        if a.get("pss_mb"):
+            print(f"Memória da API: PSS {a['pss_mb']:.0f} MB | RSS somado {a['rss_mb']:.0f} MB | "
+                  f"pico RSS por processo {a['peak_rss_mb']:.0f} MB")
+    print(f"Pico de RSS: {r['peak_rss_mb']:.0f} MB (processos de extração: {r['children_peak_rss_mb']:.0f} MB)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark da indexação e das consultas em um corpus sintético")
+    parser.add_argument("--model", required=True,
+                        help="Modelo de embeddings (caminho local para rodar offline, ex.: um modelo pequeno)")
+    parser.add_argument("--work-dir", default=BENCH_DIR, help="Diretório do corpus, índice e resultados")
+    parser.add_argument("--leiloes", type=int, default=NUM_LEILOES)
+    parser.add_argument("--pages", type=int, default=PAGES_PER_PDF, help="Páginas por PDF")
+    parser.add_argument("--pdfs", type=int, default=PDFS_PER_LEILAO, help="PDFs por leilão")
+    parser.add_argument("--boilerplate", type=float, default=BOILERPLATE_RATIO,
+                        help="Fração das páginas com texto padrão (repetido entre editais)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--workers", type=int, default=2, help="Processos de extração na indexação")
+    parser.add_argument("--threads", type=int, default=1, help="Threads do torch")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--no-api", action="store_true", help="Não mede o endpoint /ask")
+    parser.add_argument("--api-workers", type=int, default=1, help="Workers do uvicorn")
+    parser.add_argument("--api-clients", type=int, default=4, help="Requisições simultâneas na medição de vazão")
+    parser.add_argument("--output", help="Arquivo JSON dos resultados (padrão: <work-dir>/results/<data>_<commit>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="Resultado anterior para comparação")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="Piora relativa tolerada antes de acusar regressão (padrão: 0.10)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    data_dir = os.path.join(args.work_dir, "leiloes")
+    index_dir = os.path.join(args.work_dir, "index")
+    imoveis = generate_corpus(data_dir, args.leiloes, args.pages, args.pdfs, args.boilerplate, args.seed)
+    queries = generate_queries(imoveis, args.queries)
+
+    # A indexação usa o corpus, o índice e o modelo do benchmark
+    ingest.DATA_DIR, ingest.INDEX_DIR, ingest.MODEL_NAME = data_dir, index_dir, args.model
+    chunking, dedup = DEFAULT_CHUNKING, dedup_config()
+
+    results = {}
+    print("[INFO] Medindo a extração dos PDFs...")
+    results["extraction"], texts = bench_extraction(data_dir, chunking)
+    print("[INFO] Medindo os embeddings...")
+    results["embedding"] = bench_embedding(texts, args.threads, args.batch_size)
+    print(f"[INFO] Indexando o corpus ({args.index_type})...")
+    results["ingest"] = bench_ingest(args.index_type, args.workers, args.threads, args.batch_size, chunking, dedup)
+    print(f"[INFO] Medindo {len(queries)} consultas...")
+    results["query"] = bench_queries(index_dir, args.model, queries, args.top_k, args.threads)
+    results["peak_rss_mb"], results["children_peak_rss_mb"] = peak_rss_mb()
+    if not args.no_api:
+        print("[INFO] Medindo o endpoint /ask...")
+        results["api"] = bench_api(index_dir, args.model, queries, args.top_k, args.api_workers, args.api_clients)
+
+    commit, dirty = git_revision()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "corpus": corpus_params(args.leiloes, args.pages, args.pdfs, args.boilerplate, args.seed),
+        "config": {"model": args.model, "index_type": args.index_type, "workers": args.workers,
+                   "threads": args.threads, "batch_size": args.batch_size, "queries": len(queries),
+                   "top_k": args.top_k, "api_workers": args.api_workers, "api_clients": args.api_clients},
+        "results": results,
+    }
+    print_results(report)
+
+    output = args.output or os.path.join(args.work_dir, "results",
+                                         f"{time.strftime('%Y%m%d_%H%M%S')}_{commit or 'sem-git'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[SUCESSO] Resultados salvos em {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        regressions = compare_results(previous, report, args.tolerance)
+        if regressions:
+            print(f"[AVISO] {len(regressions)} métricas pioraram mais de {args.tolerance:.0%}: {', '.join(regressions)}")
+            raise SystemExit(1)
+        print("[SUCESSO] Nenhuma regressão acima da tolerância.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+import os
+import sys
+import json
+import mmap
+import pickle
+import numpy as np
+from journal import append_entry, read_entries, remove_log
+
+# Arquivos do chunk store dentro do diretório do índice
+LEILOES_FILE = "leiloes.json"   # Metadados (uma entrada por leilão) e tabela de documentos
+CHUNKS_FILE = "chunks.bin"      # Colunas dos chunks (registros de tamanho fixo)
+TEXTS_FILE = "texts.bin"        # Textos dos chunks em UTF-8, concatenados
+CANONICAL_FILE = "canonical.bin"  # ID do representante de cada chunk (quase duplicatas compartilham um)
+LEILOES_LOG = "leiloes.log"     # Leilões e documentos acrescentados desde a última gravação de leiloes.json
+
+CHUNK_DTYPE = np.dtype([
+    ("leilao", "<i4"),   # Índice do leilão em leiloes.json
+    ("doc", "<i4"),      # Índice do documento na tabela de documentos
+    ("page", "<i4"),     # Página do PDF (começando em 1)
+    ("offset", "<i8"),   # Posição do texto em texts.bin (bytes)
+    ("length", "<i4"),   # Tamanho do texto (bytes)
+])
+
+# Campos do metadata.json guardados uma vez por leilão
+LEILAO_FIELDS = [
+    "leilao_id", "codigo_zuk", "product_id", "preco", "tipo_imovel", "uf",
+    "cidade", "bairro", "endereco_completo", "comitente", "url", "titulo",
+]
+
+# Campos de metadados expostos em cada chunk (mesmo formato do antigo chunks.pkl)
+CHUNK_FIELDS = [
+    "leilao_id", "codigo_zuk", "preco", "tipo_imovel", "cidade", "bairro",
+    "endereco_completo", "comitente", "url",
+]
+
+# Campos das outras ocorrências (refs) de um chunk com quase duplicatas
+REF_FIELDS = ["leilao_id", "codigo_zuk", "cidade", "bairro", "url"]
+
+# Campos com filtro por igualdade (sem diferenciar maiúsculas) nas buscas
+FILTER_FIELDS = ["cidade", "tipo_imovel", "bairro"]
+
+def parse_preco(value):
+    """Converte o preço do metadata.json em float (NaN se ausente ou inválido)."""
+    try:
+        return float(value) if value not in (None, '') else float("nan")
+    except (TypeError, ValueError):
+        return float("nan")
+
+def store_exists(index_dir):
+    """Verifica se há um chunk store completo no diretório."""
+    return all(os.path.exists(os.path.join(index_dir, f)) for f in (LEILOES_FILE, CHUNKS_FILE, TEXTS_FILE))
+
+def _write_json_atomic(data, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _load_leiloes(index_dir):
+    """Tabelas de leilões e de documentos: leiloes.json mais os acréscimos de leiloes.log.
+
+    Cada entrada do log registra a posição do primeiro leilão e do primeiro
+    documento que acrescenta; o que já está em leiloes.json é ignorado.
+    """
+    with open(os.path.join(index_dir, LEILOES_FILE), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    leiloes, docs = data["leiloes"], data["docs"]
+    for entry in read_entries(os.path.join(index_dir, LEILOES_LOG)):
+        if entry["leiloes_start"] > len(leiloes) or entry["docs_start"] > len(docs):
+            break
+        leiloes.extend(entry["leiloes"][len(leiloes) - entry["leiloes_start"]:])
+        docs.extend(entry["docs"][len(docs) - entry["docs_start"]:])
+    return leiloes, docs
+
+def _load_canonical(index_dir, num_chunks, mmap=False):
+    """Representantes dos chunks (stores antigos, sem o arquivo: cada chunk é o seu).
+
+    Com mmap=True o arquivo é mapeado em memória somente leitura.
+    """
+    path = os.path.join(index_dir, CANONICAL_FILE)
+    if os.path.exists(path) and os.path.getsize(path) >= num_chunks * 8:
+        if mmap and num_chunks:
+            return np.memmap(path, dtype=np.int64, mode="r", shape=(num_chunks,))
+        return np.fromfile(path, dtype=np.int64, count=num_chunks)
+    return np.arange(num_chunks, dtype=np.int64)
+
+class ChunkStoreWriter:
+    """Escreve (ou estende) o chunk store de um diretório de índice.
+
+    Os chunks são gravados à medida que chegam; flush() torna o store
+    consistente em disco. Ao estender um store a partir de um checkpoint
+    (ver checkpoint()), o que foi escrito depois dele é descartado.
+    """
+
+    def __init__(self, index_dir, append=False, checkpoint=None):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+
+        if append and store_exists(index_dir):
+            self.leiloes, self.docs = _load_leiloes(index_dir)
+            mode = "ab"
+        else:
+            self.leiloes = []
+            self.docs = []
+            mode = "wb"
+
+        self._chunks_file = open(os.path.join(index_dir, CHUNKS_FILE), mode)
+        self._texts_file = open(os.path.join(index_dir, TEXTS_FILE), mode)
+        if mode == "ab" and checkpoint:
+            # Descarta chunks gravados depois do último checkpoint (execução interrompida)
+            self._chunks_file.truncate(checkpoint["chunks"] * CHUNK_DTYPE.itemsize)
+            self._texts_file.truncate(checkpoint["text_bytes"])
+            self._chunks_file.seek(0, os.SEEK_END)
+            self._texts_file.seek(0, os.SEEK_END)
+            del self.leiloes[checkpoint["leiloes"]:]
+            self.docs = [doc for doc in self.docs if doc[0] < checkpoint["leiloes"]]
+        self.num_chunks = self._chunks_file.tell() // CHUNK_DTYPE.itemsize
+        self._text_offset = self._texts_file.tell()
+        self.canonical = []
+        if mode == "ab":
+            self.canonical = _load_canonical(index_dir, self.num_chunks).tolist()
+        self._doc_ids = {(leilao, name): i for i, (leilao, name) in enumerate(self.docs)}
+        # Posições já gravadas por flush(); a primeira gravação é sempre completa
+        self._saved = {"leiloes": 0, "docs": 0, "canonical": 0}
+        self._full_flush = True
+        if mode == "ab" and checkpoint:
+            self.flush()
+
+    def add_leilao(self, folder, metadata):
+        """Registra um leilão e retorna seu índice."""
+        entry = {"folder": folder, "removed": False}
+        entry.update({field: metadata.get(field, '') for field in LEILAO_FIELDS})
+        self.leiloes.append(entry)
+        return len(self.leiloes) - 1
+
+    def remove_leilao(self, leilao_idx):
+        """Marca um leilão como removido; seus chunks deixam de ser válidos."""
+        self.leiloes[leilao_idx]["removed"] = True
+        self._full_flush = True
+
+    def add_chunk(self, leilao_idx, doc_id, page, text, canonical=None):
+        """Acrescenta um chunk e retorna seu ID (posição no store).
+
+        canonical é o ID do chunk que representa este no índice vetorial
+        (quase duplicata); por padrão o chunk representa a si mesmo.
+        """
+        key = (leilao_idx, doc_id)
+        doc_idx = self._doc_ids.get(key)
+        if doc_idx is None:
+            doc_idx = len(self.docs)
+            self.docs.append([leilao_idx, doc_id])
+            self._doc_ids[key] = doc_idx
+
+        data = text.encode("utf-8")
+        record = np.array([(leilao_idx, doc_idx, page, self._text_offset, len(data))], dtype=CHUNK_DTYPE)
+        self._texts_file.write(data)
+        self._chunks_file.write(record.tobytes())
+        self._text_offset += len(data)
+        self.canonical.append(self.num_chunks if canonical is None else canonical)
+        self.num_chunks += 1
+        return self.num_chunks - 1
+
+    def set_canonical(self, chunk_id, canonical):
+        """Troca o representante de um chunk já gravado."""
+        self.canonical[chunk_id] = canonical
+        self._full_flush = True
+
+    def checkpoint(self):
+        """Posição atual do store, para retomar a partir dela (ver __init__)."""
+        return {"chunks": self.num_chunks, "text_bytes": self._text_offset, "leiloes": len(self.leiloes)}
+
+    def flush(self, full=True):
+        """Grava em disco os chunks pendentes e a tabela de leilões.
+
+        Com full=False, só os representantes, leilões e documentos novos são
+        acrescentados (canonical.bin e leiloes.log), sem regravar os arquivos
+        inteiros; alterações em registros já gravados (remoções, troca de
+        representante) fazem a gravação seguinte ser completa.
+        """
+        self._texts_file.flush()
+        self._chunks_file.flush()
+        canonical_path = os.path.join(self.index_dir, CANONICAL_FILE)
+        log_path = os.path.join(self.index_dir, LEILOES_LOG)
+        if full or self._full_flush:
+            np.array(self.canonical, dtype=np.int64).tofile(canonical_path + ".tmp")
+            os.replace(canonical_path + ".tmp", canonical_path)
+            _write_json_atomic({"leiloes": self.leiloes, "docs": self.docs},
+                               os.path.join(self.index_dir, LEILOES_FILE))
+            remove_log(log_path)
+            self._full_flush = False
+        else:
+            with open(canonical_path, "ab") as f:
+                f.truncate(self._saved["canonical"] * 8)
+                f.write(np.array(self.canonical[self._saved["canonical"]:], dtype=np.int64).tobytes())
+            if len(self.leiloes) > self._saved["leiloes"] or len(self.docs) > self._saved["docs"]:
+                append_entry(log_path, {
+                    "leiloes_start": self._saved["leiloes"], "leiloes": self.leiloes[self._saved["leiloes"]:],
+                    "docs_start": self._saved["docs"], "docs": self.docs[self._saved["docs"]:],
+                })
+        self._saved = {"leiloes": len(self.leiloes), "docs": len(self.docs), "canonical": len(self.canonical)}
+
+    def close(self):
+        self.flush()
+        self._texts_file.close()
+        self._chunks_file.close()
+
+class ChunkStore:
+    """Leitura do chunk store com colunas e textos mapeados em memória.
+
+    Apenas a tabela de leilões é carregada; as colunas dos chunks, os
+    representantes e os textos são lidos sob demanda a partir de arquivos
+    mapeados em memória (compartilhados entre processos pelo page cache).
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.leiloes, self.docs = _load_leiloes(index_dir)
+        self.removed = np.array([l["removed"] for l in self.leiloes], dtype=bool)
+
+        # Coluna numérica de preços e conjuntos de leilões por valor de atributo
+        self.precos = np.array([parse_preco(l.get("preco")) for l in self.leiloes], dtype=np.float64)
+        self.attribute_ids = {}
+        for field in FILTER_FIELDS:
+            groups = {}
+            for i, leilao in enumerate(self.leiloes):
+                if not leilao["removed"]:
+                    groups.setdefault(str(leilao.get(field, '')).lower(), []).append(i)
+            self.attribute_ids[field] = {value: np.array(ids, dtype=np.int64) for value, ids in groups.items()}
+
+        # chunks.bin pode ser compartilhado com versões mais novas do índice, que
+        # acrescentam registros ao mesmo arquivo (ver index_versions.new_version):
+        # valem só os que já têm representante em canonical.bin, gravado depois deles
+        chunks_path = os.path.join(index_dir, CHUNKS_FILE)
+        num_chunks = os.path.getsize(chunks_path) // CHUNK_DTYPE.itemsize
+        canonical_path = os.path.join(index_dir, CANONICAL_FILE)
+        if os.path.exists(canonical_path):
+            num_chunks = min(num_chunks, os.path.getsize(canonical_path) // 8)
+        if num_chunks > 0:
+            self.records = np.memmap(chunks_path, dtype=CHUNK_DTYPE, mode="r", shape=(num_chunks,))
+        else:
+            self.records = np.zeros(0, dtype=CHUNK_DTYPE)
+
+        texts_path = os.path.join(index_dir, TEXTS_FILE)
+        self._texts_file = open(texts_path, "rb")
+        if os.path.getsize(texts_path) > 0:
+            self._texts = mmap.mmap(self._texts_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._texts = b""
+
+        # Grupos de quase duplicatas: representante -> todos os chunks do grupo
+        self.canonical = _load_canonical(index_dir, len(self.records), mmap=True)
+        self.groups = {}
+        duplicates = np.flatnonzero(self.canonical != np.arange(len(self.canonical)))
+        for chunk_id in duplicates:
+            rep = int(self.canonical[chunk_id])
+            self.groups.setdefault(rep, [rep]).append(int(chunk_id))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, chunk_id):
+        return self.get(chunk_id)
+
+    def is_live(self, chunk_id):
+        """Indica se o chunk pertence a um leilão ainda indexado."""
+        return not self.removed[self.records[chunk_id]["leilao"]]
+
+    def live_mask(self):
+        """Máscara booleana dos chunks válidos."""
+        return ~self.removed[self.records["leilao"]]
+
+    def filter_mask(self, max_preco=None, **filters):
+        """Máscara booleana dos chunks que atendem aos filtros.
+
+        filters aceita os campos de FILTER_FIELDS (comparação sem diferenciar
+        maiúsculas). Leilões sem preço válido não são excluídos por max_preco.
+        Retorna None se nenhum filtro foi informado.
+        """
+        active = {field: value for field, value in filters.items() if value}
+        if not active and not max_preco:
+            return None
+
+        leilao_mask = ~self.removed
+        for field, value in active.items():
+            if field not in self.attribute_ids:
+                raise ValueError(f"Campo sem filtro: {field}")
+            allowed = np.zeros(len(self.leiloes), dtype=bool)
+            allowed[self.attribute_ids[field].get(value.lower(), [])] = True
+            leilao_mask &= allowed
+        if max_preco:
+            leilao_mask &= ~(self.precos > max_preco)
+        return leilao_mask[self.records["leilao"]]
+
+    def vector_mask(self, mask):
+        """Converte uma máscara de chunks em máscara dos IDs do índice vetorial.
+
+        Só os representantes têm vetor: um representante é permitido se algum
+        chunk do seu grupo atende à máscara.
+        """
+        if mask is None or not self.groups:
+            return mask
+        allowed = np.zeros(len(mask), dtype=bool)
+        allowed[self.canonical[mask]] = True
+        return allowed
+
+    def members(self, chunk_id):
+        """IDs dos chunks representados pelo mesmo vetor que chunk_id."""
+        return self.groups.get(int(self.canonical[chunk_id]), [int(chunk_id)])
+
+    def resolve(self, chunk_id, mask=None):
+        """Chunk de um resultado da busca vetorial.
+
+        Retorna o representante, ou o primeiro chunk válido do grupo que
+        atende à máscara (None se nenhum atende).
+        """
+        for member in self.members(chunk_id):
+            if (mask is None or mask[member]) and self.is_live(member):
+                return self.get(member)
+        return None
+
+    def text(self, chunk_id):
+        """Lê o texto de um chunk."""
+        record = self.records[chunk_id]
+        offset, length = int(record["offset"]), int(record["length"])
+        return self._texts[offset:offset + length].decode("utf-8")
+
+    def leilao(self, chunk_id):
+        """Metadados do leilão ao qual o chunk pertence."""
+        return self.leiloes[self.records[chunk_id]["leilao"]]
+
+    def get(self, chunk_id, with_text=True):
+        """Monta o chunk no formato de dicionário (None se removido)."""
+        record = self.records[chunk_id]
+        leilao = self.leiloes[record["leilao"]]
+        if leilao["removed"]:
+            return None
+
+        chunk = {
+            "chunk_id": int(chunk_id),
+            "doc_id": self.docs[record["doc"]][1],
+            "leilao_folder": leilao["folder"],
+            "page": int(record["page"]),
+        }
+        if with_text:
+            chunk["text"] = self.text(chunk_id)
+        chunk.update({field: leilao.get(field, '') for field in CHUNK_FIELDS})
+
+        # Outros imóveis em que o mesmo texto (ou quase) aparece
+        refs = []
+        for member in self.members(chunk_id):
+            other = self.records[member]
+            other_leilao = self.leiloes[other["leilao"]]
+            if member == chunk_id or other_leilao["removed"]:
+                continue
+            ref = {"chunk_id": member, "doc_id": self.docs[other["doc"]][1], "page": int(other["page"])}
+            ref.update({field: other_leilao.get(field, '') for field in REF_FIELDS})
+            refs.append(ref)
+        if refs:
+            chunk["refs"] = refs
+        return chunk
+
+    def close(self):
+        if isinstance(self._texts, mmap.mmap):
+            self._texts.close()
+        self._texts_file.close()
+
+def convert_pickle(pickle_path, index_dir):
+    """Converte um chunks.pkl antigo (lista de dicionários) para o chunk store.
+
+    Os IDs dos chunks são preservados; entradas None (removidas) viram chunks
+    de um leilão marcado como removido.
+    """
+    with open(pickle_path, "rb") as f:
+        chunks = pickle.load(f)
+
+    writer = ChunkStoreWriter(index_dir)
+    removed_idx = None
+    leilao_ids = {}
+    for chunk in chunks:
+        if chunk is None:
+            if removed_idx is None:
+                removed_idx = writer.add_leilao("", {})
+                writer.remove_leilao(removed_idx)
+            writer.add_chunk(removed_idx, "", 0, "")
+            continue
+
+        folder = chunk.get("leilao_folder", "")
+        if folder not in leilao_ids:
+            leilao_ids[folder] = writer.add_leilao(folder, chunk)
+        writer.add_chunk(leilao_ids[folder], chunk["doc_id"], chunk["page"], chunk["text"])
+    writer.close()
+    return writer.num_chunks
+
+if __name__ == "__main__":
+    pickle_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join("index", "chunks.pkl")
+    index_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.dirname(pickle_path) or "."
+    total = convert_pickle(pickle_path, index_dir)
+    print(f"[SUCESSO] {total} chunks convertidos para {index_dir}/")
@@ -0,0 +1,126 @@
+from functools import lru_cache
+import numpy as np
+from transformers import AutoTokenizer
+
+CHUNK_MODES = ["words", "tokens"]
+
+# Modo original: janelas de palavras (o modelo trunca o que passar de max_length tokens)
+DEFAULT_CHUNKING = {"mode": "words", "size": 700, "overlap": 150}
+# Modo por tokens: janelas medidas no tokenizer do modelo, dentro da janela de contexto
+TOKEN_CHUNK_SIZE = 480
+TOKEN_CHUNK_OVERLAP = 64
+
+def chunking_config(mode="words", size=None, overlap=None, paragraphs=True, tokenizer_name=None):
+    """Configuração de chunking salva junto do índice."""
+    if mode == "words":
+        return {"mode": "words",
+                "size": size or DEFAULT_CHUNKING["size"],
+                "overlap": DEFAULT_CHUNKING["overlap"] if overlap is None else overlap}
+    if mode == "tokens":
+        return {"mode": "tokens",
+                "size": size or TOKEN_CHUNK_SIZE,
+                "overlap": TOKEN_CHUNK_OVERLAP if overlap is None else overlap,
+                "paragraphs": paragraphs,
+                "tokenizer": tokenizer_name}
+    raise ValueError(f"Modo de chunking desconhecido: {mode} (use {', '.join(CHUNK_MODES)})")
+
+@lru_cache(maxsize=None)
+def get_tokenizer(name):
+    """Tokenizer (rápido, com offsets) carregado uma vez por processo."""
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    if not tokenizer.is_fast:
+        raise ValueError(f"O chunking por tokens exige um tokenizer rápido (offsets): {name}")
+    return tokenizer
+
+def token_budget(tokenizer, max_length):
+    """Tokens de texto que cabem em max_length, descontados os tokens especiais."""
+    return max_length - tokenizer.num_special_tokens_to_add()
+
+def page_text(page, paragraphs=True):
+    """Texto da página; com paragraphs=True, os blocos do PDF separados por linha em branco."""
+    if not paragraphs:
+        return page.get_text("text")
+    blocks = [b[4].strip() for b in page.get_text("blocks") if b[6] == 0]
+    return "\n\n".join(b for b in blocks if b)
+
+def word_chunks(text, size, overlap):
+    """Janelas de size palavras com overlap palavras em comum."""
+    words = text.split()
+    step = size - overlap
+    return [" ".join(words[start:start + size]) for start in range(0, len(words), step)]
+
+def token_chunks(text, tokenizer, size, overlap, paragraphs=True):
+    """Janelas de até size tokens do modelo, com uma única tokenização do texto.
+
+    Com paragraphs=True, cada janela termina preferencialmente no início de um
+    parágrafo (se isso mantiver pelo menos metade do tamanho); a seguinte
+    recomeça overlap tokens antes do corte.
+    """
+    encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+    offsets = encoding["offset_mapping"]
+    n = len(offsets)
+    if n == 0:
+        return []
+
+    starts = np.array([start for start, _ in offsets])
+    breaks = []
+    if paragraphs:
+        # Tokens que começam um parágrafo (logo após uma linha em branco)
+        para_starts = [i + 2 for i in range(len(text)) if text.startswith("\n\n", i)]
+        breaks = np.searchsorted(starts, para_starts)
+
+    chunks = []
+    start = 0
+    while start < n:
+        end = min(start + size, n)
+        if end < n and len(breaks):
+            candidates = breaks[(breaks > start + size // 2) & (breaks <= end)]
+            if len(candidates):
+                end = int(candidates[-1])
+        chunk = text[offsets[start][0]:offsets[end - 1][1]].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= n:
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+def split_page(page, chunking):
+    """Divide o texto de uma página de PDF conforme a configuração de chunking."""
+    if chunking["mode"] == "words":
+        return word_chunks(page.get_text("text"), chunking["size"], chunking["overlap"])
+    text = page_text(page, chunking.get("paragraphs", True))
+    if not text.strip():
+        return []
+    tokenizer = get_tokenizer(chunking["tokenizer"])
+    return token_chunks(text, tokenizer, chunking["size"], chunking["overlap"], chunking.get("paragraphs", True))
+
+def truncation_stats(texts, tokenizer, max_length, batch_size=256):
+    """Quanto do texto dos chunks é descartado pela truncagem em max_length tokens."""
+    lengths = []
+    for i in range(0, len(texts), batch_size):
+        encoded = tokenizer(texts[i:i + batch_size], add_special_tokens=True)["input_ids"]
+        lengths.extend(len(ids) for ids in encoded)
+    lengths = np.array(lengths, dtype=np.int64)
+    lost = np.maximum(lengths - max_length, 0)
+    total = int(lengths.sum())
+    return {
+        "chunks": len(lengths),
+        "max_length": max_length,
+        "truncated_chunks": int(np.count_nonzero(lost)),
+        "tokens": total,
+        "tokens_lost": int(lost.sum()),
+        "lost_fraction": float(lost.sum() / total) if total else 0.0,
+        "mean_tokens": float(lengths.mean()) if len(lengths) else 0.0,
+        "max_tokens": int(lengths.max()) if len(lengths) else 0,
+    }
+
+def print_truncation_stats(stats):
+    print(f"\n=== Truncagem em {stats['max_length']} tokens ===")
+    if not stats["chunks"]:
+        print("Nenhum chunk.")
+        return
+    print(f"Chunks truncados: {stats['truncated_chunks']} de {stats['chunks']} "
+          f"({stats['truncated_chunks'] / stats['chunks']:.1%})")
+    print(f"Tokens descartados: {stats['tokens_lost']} de {stats['tokens']} ({stats['lost_fraction']:.1%})")
+    print(f"Tokens por chunk: média {stats['mean_tokens']:.0f}, máximo {stats['max_tokens']}")
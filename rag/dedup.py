@@ -0,0 +1,157 @@
+import os
+import re
+import zlib
+import numpy as np
+
+MINHASH_FILE = "minhash.bin"  # Assinaturas MinHash de cada chunk (mesma ordem do chunk store)
+
+DEDUP_THRESHOLD = 0.85  # Similaridade (Jaccard estimado) a partir da qual dois chunks são o mesmo texto
+NUM_PERM = 64           # Permutações da assinatura MinHash
+BANDS = 16              # Bandas do LSH (NUM_PERM / BANDS linhas cada): candidatos a partir de ~50%
+SHINGLE_SIZE = 5        # Palavras por shingle
+NO_DEDUP = {"threshold": 0}
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+WORD_PATTERN = re.compile(r"\w+")
+
+def dedup_config(threshold=DEDUP_THRESHOLD):
+    """Configuração da deduplicação salva junto do índice (threshold 0 desativa)."""
+    if not threshold:
+        return dict(NO_DEDUP)
+    if not 0 < threshold <= 1:
+        raise ValueError("O limiar de deduplicação deve estar entre 0 e 1")
+    return {"threshold": threshold, "num_perm": NUM_PERM, "bands": BANDS, "shingle_size": SHINGLE_SIZE}
+
+def dedup_enabled(config):
+    return bool(config and config.get("threshold"))
+
+class MinHasher:
+    """Assinaturas MinHash dos conjuntos de shingles de palavras de cada texto.
+
+    Os shingles são hasheados com CRC32 (estável entre processos e execuções),
+    então assinaturas salvas continuam comparáveis nas indexações seguintes.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text):
+        """Hashes dos shingles de palavras (minúsculas, sem pontuação)."""
+        words = WORD_PATTERN.findall(text.lower())
+        k = min(self.shingle_size, len(words))
+        if not k:
+            return np.zeros(0, dtype=np.uint64)
+        grams = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+        return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text):
+        hashes = self.shingles(text)
+        if not len(hashes):
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts):
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for i, text in enumerate(texts):
+            signatures[i] = self.signature(text)
+        return signatures
+
+class DedupIndex:
+    """LSH sobre as assinaturas dos chunks representantes.
+
+    Cada assinatura é dividida em bandas; chunks que coincidem em alguma banda
+    são candidatos, e o candidato mais parecido é aceito se a fração de
+    posições iguais das assinaturas (Jaccard estimado) atingir o limiar.
+    """
+
+    def __init__(self, config):
+        self.threshold = config["threshold"]
+        self.bands = config["bands"]
+        self.rows = config["num_perm"] // config["bands"]
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = {}
+
+    def _keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, chunk_id, signature):
+        self._signatures[chunk_id] = signature
+        for band, key in self._keys(signature):
+            self._buckets[band].setdefault(key, []).append(chunk_id)
+
+    def query(self, signature):
+        """Representante quase idêntico à assinatura, ou None."""
+        candidates = set()
+        for band, key in self._keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+        best, best_similarity = None, self.threshold
+        for chunk_id in sorted(candidates):
+            similarity = float(np.mean(self._signatures[chunk_id] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = chunk_id, similarity
+        return best
+
+class Deduplicator:
+    """Atribui um representante a cada chunk novo, à medida que os lotes chegam.
+
+    existing é (canonical, signatures, live) do chunk store atual, onde live
+    já exclui os chunks que serão removidos. Grupos cujo representante será
+    removido mas ainda têm chunks válidos elegem um novo representante
+    (promoted mapeia cada chunk desses grupos ao novo representante).
+    """
+
+    def __init__(self, config, existing=None):
+        self.hasher = MinHasher(config["num_perm"], config["shingle_size"])
+        self.index = DedupIndex(config)
+        self.promoted = {}
+        self.duplicates = 0
+
+        if existing is not None:
+            canonical, signatures, live = existing
+            elected = {}
+            for chunk_id in np.flatnonzero(live):
+                rep = int(canonical[chunk_id])
+                if not live[rep]:
+                    # O primeiro chunk válido do grupo passa a representá-lo
+                    rep = elected.setdefault(rep, int(chunk_id))
+                    self.promoted[int(chunk_id)] = rep
+                if rep == chunk_id:
+                    self.index.add(rep, signatures[chunk_id])
+
+    def assign(self, texts, first_id):
+        """Representantes dos chunks que receberão os IDs first_id, first_id + 1, ...
+
+        Retorna (representantes, assinaturas dos textos).
+        """
+        signatures = self.hasher.signatures(texts)
+        canonical = []
+        for i, signature in enumerate(signatures):
+            rep = self.index.query(signature)
+            if rep is None:
+                rep = first_id + i
+                self.index.add(rep, signature)
+            else:
+                self.duplicates += 1
+            canonical.append(rep)
+        return canonical, signatures
+
+def load_signatures(index_dir, num_perm=NUM_PERM, rows=None):
+    """Assinaturas salvas (uma linha por chunk; com rows, só as primeiras), ou None."""
+    path = os.path.join(index_dir, MINHASH_FILE)
+    if not os.path.exists(path):
+        return None
+    count = -1 if rows is None else rows * num_perm
+    return np.fromfile(path, dtype=np.uint32, count=count).reshape(-1, num_perm)
+
+def save_signatures(signatures, index_dir):
+    path = os.path.join(index_dir, MINHASH_FILE)
+    tmp_path = path + ".tmp"
+    np.ascontiguousarray(signatures, dtype=np.uint32).tofile(tmp_path)
+    os.replace(tmp_path, path)
@@ -0,0 +1,93 @@
+import os
+import hashlib
+import numpy as np
+
+CACHE_DIR = "cache"
+KEYS_FILE = "keys.bin"        # Hashes SHA-1 (20 bytes) na ordem dos vetores
+VECTORS_FILE = "vectors.f32"  # Vetores float32 concatenados
+KEY_SIZE = 20
+
+def cache_key(model_key, text):
+    """Chave de conteúdo: hash do modelo (e configuração) mais o texto."""
+    return hashlib.sha1(f"{model_key}\0{text}".encode("utf-8")).digest()
+
+class EmbeddingCache:
+    """Cache persistente de embeddings endereçado por conteúdo.
+
+    Os vetores ficam em um arquivo float32 contínuo e as chaves em um arquivo
+    de hashes na mesma ordem; ambos só recebem acréscimos. Há um diretório por
+    modelo, já que a dimensão dos vetores depende dele.
+    """
+
+    def __init__(self, model_key, dim, cache_dir=CACHE_DIR):
+        self.model_key = model_key
+        self.dim = dim
+        self.path = os.path.join(cache_dir, hashlib.sha1(model_key.encode("utf-8")).hexdigest()[:16])
+        os.makedirs(self.path, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+        keys_path = os.path.join(self.path, KEYS_FILE)
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        keys = open(keys_path, "rb").read() if os.path.exists(keys_path) else b""
+        num_vectors = os.path.getsize(vectors_path) // (4 * dim) if os.path.exists(vectors_path) else 0
+        # Uma escrita interrompida pode deixar chaves sem vetor (ou o contrário)
+        count = min(len(keys) // KEY_SIZE, num_vectors)
+        self._rows = {keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(count)}
+
+        self._keys_file = open(keys_path, "ab")
+        self._vectors_file = open(vectors_path, "ab")
+        self._keys_file.truncate(count * KEY_SIZE)
+        self._vectors_file.truncate(count * 4 * dim)
+        self._vectors = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _read_vectors(self, rows):
+        if self._vectors is None or len(self._vectors) < len(self._rows):
+            self._vectors_file.flush()
+            self._vectors = np.memmap(os.path.join(self.path, VECTORS_FILE), dtype=np.float32,
+                                      mode="r").reshape(-1, self.dim)
+        return np.asarray(self._vectors[rows])
+
+    def lookup(self, texts):
+        """Procura os textos no cache.
+
+        Retorna (vetores encontrados por posição, posições ausentes). Textos
+        repetidos na lista aparecem uma única vez entre os ausentes; as
+        repetições contam como acertos.
+        """
+        keys = [cache_key(self.model_key, t) for t in texts]
+        found = {i: self._rows[k] for i, k in enumerate(keys) if k in self._rows}
+        vectors = {}
+        if found:
+            positions = list(found)
+            for i, vector in zip(positions, self._read_vectors([found[i] for i in positions])):
+                vectors[i] = vector
+
+        missing, seen = [], set()
+        for i, key in enumerate(keys):
+            if i not in found and key not in seen:
+                seen.add(key)
+                missing.append(i)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return vectors, missing
+
+    def add(self, texts, vectors):
+        """Acrescenta embeddings ao cache."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        for text, vector in zip(texts, vectors):
+            key = cache_key(self.model_key, text)
+            if key in self._rows:
+                continue
+            self._keys_file.write(key)
+            self._vectors_file.write(vector.tobytes())
+            self._rows[key] = len(self._rows)
+        self._keys_file.flush()
+        self._vectors_file.flush()
+
+    def close(self):
+        self._keys_file.close()
+        self._vectors_file.close()
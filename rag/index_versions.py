@@ -0,0 +1,119 @@
+import os
+import time
+import shutil
+
+# Cada indexação é gravada em <índice>/versions/<versão>/ e publicada trocando
+# atomicamente o ponteiro <índice>/CURRENT, que contém o nome da versão ativa.
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+BUILDING_FILE = "BUILDING"  # Versão em construção (ainda não publicada), retomada com --incremental
+KEEP_VERSIONS = 3           # Versões publicadas mantidas em disco, contando a ativa
+
+def _read_pointer(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip() or None
+
+def _write_pointer(path, version):
+    """Grava o ponteiro de forma atômica (arquivo temporário + os.replace)."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def version_dir(root, version):
+    return os.path.join(root, VERSIONS_DIR, version)
+
+def current_version(root):
+    """Nome da versão publicada, ou None (índice sem versões)."""
+    version = _read_pointer(os.path.join(root, CURRENT_FILE))
+    if version and os.path.isdir(version_dir(root, version)):
+        return version
+    return None
+
+def resolve_index_dir(root):
+    """Diretório com os arquivos do índice ativo.
+
+    Índices antigos, gravados direto em root (sem CURRENT), continuam
+    sendo lidos de root.
+    """
+    version = current_version(root)
+    return version_dir(root, version) if version else root
+
+def building_version(root):
+    """Versão cuja construção foi interrompida antes da publicação, ou None."""
+    version = _read_pointer(os.path.join(root, BUILDING_FILE))
+    if version and os.path.isdir(version_dir(root, version)):
+        return version
+    return None
+
+def _version_key(version):
+    """Ordem cronológica dos nomes de versão: <data-hora> e <data-hora>-<n> (n >= 2)."""
+    parts = version.split("-")
+    return parts[:2], int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 1
+
+def new_version(root, source_dir=None, shared=()):
+    """Cria o diretório de uma nova versão e o marca como em construção.
+
+    Com source_dir, os arquivos do índice de origem são levados para a nova
+    versão, que é então estendida pela indexação incremental sem alterar a
+    versão servida. Os arquivos em shared, que a indexação só estende, são
+    ligados por hard link em vez de copiados: quem os estende deve antes
+    truncá-los ao tamanho registrado na origem, e cada versão lê só o
+    tamanho que registrou. Os demais são copiados, pois são regravados
+    (por arquivo temporário e os.replace, o que também desfaz um link).
+    Retorna (versão, diretório).
+    """
+    base = time.strftime("%Y%m%d-%H%M%S")
+    version, n = base, 1
+    while os.path.exists(version_dir(root, version)):
+        n += 1
+        version = f"{base}-{n}"
+    path = version_dir(root, version)
+    os.makedirs(path)
+    if source_dir:
+        for name in os.listdir(source_dir):
+            source = os.path.join(source_dir, name)
+            if not os.path.isfile(source) or name in (CURRENT_FILE, BUILDING_FILE):
+                continue
+            if name in shared:
+                try:
+                    os.link(source, os.path.join(path, name))
+                    continue
+                except OSError:
+                    pass  # Sistema de arquivos sem hard links: copia
+            shutil.copy2(source, os.path.join(path, name))
+    _write_pointer(os.path.join(root, BUILDING_FILE), version)
+    return version, path
+
+def discard_building(root):
+    """Remove a versão em construção (indexação interrompida que não será retomada)."""
+    version = building_version(root)
+    if version:
+        shutil.rmtree(version_dir(root, version), ignore_errors=True)
+    if os.path.exists(os.path.join(root, BUILDING_FILE)):
+        os.remove(os.path.join(root, BUILDING_FILE))
+
+def publish_version(root, version, keep=KEEP_VERSIONS):
+    """Torna a versão ativa e remove as versões publicadas mais antigas.
+
+    Os arquivos da versão são sincronizados com o disco antes de o ponteiro
+    ser trocado, então CURRENT nunca aponta para uma versão incompleta.
+    Processos que ainda usam uma versão removida continuam lendo os
+    arquivos já abertos ou mapeados.
+    """
+    path = version_dir(root, version)
+    for name in os.listdir(path):
+        with open(os.path.join(path, name), "rb") as f:
+            os.fsync(f.fileno())
+    _write_pointer(os.path.join(root, CURRENT_FILE), version)
+    if os.path.exists(os.path.join(root, BUILDING_FILE)):
+        os.remove(os.path.join(root, BUILDING_FILE))
+
+    versions = sorted(os.listdir(os.path.join(root, VERSIONS_DIR)), key=_version_key)
+    older = [v for v in versions if _version_key(v) < _version_key(version)]
+    for old in older[:max(0, len(older) - (keep - 1))]:
+        shutil.rmtree(version_dir(root, old), ignore_errors=True)
@@ -1,33 +1,118 @@
 import os
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
 import faiss
-import pickle
 import json
 import torch
 from transformers import AutoModel, AutoTokenizer
 import numpy as np
+from chunk_store import CHUNKS_FILE, TEXTS_FILE, ChunkStore, ChunkStoreWriter, store_exists
+from vector_index import (INDEX_FILE, INDEX_LOG_FILES, INDEX_TYPES, VECTOR_IDS_FILE, VECTORS_FILE, FullVectorWriter,
+                          build_index, index_params, load_config, load_full_vectors, needs_training, read_index,
+                          save_index, supports_removal, train_index)
+from stats import compute_stats, print_stats, save_stats
+from embedding_cache import EmbeddingCache
+from lookup import build_lookup, save_lookup
+from chunking import (CHUNK_MODES, DEFAULT_CHUNKING, chunking_config, get_tokenizer, print_truncation_stats,
+                      split_page, token_budget, truncation_stats)
+from dedup import (DEDUP_THRESHOLD, MINHASH_FILE, NO_DEDUP, Deduplicator, MinHasher, dedup_config,
+                   dedup_enabled, load_signatures, save_signatures)
+from manifest import MANIFEST_FILE, MANIFEST_VERSION, append_manifest, diff_folders, load_manifest, save_manifest
+from index_versions import (KEEP_VERSIONS, building_version, discard_building, new_version, publish_version,
+                            resolve_index_dir, version_dir)
 
 DATA_DIR = "../leiloes"  # Diretório dos leilões coletados
-INDEX_DIR = "index"
+INDEX_DIR = "index"  # Raiz do índice: versões em versions/ e a ativa em CURRENT
 MODEL_NAME = "deepseek-ai/deepseek-coder-1.3b-base"
+BATCH_SIZE = 16  # Textos por forward pass do modelo
+NUM_THREADS = os.cpu_count() or 1  # Threads do torch em CPU
+MAX_LENGTH = 512  # Tokens máximos por texto
+EXTRACT_WORKERS = os.cpu_count() or 1  # Processos para extração dos PDFs
+QUEUE_SIZE = 4            # Lotes em espera entre duas etapas do pipeline de indexação
+EMBED_BATCH_CHUNKS = 256  # Chunks acumulados por lote de embeddings
+CHECKPOINT_CHUNKS = 2000  # Chunks gravados entre dois checkpoints em disco
+FULL_CHECKPOINT_EVERY = 10  # Checkpoints entre duas gravações completas do índice FAISS e do manifesto
+# Arquivos que a indexação só estende, ligados por hard link entre versões do índice
+SHARED_FILES = (CHUNKS_FILE, TEXTS_FILE, VECTORS_FILE, VECTOR_IDS_FILE, MINHASH_FILE)
 
-def get_embedding(texts, model, tokenizer):
-    """Gera embeddings usando DeepSeek para uma lista de textos"""
-    embeddings = []
-    print(f"[INFO] Processando {len(texts)} textos...")
-    
-    for i, text in enumerate(texts):
-        if i % 100 == 0:  # Progress tracking
-            print(f"  - Processando {i+1}/{len(texts)}")
-            
-        inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-        with torch.no_grad():
-            outputs = model(**inputs)
-        # Usar mean pooling do último hidden state
-        embedding = outputs.last_hidden_state.mean(dim=1)
-        embeddings.append(embedding.numpy().flatten())
-    
-    return np.array(embeddings)
+def prepare_tokenizer(tokenizer):
+    """Garante token de padding e padding à direita para o batching."""
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    # Padding à direita mantém os estados dos tokens reais idênticos ao caso sem padding
+    tokenizer.padding_side = "right"
+    return tokenizer
+
+def mean_pooling(last_hidden_state, attention_mask):
+    """Mean pooling que ignora as posições de padding."""
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    summed = (last_hidden_state * mask).sum(dim=1)
+    counts = mask.sum(dim=1).clamp(min=1)
+    return summed / counts
+
+def get_embedding(texts, model, tokenizer, batch_size=BATCH_SIZE, max_length=MAX_LENGTH, verbose=True,
+                  cache=None):
+    """Gera embeddings usando DeepSeek para uma lista de textos.
+
+    Os textos são tokenizados uma única vez, ordenados pelo número de tokens
+    e processados em lotes, de modo que cada lote tenha pouco padding. A
+    ordem original é restaurada no resultado. Com um EmbeddingCache, apenas
+    os textos ausentes do cache (e não repetidos) passam pelo modelo.
+    """
+    if cache is None:
+        return _embed_batches(texts, model, tokenizer, batch_size, max_length, verbose)
+
+    cached, missing = cache.lookup(texts)
+    missing_texts = [texts[i] for i in missing]
+    computed = _embed_batches(missing_texts, model, tokenizer, batch_size, max_length, verbose)
+    cache.add(missing_texts, computed)
+    if verbose:
+        print(f"[INFO] Cache de embeddings: {len(texts) - len(missing)} hits, {len(missing)} misses")
+
+    by_text = dict(zip(missing_texts, computed))
+    return np.array([cached[i] if i in cached else by_text[t] for i, t in enumerate(texts)],
+                    dtype=np.float32).reshape(len(texts), -1)
+
+def _embed_batches(texts, model, tokenizer, batch_size, max_length, verbose):
+    """Executa o modelo em lotes ordenados por tamanho (ver get_embedding)."""
+    if verbose:
+        print(f"[INFO] Processando {len(texts)} textos (batch_size={batch_size})...")
+    if not texts:
+        return np.zeros((0, model.config.hidden_size), dtype=np.float32)
+
+    prepare_tokenizer(tokenizer)
+    encodings = tokenizer(list(texts), truncation=True, max_length=max_length)
+    input_ids = encodings["input_ids"]
+    order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+
+    embeddings = [None] * len(texts)
+    start_time = time.time()
+    with torch.inference_mode():
+        for batch_start in range(0, len(order), batch_size):
+            batch_idx = order[batch_start:batch_start + batch_size]
+            if verbose and batch_start % (batch_size * 10) == 0:  # Progress tracking
+                print(f"  - Processando {batch_start+1}/{len(texts)}")
+
+            batch = tokenizer.pad(
+                {"input_ids": [input_ids[i] for i in batch_idx]},
+                padding=True,
+                return_tensors="pt",
+            )
+            outputs = model(**batch)
+            pooled = mean_pooling(outputs.last_hidden_state, batch["attention_mask"])
+            for i, vector in zip(batch_idx, pooled.float().numpy()):
+                embeddings[i] = vector
+
+    elapsed = time.time() - start_time
+    rate = len(texts) / elapsed if elapsed > 0 else float("inf")
+    if verbose:
+        print(f"[INFO] {len(texts)} embeddings em {elapsed:.2f}s ({rate:.2f} chunks/s)")
+    return np.array(embeddings, dtype=np.float32)
 
 def load_metadata(metadata_path):
     """Carrega metadados de um leilão."""
@@ -38,41 +123,25 @@ def load_metadata(metadata_path):
         print(f"[AVISO] Erro ao carregar metadata {metadata_path}: {e}")
         return {}
 
-def extract_text_chunks(pdf_path, metadata, chunk_size=700, overlap=150):
-    """Extrai chunks de texto de um PDF com metadados enriquecidos."""
+def extract_text_chunks(pdf_path, chunking=DEFAULT_CHUNKING):
+    """Extrai chunks de texto de um PDF.
+
+    O texto de cada página é dividido conforme a configuração de chunking
+    (janelas de palavras ou de tokens do modelo; ver chunking.py). Os
+    metadados do leilão não são copiados para os chunks: ficam uma única vez
+    por leilão no chunk store.
+    """
     try:
         doc = fitz.open(pdf_path)
         chunks = []
         
         for page_num, page in enumerate(doc, start=1):
-            text = page.get_text("text")
-            words = text.split()
-            
-            if not words:  # Pular páginas vazias
-                continue
-                
-            step = chunk_size - overlap
-            for start in range(0, len(words), step):
-                chunk_text = " ".join(words[start:start+chunk_size])
-                
-                # Criar chunk enriquecido com metadados
-                chunk = {
+            for chunk_text in split_page(page, chunking):
+                chunks.append({
                     "doc_id": os.path.basename(pdf_path),
-                    "leilao_folder": os.path.basename(os.path.dirname(pdf_path)),
                     "page": page_num,
                     "text": chunk_text,
-                    # Metadados do leilão
-                    "leilao_id": metadata.get('leilao_id', ''),
-                    "codigo_zuk": metadata.get('codigo_zuk', ''),
-                    "preco": metadata.get('preco', ''),
-                    "tipo_imovel": metadata.get('tipo_imovel', ''),
-                    "cidade": metadata.get('cidade', ''),
-                    "bairro": metadata.get('bairro', ''),
-                    "endereco_completo": metadata.get('endereco_completo', ''),
-                    "comitente": metadata.get('comitente', ''),
-                    "url": metadata.get('url', ''),
-                }
-                chunks.append(chunk)
+                })
         
         doc.close()
         return chunks
@@ -81,108 +150,675 @@ def extract_text_chunks(pdf_path, metadata, chunk_size=700, overlap=150):
         print(f"[ERRO] Erro ao processar PDF {pdf_path}: {e}")
         return []
 
-def main():
-    print("[INFO] Iniciando indexação dos leilões...")
-    os.makedirs(INDEX_DIR, exist_ok=True)
+def load_model(num_threads=NUM_THREADS):
+    """Carrega tokenizer e modelo de embeddings e detecta o embedding size."""
+    torch.set_num_threads(num_threads)
+    print(f"[INFO] Threads do torch: {num_threads}")
     
     # Carregar modelo de embeddings
     print("[INFO] Carregando modelo de embeddings...")
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    tokenizer = prepare_tokenizer(AutoTokenizer.from_pretrained(MODEL_NAME))
     model = AutoModel.from_pretrained(MODEL_NAME)
+    model.eval()
     
     # Descobrir o embedding size real
     dummy_input = tokenizer("teste", return_tensors="pt")
-    with torch.no_grad():
+    with torch.inference_mode():
         dummy_output = model(**dummy_input)
-    actual_embedding_size = dummy_output.last_hidden_state.shape[-1]
-    print(f"[INFO] Embedding size detectado: {actual_embedding_size}")
+    embedding_size = dummy_output.last_hidden_state.shape[-1]
+    print(f"[INFO] Embedding size detectado: {embedding_size}")
+    return model, tokenizer, embedding_size
+
+def load_existing_index(index_dir):
+    """Carrega índice, configuração e manifesto de uma indexação anterior.
+
+    Retorna None se algum arquivo estiver ausente ou se o índice não for
+    mapeado por IDs (índices antigos precisam ser reconstruídos).
+    """
+    index_path = os.path.join(index_dir, INDEX_FILE)
+    if not os.path.exists(index_path) or not os.path.exists(os.path.join(index_dir, MANIFEST_FILE)):
+        return None
+    if not store_exists(index_dir):
+        return None
     
-    # Usar o embedding size real em vez da constante
-    embedding_size = actual_embedding_size
+    index = read_index(index_dir, mmap=False)
+    if not isinstance(index, faiss.IndexIDMap2) and faiss.try_extract_index_ivf(index) is None:
+        print("[AVISO] Índice existente não é mapeado por IDs.")
+        return None
     
-    all_chunks = []
-    processed_leiloes = 0
-    processed_pdfs = 0
+    manifest = load_manifest(index_dir)
+    checkpoint = manifest.get("checkpoint")
+    if checkpoint and "index_vectors" in checkpoint:
+        # Vetores acrescentados desde a última gravação do índice vêm do log do índice
+        if index.ntotal != checkpoint["index_vectors"]:
+            print("[AVISO] Índice existente não corresponde ao último checkpoint (gravação interrompida).")
+            return None
+        rows = checkpoint.get("index_log_rows", 0)
+        if rows:
+            logged = load_full_vectors(index_dir, index.d, rows, files=INDEX_LOG_FILES)
+            if logged is None or len(logged[0]) != rows:
+                print("[AVISO] Log do índice incompleto.")
+                return None
+            index.add_with_ids(np.array(logged[1]), logged[0])
+            print(f"[INFO] {rows} vetores reaplicados a partir do log do índice")
+    if checkpoint:
+        # Vetores gravados depois do último checkpoint (execução interrompida) são descartados
+        if supports_removal(index):
+            discarded = index.remove_ids(faiss.IDSelectorRange(checkpoint["chunks"], 2 ** 62))
+        else:
+            discarded = int(np.count_nonzero(faiss.vector_to_array(index.id_map) >= checkpoint["chunks"]))
+            if discarded:
+                print("[AVISO] Índice existente tem vetores após o último checkpoint e não permite removê-los.")
+                return None
+        if discarded:
+            print(f"[AVISO] {discarded} vetores gravados após o último checkpoint foram descartados")
     
-    # Percorrer todas as pastas de leilões
-    if not os.path.exists(DATA_DIR):
-        print(f"[ERRO] Diretório {DATA_DIR} não encontrado!")
+    return index, load_config(index_dir), manifest
+
+def _extract_task(task):
+    """Tarefa de extração executada nos processos do pool."""
+    pdf_path, chunking = task
+    return extract_text_chunks(pdf_path, chunking)
+
+def extract_pdfs(tasks, workers=EXTRACT_WORKERS):
+    """Extrai os chunks de vários PDFs, na ordem das tarefas.
+
+    Com mais de um worker, os PDFs são distribuídos entre processos e os
+    resultados são entregues à medida que ficam prontos, preservando a ordem.
+    No máximo 2 * workers PDFs ficam em andamento ou aguardando o consumidor,
+    então a memória não cresce com o número de PDFs. Erros em um PDF ficam
+    isolados em extract_text_chunks.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield _extract_task(task)
         return
     
-    leilao_folders = [f for f in os.listdir(DATA_DIR) if f.startswith('leilao_')]
-    print(f"[INFO] Encontradas {len(leilao_folders)} pastas de leilões")
-    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_extract_task, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def extract_folders(leilao_folders, workers=EXTRACT_WORKERS, chunking=DEFAULT_CHUNKING):
+    """Extrai os chunks das pastas de leilão, uma pasta por vez e em ordem.
+
+    Gera tuplas (pasta, metadados, chunks, número de PDFs).
+    """
+    tasks = []
+    folder_pdfs = []
     for leilao_folder in leilao_folders:
         leilao_path = os.path.join(DATA_DIR, leilao_folder)
         
-        if not os.path.isdir(leilao_path):
-            continue
-            
-        print(f"[INFO] Processando: {leilao_folder}")
-        
         # Carregar metadados do leilão
         metadata_path = os.path.join(leilao_path, "metadata.json")
         metadata = load_metadata(metadata_path) if os.path.exists(metadata_path) else {}
         
         # Processar todos os PDFs na pasta
-        pdf_files = [f for f in os.listdir(leilao_path) if f.lower().endswith('.pdf')]
-        
+        pdf_files = sorted(f for f in os.listdir(leilao_path) if f.lower().endswith('.pdf'))
+        tasks.extend((os.path.join(leilao_path, pdf_file), chunking) for pdf_file in pdf_files)
+        folder_pdfs.append((leilao_folder, metadata, pdf_files))
+    
+    results = extract_pdfs(tasks, workers)
+    for leilao_folder, metadata, pdf_files in folder_pdfs:
+        print(f"[INFO] Processando: {leilao_folder}")
+        chunks = []
         for pdf_file in pdf_files:
-            pdf_path = os.path.join(leilao_path, pdf_file)
-            print(f"  - Extraindo texto de: {pdf_file}")
-            
-            chunks = extract_text_chunks(pdf_path, metadata)
-            all_chunks.extend(chunks)
-            processed_pdfs += 1
+            pdf_chunks = next(results)
+            print(f"  - Texto extraído de: {pdf_file} ({len(pdf_chunks)} chunks)")
+            chunks.extend(pdf_chunks)
+        yield leilao_folder, metadata, chunks, len(pdf_files)
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+def pipeline_stage(items, maxsize=QUEUE_SIZE):
+    """Executa um gerador em uma thread, entregando os itens por uma fila limitada.
+
+    A etapa produtora fica no máximo maxsize itens à frente da consumidora
+    (quando a fila enche, ela espera); exceções são repassadas ao consumidor.
+    """
+    buffer = queue.Queue(maxsize)
+    end = object()
+
+    def produce():
+        try:
+            for item in items:
+                buffer.put(item)
+        except BaseException as e:
+            buffer.put(_StageError(e))
+            return
+        buffer.put(end)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is end:
+            return
+        if isinstance(item, _StageError):
+            raise item.error
+        yield item
+
+class Embedder:
+    """Gera embeddings em lotes; o modelo e o cache são carregados no primeiro uso.
+
+    texts e seconds acumulam os textos processados e o tempo gasto (sem a
+    carga do modelo), para o resumo da indexação.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, num_threads=NUM_THREADS, use_cache=True):
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.use_cache = use_cache
+        self.model = None
+        self.cache = None
+        self.texts = 0
+        self.seconds = 0.0
+
+    def embed(self, texts):
+        if self.model is None:
+            self.model, self.tokenizer, embedding_size = load_model(self.num_threads)
+            if self.use_cache:
+                self.cache = EmbeddingCache(f"{MODEL_NAME}|max_length={MAX_LENGTH}", embedding_size)
+        start = time.time()
+        vectors = get_embedding(texts, self.model, self.tokenizer, batch_size=self.batch_size, verbose=False,
+                                cache=self.cache)
+        self.texts += len(texts)
+        self.seconds += time.time() - start
+        return vectors
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+def _embed_batch(folders, first_id, embedder, deduplicator):
+    """Deduplica e gera os embeddings de um lote de pastas extraídas."""
+    texts = [c["text"] for _, _, chunks, _ in folders for c in chunks]
+    chunk_ids = range(first_id, first_id + len(texts))
+    if deduplicator is not None:
+        canonical, signatures = deduplicator.assign(texts, first_id)
+    else:
+        canonical, signatures = list(chunk_ids), None
+    vector_ids = [chunk_id for chunk_id, rep in zip(chunk_ids, canonical) if chunk_id == rep]
+    vectors = embedder.embed([texts[chunk_id - first_id] for chunk_id in vector_ids]) if vector_ids else None
+    return {"folders": folders, "first_id": first_id, "canonical": canonical, "signatures": signatures,
+            "vector_ids": vector_ids, "vectors": vectors}
+
+def embed_stage(extracted, first_id, embedder, deduplicator=None, promoted=(), batch_chunks=EMBED_BATCH_CHUNKS):
+    """Etapa de embeddings: agrupa as pastas extraídas em lotes de ~batch_chunks chunks.
+
+    promoted são os (ID, texto) de chunks existentes que passaram a
+    representar um grupo de quase duplicatas e precisam de vetor; eles vão
+    no primeiro lote gerado, sem pastas.
+    """
+    if promoted:
+        ids = [chunk_id for chunk_id, _ in promoted]
+        yield {"folders": [], "first_id": first_id, "canonical": [], "signatures": None,
+               "vector_ids": ids, "vectors": embedder.embed([text for _, text in promoted])}
+    
+    batch, size = [], 0
+    for folder in extracted:
+        batch.append(folder)
+        size += len(folder[2])
+        if size >= batch_chunks:
+            yield _embed_batch(batch, first_id, embedder, deduplicator)
+            first_id += size
+            batch, size = [], 0
+    if batch:
+        yield _embed_batch(batch, first_id, embedder, deduplicator)
+
+class IndexWriter:
+    """Última etapa do pipeline: grava chunks, vetores e manifesto.
+
+    Índices que precisam de treinamento (IVF, sq8) guardam os primeiros
+    vetores (até train_size) para treinar e criar o índice; depois disso os
+    vetores vão direto para o índice. Com re-ranking, os vetores float32
+    completos também são gravados em vectors.bin. A cada checkpoint_chunks
+    chunks o chunk store, o índice, as assinaturas MinHash e o manifesto são
+    salvos (o manifesto por último, registrando a posição do store), então
+    uma interrupção preserva tudo até o último checkpoint e --incremental
+    continua dali.
+
+    Para que o custo de um checkpoint não cresça com o índice, os checkpoints
+    só acrescentam dados aos arquivos: os vetores novos vão para o log do
+    índice (INDEX_LOG_FILES), os leilões para leiloes.log e as pastas para
+    manifest.log. O índice FAISS, a tabela de leilões e o manifesto só são
+    regravados por inteiro no primeiro checkpoint, a cada full_every
+    checkpoints e no final, quando os logs são esvaziados.
+    """
+
+    def __init__(self, index_dir, store, manifest, fingerprints, index=None, index_config=None, index_type="flat",
+                 params=None, extra_config=None, dedup=None, checkpoint_chunks=CHECKPOINT_CHUNKS,
+                 full_every=FULL_CHECKPOINT_EVERY):
+        self.index_dir = index_dir
+        self.store = store
+        self.manifest = manifest
+        self.fingerprints = fingerprints
+        self.index = index
+        self.index_config = index_config
+        self.index_type = index_type
+        self.params = params
+        self.extra_config = extra_config or {}
+        self.checkpoint_chunks = checkpoint_chunks
+        self.full_every = full_every
+        self.signatures_file = open(os.path.join(index_dir, MINHASH_FILE), "ab") if dedup_enabled(dedup) else None
+        self.counts = {"leiloes": 0, "pdfs": 0, "chunks": 0, "vectors": 0, "checkpoints": 0}
+        self._pending_ids = []
+        self._pending_vectors = []
+        self._since_checkpoint = 0
+        self._since_full = None  # Checkpoints desde a última gravação completa (None: nenhuma nesta execução)
+        self._new_folders = {}
+
+        self.full_vectors = None
+        self.index_log = None
+        if index_config is not None:
+            self.rerank = bool(index_config.get("rerank_factor"))
+            if self.rerank:
+                rows = manifest.get("checkpoint", {}).get("vector_rows")
+                self.full_vectors = FullVectorWriter(index_dir, index_config["dim"], append=True, rows=rows)
+            self.index_log = FullVectorWriter(index_dir, index_config["dim"], append=True,
+                                              rows=manifest.get("checkpoint", {}).get("index_log_rows", 0),
+                                              files=INDEX_LOG_FILES)
+        else:
+            self.rerank = bool(index_params(params)["rerank_factor"])
+
+    def _create_index(self, dim, num_vectors):
+        print(f"[INFO] Criando índice FAISS ({self.index_type})...")
+        self.index, self.index_config = build_index(self.index_type, dim, num_vectors, self.params)
+        self.index_config.update(self.extra_config)
+        self.index_log = FullVectorWriter(self.index_dir, dim, files=INDEX_LOG_FILES)
+
+    def _train_pending(self):
+        vectors = np.concatenate(self._pending_vectors)
+        self._create_index(vectors.shape[1], min(len(vectors), index_params(self.params)["train_size"]))
+        train_index(self.index, vectors, self.index_config["train_size"])
+        self.index.add_with_ids(vectors, np.array(self._pending_ids, dtype=np.int64))
+        self.index_log.add(self._pending_ids, vectors)
+        self._pending_ids, self._pending_vectors = [], []
+
+    def add_vectors(self, ids, vectors):
+        if self.index is None and not needs_training(self.index_type):
+            self._create_index(vectors.shape[1], len(vectors))
+        if self.rerank:
+            if self.full_vectors is None:
+                self.full_vectors = FullVectorWriter(self.index_dir, vectors.shape[1])
+            self.full_vectors.add(ids, vectors)
+        self.counts["vectors"] += len(ids)
+        if self.index is None:
+            # Aguardando vetores suficientes para treinar o índice
+            self._pending_ids.extend(ids)
+            self._pending_vectors.append(vectors)
+            if len(self._pending_ids) >= index_params(self.params)["train_size"]:
+                self._train_pending()
+            return
+        self.index.add_with_ids(vectors, np.array(ids, dtype=np.int64))
+        self.index_log.add(ids, vectors)
+
+    def write(self, batch):
+        """Grava um lote produzido por embed_stage."""
+        if self.store.num_chunks != batch["first_id"]:
+            raise RuntimeError("IDs dos chunks gravados não correspondem aos previstos no lote")
+        position = 0
+        for leilao_folder, metadata, chunks, n_pdfs in batch["folders"]:
+            print(f"[INFO] Indexando: {leilao_folder} ({len(chunks)} chunks)")
+            leilao_idx = self.store.add_leilao(leilao_folder, metadata)
+            chunk_ids = []
+            for c in chunks:
+                chunk_ids.append(self.store.add_chunk(leilao_idx, c["doc_id"], c["page"], c["text"],
+                                                      batch["canonical"][position]))
+                position += 1
+            self.manifest["folders"][leilao_folder] = self._new_folders[leilao_folder] = {
+                "files": self.fingerprints[leilao_folder],
+                "leilao_idx": leilao_idx,
+                "chunk_ids": chunk_ids,
+            }
+            self.counts["leiloes"] += 1
+            self.counts["pdfs"] += n_pdfs
+        if batch["signatures"] is not None:
+            self.signatures_file.write(np.ascontiguousarray(batch["signatures"], dtype=np.uint32).tobytes())
+        if batch["vectors"] is not None:
+            self.add_vectors(batch["vector_ids"], batch["vectors"])
         
-        processed_leiloes += 1
+        self.counts["chunks"] += position
+        self._since_checkpoint += position
+        if self._since_checkpoint >= self.checkpoint_chunks:
+            self.checkpoint()
+
+    def checkpoint(self, full=False):
+        """Salva o estado atual em disco (não é possível enquanto o índice aguarda treinamento).
+
+        Fora das gravações completas (ver a classe), só acrescenta aos arquivos.
+        """
+        if self.index is None:
+            return False
+        full = full or self._since_full is None or self._since_full + 1 >= self.full_every
+        self.store.flush(full)
+        if self.signatures_file is not None:
+            self.signatures_file.flush()
+        if self.full_vectors is not None:
+            self.full_vectors.flush()
+        checkpoint = self.store.checkpoint()
+        if self.full_vectors is not None:
+            checkpoint["vector_rows"] = self.full_vectors.rows
+        if full:
+            if self.full_vectors is not None:
+                # Linhas de vectors.bin que pertencem a esta versão do índice (ver load_reranker)
+                self.index_config["vector_rows"] = self.full_vectors.rows
+            save_index(self.index, self.index_config, self.index_dir)
+            self._index_vectors = self.index.ntotal
+            checkpoint.update(index_vectors=self._index_vectors, index_log_rows=0)
+            self.manifest["checkpoint"] = checkpoint
+            save_manifest(self.manifest, self.index_dir)
+            self.index_log.reset()
+            self._since_full = 0
+        else:
+            self.index_log.flush()
+            checkpoint.update(index_vectors=self._index_vectors, index_log_rows=self.index_log.rows)
+            self.manifest["checkpoint"] = checkpoint
+            append_manifest(self.index_dir, self._new_folders, checkpoint)
+            self._since_full += 1
+        self._new_folders = {}
+        self.counts["checkpoints"] += 1
+        self._since_checkpoint = 0
+        return True
+
+    def close(self):
+        """Treina o índice se ainda necessário, salva o checkpoint final e fecha os arquivos."""
+        if self._pending_ids:
+            self._train_pending()
+        saved = self.checkpoint(full=True)
+        self.store.close()
+        if self.signatures_file is not None:
+            self.signatures_file.close()
+        if self.full_vectors is not None:
+            self.full_vectors.close()
+        if self.index_log is not None:
+            self.index_log.close()
+            for path in self.index_log.paths:
+                os.remove(path)
+        return saved
+
+def prepare_dedup(index_dir, dedup, append, stale_ids):
+    """Deduplicador dos chunks novos e os (ID, texto) dos representantes promovidos.
+
+    No modo incremental, o LSH é carregado com os representantes existentes
+    e o arquivo de assinaturas é alinhado ao chunk store (truncado após uma
+    interrupção, ou recalculado se estiver faltando).
+    """
+    if not dedup_enabled(dedup):
+        return None, []
+    if not append:
+        return Deduplicator(dedup), []
+    
+    store = ChunkStore(index_dir)
+    live = store.live_mask()
+    live[stale_ids] = False
+    signatures = load_signatures(index_dir, dedup["num_perm"], len(store))
+    if signatures is None or len(signatures) < len(store):
+        print("[AVISO] Assinaturas MinHash ausentes; recalculando para os chunks existentes.")
+        hasher = MinHasher(dedup["num_perm"], dedup["shingle_size"])
+        signatures = hasher.signatures([store.text(i) for i in range(len(store))])
+        save_signatures(signatures, index_dir)
+    else:
+        # Sem regravar o arquivo, que pode ser compartilhado com a versão de origem
+        os.truncate(os.path.join(index_dir, MINHASH_FILE), signatures.nbytes)
+    
+    deduplicator = Deduplicator(dedup, (store.canonical, signatures, live))
+    promoted = [(chunk_id, store.text(chunk_id)) for chunk_id, rep in deduplicator.promoted.items()
+                if chunk_id == rep]
+    store.close()
+    return deduplicator, promoted
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Indexação dos editais de leilões")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Textos por forward pass (1 reproduz o loop texto a texto)")
+    parser.add_argument("--threads", type=int, default=NUM_THREADS,
+                        help="Número de threads do torch em CPU")
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS,
+                        help="Processos para extração e chunking dos PDFs (1 = serial)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Processa apenas pastas novas, alteradas ou removidas desde a última indexação")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Não usa o cache de embeddings em disco")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=None,
+                        help="Tipo do índice FAISS (padrão: flat, ou o do índice existente no modo incremental)")
+    parser.add_argument("--nlist", type=int, help="IVF: número de listas (padrão automático)")
+    parser.add_argument("--nprobe", type=int, help="IVF: listas visitadas por busca")
+    parser.add_argument("--pq-m", type=int, help="IVF-PQ: número de subquantizadores")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW: vizinhos por nó")
+    parser.add_argument("--ef-search", type=int, help="HNSW: largura da busca na consulta")
+    parser.add_argument("--train-size", type=int, help="Vetores amostrados para treinar o índice")
+    parser.add_argument("--rerank-factor", type=int,
+                        help="Candidatos por resultado reordenados com os vetores float32 completos, gravados "
+                             "em vectors.bin (padrão: 0, desligado; sugerido: 4 em fp16/sq8/ivf-pq)")
+    parser.add_argument("--chunker", choices=CHUNK_MODES, default=None,
+                        help="Divisão dos textos: janelas de palavras ou de tokens do modelo "
+                             "(padrão: words, ou o do índice existente no modo incremental)")
+    parser.add_argument("--chunk-size", type=int,
+                        help="Tamanho dos chunks, em palavras ou tokens conforme --chunker")
+    parser.add_argument("--chunk-overlap", type=int, help="Sobreposição entre chunks consecutivos")
+    parser.add_argument("--no-paragraphs", action="store_true",
+                        help="tokens: não prioriza cortes em inícios de parágrafo")
+    parser.add_argument("--truncation-report", action="store_true",
+                        help=f"Mostra quanto texto do índice atual é perdido na truncagem em {MAX_LENGTH} tokens e sai")
+    parser.add_argument("--dedup-threshold", type=float, default=None,
+                        help=f"Similaridade a partir da qual chunks são quase duplicatas e compartilham um vetor "
+                             f"(padrão: {DEDUP_THRESHOLD}, ou o do índice existente no modo incremental; 0 desativa)")
+    parser.add_argument("--keep-versions", type=int, default=KEEP_VERSIONS,
+                        help="Versões publicadas do índice mantidas em disco, contando a nova")
+    return parser.parse_args()
+
+def resolve_chunking(mode, size=None, overlap=None, paragraphs=True):
+    """Configuração de chunking pedida na linha de comando (None = não informada).
+
+    No modo por tokens, o tamanho é limitado ao que cabe em MAX_LENGTH junto
+    com os tokens especiais, para que nenhum chunk seja truncado.
+    """
+    if mode is None:
+        return None
+    chunking = chunking_config(mode, size, overlap, paragraphs, MODEL_NAME)
+    if mode == "tokens":
+        budget = token_budget(get_tokenizer(MODEL_NAME), MAX_LENGTH)
+        if chunking["size"] > budget:
+            print(f"[AVISO] {chunking['size']} tokens não cabem em {MAX_LENGTH}; usando {budget}.")
+            chunking["size"] = budget
+    if chunking["overlap"] >= chunking["size"]:
+        raise ValueError("A sobreposição deve ser menor que o tamanho dos chunks")
+    return chunking
+
+def truncation_report(index_dir=INDEX_DIR, max_length=MAX_LENGTH):
+    """Estatísticas de truncagem dos chunks do índice atual."""
+    index_dir = resolve_index_dir(index_dir)
+    if not store_exists(index_dir):
+        print(f"[ERRO] Nenhum chunk store em {index_dir}/")
+        return None
+    store = ChunkStore(index_dir)
+    texts = [store.text(i) for i in np.flatnonzero(store.live_mask())]
+    store.close()
+    chunking = load_config(index_dir).get("chunking", DEFAULT_CHUNKING)
+    print(f"[INFO] Chunking do índice: {chunking}")
+    stats = truncation_stats(texts, get_tokenizer(MODEL_NAME), max_length)
+    print_truncation_stats(stats)
+    return stats
+
+def main(batch_size=BATCH_SIZE, num_threads=NUM_THREADS, incremental=False, workers=EXTRACT_WORKERS,
+         index_type=None, index_options=None, use_cache=True, chunking=None, dedup=None, keep_versions=KEEP_VERSIONS):
+    print("[INFO] Iniciando indexação dos leilões...")
+    os.makedirs(INDEX_DIR, exist_ok=True)
     
-    if not all_chunks:
+    # Percorrer todas as pastas de leilões
+    if not os.path.exists(DATA_DIR):
+        print(f"[ERRO] Diretório {DATA_DIR} não encontrado!")
+        return
+    
+    leilao_folders = sorted(
+        f for f in os.listdir(DATA_DIR)
+        if f.startswith('leilao_') and os.path.isdir(os.path.join(DATA_DIR, f))
+    )
+    print(f"[INFO] Encontradas {len(leilao_folders)} pastas de leilões")
+    
+    index = None
+    index_config = None
+    manifest = {"version": MANIFEST_VERSION, "folders": {}}
+    
+    # Cada indexação grava uma nova versão em INDEX_DIR/versions/, publicada
+    # só no final; a versão ativa continua sendo servida durante a indexação.
+    # Uma versão em construção interrompida é retomada com --incremental.
+    resumed = building_version(INDEX_DIR) if incremental else None
+    if incremental:
+        source_dir = version_dir(INDEX_DIR, resumed) if resumed else resolve_index_dir(INDEX_DIR)
+        existing = load_existing_index(source_dir)
+        if resumed and existing is None:
+            # Interrompida antes do primeiro checkpoint: parte da versão ativa
+            discard_building(INDEX_DIR)
+            resumed, source_dir = None, resolve_index_dir(INDEX_DIR)
+            existing = load_existing_index(source_dir)
+        if resumed:
+            print(f"[INFO] Retomando a versão {resumed}, interrompida antes da publicação")
+        if existing is None:
+            print("[AVISO] Nenhuma indexação incremental anterior encontrada. Reconstruindo do zero.")
+        elif index_type and existing[1].get("index_type") != index_type:
+            print(f"[AVISO] Índice existente é {existing[1].get('index_type')}, não {index_type}. Reconstruindo do zero.")
+        elif chunking and existing[1].get("chunking", DEFAULT_CHUNKING) != chunking:
+            print("[AVISO] Índice existente usa outro chunking. Reconstruindo do zero.")
+        elif dedup and existing[1].get("dedup", NO_DEDUP) != dedup:
+            print("[AVISO] Índice existente usa outra deduplicação. Reconstruindo do zero.")
+        else:
+            index, index_config, manifest = existing
+            chunking = index_config.get("chunking", DEFAULT_CHUNKING)
+            dedup = index_config.get("dedup", NO_DEDUP)
+            print(f"[INFO] Índice existente ({index_config['index_type']}) carregado com {index.ntotal} vetores")
+    chunking = chunking or DEFAULT_CHUNKING
+    dedup = dedup or dedup_config()
+    print(f"[INFO] Chunking: {chunking}")
+    
+    changed, removed, unchanged, fingerprints = diff_folders(manifest, DATA_DIR, leilao_folders)
+    
+    if index is not None and not supports_removal(index) and any(f in manifest["folders"] for f in removed + changed):
+        print("[AVISO] O índice atual não permite remover vetores. Reconstruindo do zero.")
+        index, index_config = None, None
+        manifest = {"version": MANIFEST_VERSION, "folders": {}}
+        changed, removed, unchanged, fingerprints = diff_folders(manifest, DATA_DIR, leilao_folders)
+    print(f"[INFO] Pastas: {len(changed)} novas/alteradas, {len(removed)} removidas, {len(unchanged)} inalteradas")
+    
+    if index is not None and not changed and not removed and not resumed:
+        print("[INFO] Nenhuma alteração desde a última indexação.")
+        return
+    
+    # Diretório da nova versão: a versão retomada, uma cópia da versão ativa
+    # (incremental) ou um diretório vazio (reconstrução)
+    append = index is not None
+    if append and resumed:
+        version, build_dir = resumed, source_dir
+    elif append:
+        # Arquivos só estendidos são compartilhados com a versão de origem; o
+        # checkpoint registra até onde eles valem para ela
+        shared = SHARED_FILES if manifest.get("checkpoint") else ()
+        version, build_dir = new_version(INDEX_DIR, source_dir, shared)
+    else:
+        discard_building(INDEX_DIR)
+        version, build_dir = new_version(INDEX_DIR)
+    print(f"[INFO] Gravando a versão {version} em {build_dir}/")
+    
+    # Gravar chunks no store (acrescentando, no modo incremental, a partir do último checkpoint)
+    store = ChunkStoreWriter(build_dir, append=append, checkpoint=manifest.get("checkpoint"))
+    
+    # Remover vetores de pastas removidas ou alteradas (chunks sem vetor próprio são ignorados)
+    stale_ids = []
+    for leilao_folder in removed + changed:
+        entry = manifest["folders"].pop(leilao_folder, None)
+        if entry:
+            stale_ids.extend(entry["chunk_ids"])
+            store.remove_leilao(entry["leilao_idx"])
+    if stale_ids:
+        removed_vectors = index.remove_ids(np.array(stale_ids, dtype=np.int64))
+        print(f"[INFO] {removed_vectors} vetores removidos do índice")
+    store.flush()
+    
+    # Grupos de quase duplicatas cujo representante foi removido passam a apontar para o novo
+    deduplicator, promoted = prepare_dedup(build_dir, dedup, append, stale_ids)
+    if deduplicator is not None:
+        for chunk_id, rep in deduplicator.promoted.items():
+            store.set_canonical(chunk_id, rep)
+    
+    writer = IndexWriter(build_dir, store, manifest, fingerprints, index, index_config, index_type or "flat",
+                         index_options, {"chunking": chunking, "dedup": dedup}, dedup)
+    embedder = Embedder(batch_size, num_threads, use_cache)
+    
+    # Pipeline: extração (processos) -> deduplicação e embeddings -> gravação,
+    # com filas limitadas entre as etapas
+    start = time.time()
+    extracted = pipeline_stage(extract_folders(changed, workers, chunking))
+    batches = pipeline_stage(embed_stage(extracted, store.num_chunks, embedder, deduplicator, promoted))
+    for batch in batches:
+        writer.write(batch)
+        elapsed = time.time() - start
+        print(f"[INFO] {writer.counts['chunks']} chunks e {writer.counts['vectors']} vetores gravados "
+              f"({writer.counts['chunks'] / elapsed:.2f} chunks/s)")
+    embedder.close()
+    
+    if not writer.close():
         print("[AVISO] Nenhum chunk extraído! Verifique se há PDFs nas pastas dos leilões.")
+        discard_building(INDEX_DIR)
         return
+    index = writer.index
+    
+    elapsed = time.time() - start
+    print(f"[INFO] Total processado em {elapsed:.2f}s ({workers} workers):")
+    print(f"  - {writer.counts['leiloes']} leilões processados")
+    print(f"  - {writer.counts['pdfs']} PDFs processados")
+    print(f"  - {writer.counts['chunks']} chunks de texto extraídos")
+    print(f"  - {writer.counts['checkpoints']} checkpoints gravados")
+    if embedder.texts:
+        print(f"  - {embedder.texts} embeddings em {embedder.seconds:.2f}s "
+              f"({embedder.texts / max(embedder.seconds, 1e-9):.2f} chunks/s)")
+    if embedder.cache is not None:
+        print(f"  - Cache de embeddings: {embedder.cache.hits} hits, {embedder.cache.misses} misses")
+    if deduplicator is not None:
+        print(f"  - {deduplicator.duplicates} chunks quase duplicados (limiar {dedup['threshold']}), "
+              f"sem vetor próprio")
+    
+    index_bytes = os.path.getsize(os.path.join(build_dir, INDEX_FILE))
+    if writer.rerank:
+        vectors_bytes = sum(os.path.getsize(os.path.join(build_dir, name)) for name in (VECTORS_FILE, VECTOR_IDS_FILE)
+                            if os.path.exists(os.path.join(build_dir, name)))
+        print(f"  - Espaço em disco: índice {index_bytes / 1e6:.2f} MB + vetores do re-ranking "
+              f"{vectors_bytes / 1e6:.2f} MB = {(index_bytes + vectors_bytes) / 1e6:.2f} MB")
+    else:
+        print(f"  - Espaço em disco: índice {index_bytes / 1e6:.2f} MB")
+    
+    print(f"[SUCESSO] Índice com {index.ntotal} vetores ({writer.counts['chunks']} novos chunks)!")
+    
+    # Estatísticas (snapshot salvo ao lado do índice e servido pela API) e
+    # tabelas de busca exata por código/endereço
+    chunk_store = ChunkStore(build_dir)
+    stats = compute_stats(chunk_store)
+    save_lookup(build_lookup(chunk_store), build_dir)
+    chunk_store.close()
+    save_stats(stats, build_dir)
     
-    print(f"[INFO] Total extraído:")
-    print(f"  - {processed_leiloes} leilões processados")
-    print(f"  - {processed_pdfs} PDFs processados") 
-    print(f"  - {len(all_chunks)} chunks de texto extraídos")
-    
-    # Gerar embeddings
-    print("[INFO] Gerando embeddings...")
-    texts = [c["text"] for c in all_chunks]
-    vectors = get_embedding(texts, model, tokenizer)
-    
-    # Criar índice FAISS
-    print("[INFO] Criando índice FAISS...")
-    index = faiss.IndexFlatL2(embedding_size)
-    index.add(vectors)
-    
-    # Salvar arquivos
-    print("[INFO] Salvando índice e metadados...")
-    faiss.write_index(index, os.path.join(INDEX_DIR, "faiss.index"))
-    
-    with open(os.path.join(INDEX_DIR, "chunks.pkl"), "wb") as f:
-        pickle.dump(all_chunks, f)
-    
-    print(f"[SUCESSO] Índice criado com {len(all_chunks)} chunks!")
-    print(f"[INFO] Arquivos salvos em: {INDEX_DIR}/")
-    
-    # Estatísticas
-    tipos_imoveis = {}
-    cidades = {}
-    for chunk in all_chunks:
-        tipo = chunk.get('tipo_imovel', 'Não informado')
-        cidade = chunk.get('cidade', 'Não informado')
-        tipos_imoveis[tipo] = tipos_imoveis.get(tipo, 0) + 1
-        cidades[cidade] = cidades.get(cidade, 0) + 1
-    
-    print(f"\n[ESTATÍSTICAS]")
-    print(f"Tipos de imóveis mais comuns:")
-    for tipo, count in sorted(tipos_imoveis.items(), key=lambda x: x[1], reverse=True)[:5]:
-        print(f"  - {tipo}: {count} chunks")
-    
-    print(f"Cidades mais comuns:")
-    for cidade, count in sorted(cidades.items(), key=lambda x: x[1], reverse=True)[:5]:
-        print(f"  - {cidade}: {count} chunks")
+    # Publicar: a API passa a servir a nova versão sem reiniciar
+    publish_version(INDEX_DIR, version, max(1, keep_versions))
+    print(f"[INFO] Versão {version} publicada em {INDEX_DIR}/")
+    print_stats(stats)
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.truncation_report:
+        truncation_report()
+        raise SystemExit
+    main(batch_size=args.batch_size, num_threads=args.threads, incremental=args.incremental,
+         workers=args.workers, index_type=args.index_type, use_cache=not args.no_cache,
+         keep_versions=args.keep_versions,
+         dedup=None if args.dedup_threshold is None else dedup_config(args.dedup_threshold),
+         chunking=resolve_chunking(args.chunker, args.chunk_size, args.chunk_overlap, not args.no_paragraphs),
+         index_options={
+             "nlist": args.nlist, "nprobe": args.nprobe, "pq_m": args.pq_m,
+             "hnsw_m": args.hnsw_m, "ef_search": args.ef_search, "train_size": args.train_size,
+             "rerank_factor": args.rerank_factor,
+         })
@@ -0,0 +1,22 @@
+import os
+import json
+
+def append_entry(path, entry):
+    """Acrescenta uma entrada (uma linha JSON) ao log."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+def read_entries(path):
+    """Entradas completas do log, em ordem.
+
+    Uma última linha sem quebra de linha (gravação interrompida) é ignorada.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().split("\n")
+    return [json.loads(line) for line in lines[:-1] if line]
+
+def remove_log(path):
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,139 @@
+import os
+import re
+import json
+import unicodedata
+from urllib.parse import unquote, urlparse
+import numpy as np
+
+LOOKUP_FILE = "lookup.json"
+CODE_FIELDS = ["codigo_zuk", "leilao_id", "product_id"]
+
+# Pergunta que é apenas um código: "33515", "cod: 33515", "código zuk 33515", "leilão 33287"...
+CODE_PATTERN = re.compile(
+    r"^\s*(?:(?:c[oó]d(?:igo)?|leil[aã]o|id|produto)\b[\s_-]*(?:zuk|id)?\s*[:#nº°.]*\s*)?(\d{4,8})\s*$",
+    re.IGNORECASE,
+)
+STREET_TYPES = {
+    "rua", "r", "avenida", "av", "alameda", "al", "travessa", "tv", "estrada", "est",
+    "rodovia", "rod", "praca", "pca", "largo", "viela", "via", "passagem",
+}
+STOPWORDS = {"de", "da", "do", "das", "dos", "e", "a", "o", "n", "no", "na", "s", "sn"}
+
+def fold(text):
+    """Minúsculas sem acentos."""
+    text = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+def tokenize(text):
+    """Tokens normalizados (sem acentos e sem stopwords)."""
+    return [t for t in re.split(r"[^0-9a-z]+", fold(text)) if t and t not in STOPWORDS]
+
+def url_tokens(url):
+    """Tokens do slug de endereço e do bairro na URL do imóvel.
+
+    Ex.: /imovel/sp/sao-paulo/vila-independencia/rua-ribeiropolis-532/33287-203736
+    """
+    parts = [p for p in unquote(urlparse(url).path).split("/") if p]
+    if len(parts) < 6 or parts[0] != "imovel":
+        return []
+    return tokenize(parts[3].replace("_", " ")) + tokenize(parts[4])
+
+def build_lookup(store):
+    """Monta as tabelas de busca exata a partir dos leilões do chunk store."""
+    codes = {field: {} for field in CODE_FIELDS}
+    tokens = {}
+    bairros = {}
+    for i, leilao in enumerate(store.leiloes):
+        if leilao["removed"]:
+            continue
+        for field in CODE_FIELDS:
+            value = str(leilao.get(field, '')).strip()
+            if value:
+                codes[field].setdefault(value, []).append(i)
+
+        leilao_tokens = set(tokenize(leilao.get("endereco_completo", '')))
+        leilao_tokens.update(tokenize(leilao.get("bairro", '')))
+        leilao_tokens.update(url_tokens(leilao.get("url", '')))
+        for token in leilao_tokens:
+            tokens.setdefault(token, []).append(i)
+
+        bairro = " ".join(tokenize(leilao.get("bairro", '')))
+        if bairro:
+            bairros.setdefault(bairro, []).append(i)
+    return {"codes": codes, "tokens": tokens, "bairros": bairros}
+
+def save_lookup(data, index_dir):
+    path = os.path.join(index_dir, LOOKUP_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+class LookupIndex:
+    """Atalho para perguntas que são buscas exatas (códigos e endereços).
+
+    Responde sem chamar o modelo: códigos por hash map e endereços/bairros
+    por um índice de tokens normalizados. match() retorna None quando a
+    pergunta não é uma busca exata, e a busca vetorial deve ser usada.
+    """
+
+    def __init__(self, data, store):
+        self.codes = data["codes"]
+        self.tokens = data["tokens"]
+        self.bairros = data["bairros"]
+        self.store = store
+        # Primeiro chunk de cada leilão (o resultado exibido para ele)
+        leilao_col = np.asarray(store.records["leilao"])
+        leiloes, first = np.unique(leilao_col, return_index=True)
+        self.first_chunk = dict(zip(leiloes.tolist(), first.tolist()))
+
+    @classmethod
+    def load(cls, index_dir, store):
+        """Carrega lookup.json (ou monta as tabelas, em índices antigos)."""
+        path = os.path.join(index_dir, LOOKUP_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(json.load(f), store)
+        return cls(build_lookup(store), store)
+
+    def match(self, query):
+        """Retorna (tipo da busca, índices dos leilões) ou None."""
+        code = CODE_PATTERN.match(query)
+        if code:
+            value = code.group(1)
+            for field in CODE_FIELDS:
+                if value in self.codes[field]:
+                    return field, list(self.codes[field][value])
+            return None
+
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return None
+
+        if query_tokens[0] == "bairro" and len(query_tokens) > 1:
+            query_tokens = query_tokens[1:]
+        bairro = " ".join(query_tokens)
+        if bairro in self.bairros:
+            return "bairro", list(self.bairros[bairro])
+
+        if query_tokens[0] in STREET_TYPES and len(query_tokens) > 1:
+            matches = None
+            for token in query_tokens[1:]:
+                ids = set(self.tokens.get(token, ()))
+                matches = ids if matches is None else matches & ids
+                if not matches:
+                    return None
+            return "endereco", sorted(matches)
+        return None
+
+    def chunk_ids(self, leilao_ids, mask=None, top_k=None):
+        """Primeiro chunk de cada leilão encontrado, respeitando a máscara de filtros."""
+        ids = []
+        for leilao in leilao_ids:
+            chunk_id = self.first_chunk.get(leilao)
+            if chunk_id is None or (mask is not None and not mask[chunk_id]):
+                continue
+            ids.append(chunk_id)
+            if top_k and len(ids) >= top_k:
+                break
+        return ids
@@ -0,0 +1,105 @@
+import os
+import json
+import hashlib
+from journal import append_entry, read_entries, remove_log
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_LOG = "manifest.log"   # Pastas e checkpoints gravados desde o último save_manifest
+MANIFEST_VERSION = 1
+
+def file_sha256(path, block_size=1 << 20):
+    """Calcula o hash SHA-256 do conteúdo de um arquivo."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def fingerprint_file(path, previous=None):
+    """Gera a impressão digital (hash, mtime, tamanho) de um arquivo.
+
+    Se o mtime e o tamanho coincidem com a impressão anterior, o hash não é
+    recalculado.
+    """
+    stat = os.stat(path)
+    if previous and previous.get("mtime") == stat.st_mtime and previous.get("size") == stat.st_size:
+        return dict(previous)
+    return {"sha256": file_sha256(path), "mtime": stat.st_mtime, "size": stat.st_size}
+
+def list_folder_files(leilao_path):
+    """Lista os arquivos de uma pasta de leilão que participam da indexação."""
+    return sorted(
+        f for f in os.listdir(leilao_path)
+        if f.lower().endswith('.pdf') or f == "metadata.json"
+    )
+
+def scan_folder(leilao_path, previous_files=None):
+    """Gera as impressões digitais dos PDFs e do metadata.json de uma pasta."""
+    previous_files = previous_files or {}
+    return {
+        fname: fingerprint_file(os.path.join(leilao_path, fname), previous_files.get(fname))
+        for fname in list_folder_files(leilao_path)
+    }
+
+def same_content(files_a, files_b):
+    """Compara dois conjuntos de impressões digitais apenas pelo conteúdo."""
+    if set(files_a) != set(files_b):
+        return False
+    return all(files_a[f]["sha256"] == files_b[f]["sha256"] for f in files_a)
+
+def load_manifest(index_dir):
+    """Carrega o manifesto do índice (vazio se não existir).
+
+    As entradas de manifest.log posteriores ao checkpoint de manifest.json
+    são reaplicadas (ver append_manifest).
+    """
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "folders": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    for entry in read_entries(os.path.join(index_dir, MANIFEST_LOG)):
+        if entry["checkpoint"]["chunks"] > manifest.get("checkpoint", {}).get("chunks", -1):
+            manifest["folders"].update(entry["folders"])
+            manifest["checkpoint"] = entry["checkpoint"]
+    return manifest
+
+def save_manifest(manifest, index_dir):
+    """Salva o manifesto de forma atômica (e descarta o manifest.log, já incorporado)."""
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    remove_log(os.path.join(index_dir, MANIFEST_LOG))
+
+def append_manifest(index_dir, folders, checkpoint):
+    """Registra as pastas indexadas desde o último checkpoint e o novo checkpoint.
+
+    Evita regravar o manifesto inteiro a cada checkpoint; a entrada só vale
+    depois de gravada por completo, então ela faz o papel do save_manifest.
+    """
+    append_entry(os.path.join(index_dir, MANIFEST_LOG), {"folders": folders, "checkpoint": checkpoint})
+
+def diff_folders(manifest, data_dir, leilao_folders):
+    """Compara as pastas atuais com o manifesto.
+
+    Retorna (novas_ou_alteradas, removidas, inalteradas, impressões), onde
+    impressões mapeia cada pasta atual às impressões digitais de seus arquivos.
+    """
+    known = manifest.get("folders", {})
+    changed, unchanged = [], []
+    fingerprints = {}
+
+    for leilao_folder in leilao_folders:
+        previous = known.get(leilao_folder, {}).get("files")
+        files = scan_folder(os.path.join(data_dir, leilao_folder), previous)
+        fingerprints[leilao_folder] = files
+        if previous is not None and same_content(files, previous):
+            unchanged.append(leilao_folder)
+        else:
+            changed.append(leilao_folder)
+
+    current = set(leilao_folders)
+    removed = [f for f in known if f not in current]
+    return changed, removed, unchanged, fingerprints
@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import numpy as np
+
+STATS_FILE = "stats.json"
+STATS_FIELDS = {
+    "tipos_imoveis": "tipo_imovel",
+    "cidades": "cidade",
+    "ufs": "uf",
+    "comitentes": "comitente",
+}
+PRICE_QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+def compute_stats(store):
+    """Calcula as estatísticas do índice a partir do chunk store.
+
+    As contagens são feitas por imóvel (pasta de leilão) e por chunk; os
+    preços são considerados uma vez por imóvel.
+    """
+    live = store.live_mask()
+    chunks_per_leilao = np.bincount(store.records["leilao"][live], minlength=len(store.leiloes))
+    leilao_ids = [i for i, leilao in enumerate(store.leiloes) if not leilao["removed"]]
+
+    stats = {
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "total_imoveis": len(leilao_ids),
+        "total_chunks": int(live.sum()),
+    }
+
+    for name, field in STATS_FIELDS.items():
+        counts = {}
+        for i in leilao_ids:
+            value = store.leiloes[i].get(field) or "Não informado"
+            entry = counts.setdefault(value, {"imoveis": 0, "chunks": 0})
+            entry["imoveis"] += 1
+            entry["chunks"] += int(chunks_per_leilao[i])
+        stats[name] = dict(sorted(counts.items(), key=lambda x: (x[1]["imoveis"], x[1]["chunks"]), reverse=True))
+
+    precos = store.precos[leilao_ids] if leilao_ids else np.zeros(0)
+    precos = precos[~np.isnan(precos)]
+    if len(precos):
+        stats["preco_stats"] = {
+            "min": float(precos.min()),
+            "max": float(precos.max()),
+            "avg": float(precos.mean()),
+            "quantis": {f"p{int(q * 100)}": float(v) for q, v in zip(PRICE_QUANTILES, np.quantile(precos, PRICE_QUANTILES))},
+            "total_com_preco": int(len(precos)),
+        }
+    else:
+        stats["preco_stats"] = {"min": 0, "max": 0, "avg": 0, "quantis": {}, "total_com_preco": 0}
+    return stats
+
+def save_stats(stats, index_dir):
+    """Salva o snapshot de estatísticas ao lado do índice (de forma atômica)."""
+    path = os.path.join(index_dir, STATS_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def load_stats(index_dir):
+    """Carrega o snapshot de estatísticas (None se não existir)."""
+    path = os.path.join(index_dir, STATS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def print_stats(stats, top=5):
+    """Exibe o relatório de estatísticas da indexação."""
+    print(f"\n[ESTATÍSTICAS]")
+    print(f"{stats['total_imoveis']} imóveis, {stats['total_chunks']} chunks")
+    for title, name in (("Tipos de imóveis mais comuns", "tipos_imoveis"), ("Cidades mais comuns", "cidades")):
+        print(f"{title}:")
+        for value, counts in list(stats[name].items())[:top]:
+            print(f"  - {value}: {counts['imoveis']} imóveis ({counts['chunks']} chunks)")
+
+    preco = stats["preco_stats"]
+    if preco["total_com_preco"]:
+        print(f"Preços ({preco['total_com_preco']} imóveis): mín R$ {preco['min']:,.2f} | "
+              f"mediana R$ {preco['quantis']['p50']:,.2f} | máx R$ {preco['max']:,.2f}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do RAG são scripts do diretório rag/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
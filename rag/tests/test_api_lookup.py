@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+import pytest
+from chunk_store import ChunkStore, ChunkStoreWriter
+from lookup import LookupIndex, build_lookup
+from api.main import Question, exact_lookup
+
+EDITAL = "O arrematante pagará a comissão do leiloeiro de 5% sobre o valor da arrematação."
+
+@pytest.fixture
+def snapshot(tmp_path):
+    """Dois leilões com o mesmo edital: os chunks do segundo são quase duplicatas dos do primeiro."""
+    writer = ChunkStoreWriter(str(tmp_path))
+    first = writer.add_leilao("leilao_33515_", {"codigo_zuk": "33515", "cidade": "São Paulo"})
+    second = writer.add_leilao("leilao_33734_", {"codigo_zuk": "33734", "cidade": "Campinas"})
+    for page in (1, 2):
+        writer.add_chunk(first, "01_Edital.pdf", page, EDITAL)
+    for page in (1, 2):
+        writer.add_chunk(second, "01_Edital.pdf", page, EDITAL, canonical=page - 1)
+    writer.close()
+    store = ChunkStore(str(tmp_path))
+    yield SimpleNamespace(chunks=store, lookup=LookupIndex(build_lookup(store), store))
+    store.close()
+
+def test_busca_por_codigo_retorna_o_proprio_leilao(snapshot):
+    kind, results = exact_lookup(snapshot, "33734", Question(question="33734"))
+    assert kind == "codigo_zuk"
+    assert [(r["chunk_id"], r["leilao_folder"], r["codigo_zuk"]) for r in results] == \
+        [(2, "leilao_33734_", "33734")]
+    # O representante continua nas referências do resultado
+    assert [(ref["chunk_id"], ref["codigo_zuk"]) for ref in results[0]["refs"]] == [(0, "33515")]
+
+    kind, results = exact_lookup(snapshot, "33515", Question(question="33515"))
+    assert [r["leilao_folder"] for r in results] == ["leilao_33515_"]
+
+def test_busca_por_codigo_respeita_os_filtros(snapshot):
+    q = Question(question="33734", filter_cidade="São Paulo")
+    assert exact_lookup(snapshot, q.question, q) == ("codigo_zuk", [])
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+from chunk_store import CHUNK_DTYPE, CHUNKS_FILE, LEILOES_LOG, ChunkStore, ChunkStoreWriter
+
+def write_leilao(writer, codigo, texts, canonical=None):
+    leilao = writer.add_leilao(f"leilao_{codigo}_", {"codigo_zuk": codigo, "cidade": "São Paulo", "preco": "1000.00"})
+    canonical = canonical or [None] * len(texts)
+    return [writer.add_chunk(leilao, "01_Edital.pdf", page, text, rep)
+            for page, (text, rep) in enumerate(zip(texts, canonical), start=1)]
+
+def test_round_trip(tmp_path):
+    writer = ChunkStoreWriter(str(tmp_path))
+    write_leilao(writer, "100", ["primeiro chunk", "segundo chunk com acentuação"])
+    write_leilao(writer, "200", ["terceiro chunk", "cópia"], canonical=[None, 0])
+    writer.close()
+
+    store = ChunkStore(str(tmp_path))
+    assert len(store) == 4
+    assert store.text(1) == "segundo chunk com acentuação"
+    chunk = store.get(2)
+    assert (chunk["leilao_folder"], chunk["page"], chunk["text"]) == ("leilao_200_", 1, "terceiro chunk")
+    assert store.canonical.tolist() == [0, 1, 2, 0]
+    assert store.groups == {0: [0, 3]}
+    store.close()
+
+def test_flush_incremental_usa_o_log(tmp_path):
+    writer = ChunkStoreWriter(str(tmp_path))
+    write_leilao(writer, "100", ["a", "b"])
+    writer.flush(full=False)  # A primeira gravação é sempre completa
+    assert not os.path.exists(tmp_path / LEILOES_LOG)
+    write_leilao(writer, "200", ["c"])
+    writer.flush(full=False)
+    write_leilao(writer, "300", ["d", "e"])
+    writer.flush(full=False)
+    assert os.path.exists(tmp_path / LEILOES_LOG)
+
+    store = ChunkStore(str(tmp_path))
+    assert [l["folder"] for l in store.leiloes] == ["leilao_100_", "leilao_200_", "leilao_300_"]
+    assert [store.leilao(i)["folder"] for i in range(len(store))] == \
+        ["leilao_100_", "leilao_100_", "leilao_200_", "leilao_300_", "leilao_300_"]
+    store.close()
+
+    writer.remove_leilao(1)
+    writer.flush(full=False)  # Alteração de um leilão já gravado: gravação completa
+    assert not os.path.exists(tmp_path / LEILOES_LOG)
+    writer.close()
+    store = ChunkStore(str(tmp_path))
+    assert store.live_mask().tolist() == [True, True, False, True, True]
+    store.close()
+
+def test_retoma_do_checkpoint(tmp_path):
+    writer = ChunkStoreWriter(str(tmp_path))
+    write_leilao(writer, "100", ["a", "b"])
+    writer.flush()
+    checkpoint = writer.checkpoint()
+    # Gravado depois do checkpoint e perdido na interrupção
+    write_leilao(writer, "200", ["c"])
+    writer.flush(full=False)
+    writer.close()
+
+    writer = ChunkStoreWriter(str(tmp_path), append=True, checkpoint=checkpoint)
+    assert writer.num_chunks == 2 and len(writer.leiloes) == 1
+    write_leilao(writer, "300", ["d"])
+    writer.close()
+    store = ChunkStore(str(tmp_path))
+    assert [store.text(i) for i in range(len(store))] == ["a", "b", "d"]
+    assert store.leilao(2)["folder"] == "leilao_300_"
+    store.close()
+
+def test_leitura_limitada_aos_chunks_com_representante(tmp_path):
+    """Registros acrescentados por uma versão mais nova (arquivo compartilhado) são ignorados."""
+    writer = ChunkStoreWriter(str(tmp_path))
+    write_leilao(writer, "100", ["a", "b"])
+    writer.close()
+    with open(tmp_path / CHUNKS_FILE, "ab") as f:
+        f.write(np.zeros(3, dtype=CHUNK_DTYPE).tobytes())
+    store = ChunkStore(str(tmp_path))
+    assert len(store) == 2
+    store.close()
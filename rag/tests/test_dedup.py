@@ -0,0 +1,48 @@
+import random
+import numpy as np
+import pytest
+from dedup import Deduplicator, dedup_config, load_signatures, save_signatures
+
+WORDS = ("arrematante comissão leiloeiro pagamento condomínio matrícula registro escritura imóvel "
+         "débitos vendedor comprador edital prazo desocupação ocupado fiduciante preferência").split()
+
+def clause(seed, length=200):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+def test_quase_duplicatas_compartilham_o_representante():
+    dedup = Deduplicator(dedup_config())
+    base = clause(1)
+    near = base.replace(base.split()[100], "alterado", 1)
+    canonical, signatures = dedup.assign([base, clause(2), near], first_id=10)
+    assert canonical == [10, 11, 10]
+    assert signatures.shape == (3, dedup_config()["num_perm"])
+    # Lotes seguintes também encontram os representantes já vistos
+    canonical, _ = dedup.assign([clause(2), clause(3)], first_id=13)
+    assert canonical == [11, 14]
+    assert dedup.duplicates == 2
+
+def test_representante_removido_e_substituido():
+    config = dedup_config()
+    texts = [clause(1), clause(1), clause(2), clause(1)]
+    first = Deduplicator(config)
+    canonical, signatures = first.assign(texts, first_id=0)
+    assert canonical == [0, 0, 2, 0]
+
+    live = np.array([False, True, True, True])  # O chunk 0 será removido
+    dedup = Deduplicator(config, (np.array(canonical), signatures, live))
+    assert dedup.promoted == {1: 1, 3: 1}
+    canonical, _ = dedup.assign([clause(1)], first_id=4)
+    assert canonical == [1]
+
+def test_assinaturas_salvas(tmp_path):
+    signatures = np.arange(3 * 64, dtype=np.uint32).reshape(3, 64)
+    save_signatures(signatures, str(tmp_path))
+    assert np.array_equal(load_signatures(str(tmp_path), 64), signatures)
+    assert np.array_equal(load_signatures(str(tmp_path), 64, rows=2), signatures[:2])
+    assert load_signatures(str(tmp_path / "vazio"), 64) is None
+
+def test_limiar_invalido():
+    assert dedup_config(0) == {"threshold": 0}
+    with pytest.raises(ValueError):
+        dedup_config(1.5)
@@ -0,0 +1,42 @@
+import os
+from index_versions import (BUILDING_FILE, CURRENT_FILE, VERSIONS_DIR, building_version, current_version,
+                            discard_building, new_version, publish_version, resolve_index_dir, version_dir)
+
+def make_versions(root, names):
+    for name in names:
+        os.makedirs(version_dir(root, name))
+        with open(os.path.join(version_dir(root, name), "faiss.index"), "w") as f:
+            f.write(name)
+
+def test_publica_e_remove_as_versoes_mais_antigas(tmp_path):
+    root = str(tmp_path)
+    # Sufixos numéricos: -10 é mais recente que -9 e -2
+    make_versions(root, ["20250101-000000", "20250102-000000", "20250102-000000-2",
+                         "20250102-000000-9", "20250102-000000-10"])
+    publish_version(root, "20250102-000000-10", keep=3)
+    assert current_version(root) == "20250102-000000-10"
+    assert resolve_index_dir(root) == version_dir(root, "20250102-000000-10")
+    assert sorted(os.listdir(os.path.join(root, VERSIONS_DIR))) == \
+        ["20250102-000000-10", "20250102-000000-2", "20250102-000000-9"]
+
+def test_nova_versao_compartilha_arquivos_estendidos(tmp_path):
+    root = str(tmp_path)
+    make_versions(root, ["20250101-000000"])
+    source = version_dir(root, "20250101-000000")
+    for name in ("texts.bin", CURRENT_FILE):
+        with open(os.path.join(source, name), "w") as f:
+            f.write("origem")
+
+    version, path = new_version(root, source, shared=("texts.bin",))
+    assert building_version(root) == version
+    assert sorted(os.listdir(path)) == ["faiss.index", "texts.bin"]
+    assert os.path.samefile(os.path.join(source, "texts.bin"), os.path.join(path, "texts.bin"))
+    assert not os.path.samefile(os.path.join(source, "faiss.index"), os.path.join(path, "faiss.index"))
+
+    # Nomes únicos mesmo dentro do mesmo segundo
+    discard_building(root)
+    assert not os.path.exists(path) and not os.path.exists(os.path.join(root, BUILDING_FILE))
+    first, _ = new_version(root)
+    second, _ = new_version(root)
+    assert first != second
+    assert building_version(root) == second
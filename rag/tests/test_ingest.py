@@ -0,0 +1,166 @@
+import os
+import zlib
+import functools
+import faiss
+import numpy as np
+import pytest
+import ingest
+from benchmark_index import load_corpus
+from benchmark_suite import generate_corpus
+from chunk_store import LEILOES_LOG, TEXTS_FILE, ChunkStore
+from index_versions import BUILDING_FILE, current_version, resolve_index_dir, version_dir
+from manifest import MANIFEST_LOG, load_manifest
+from vector_index import INDEX_LOG_FILES, VECTORS_FILE, load_config, load_full_vectors, load_reranker, read_index
+
+DIM = 16
+NUM_LEILOES = 12
+
+class FakeEmbedder:
+    """Vetores determinísticos derivados do texto, sem carregar o modelo."""
+
+    def __init__(self, *args, **kwargs):
+        self.texts = 0
+        self.seconds = 0.0
+        self.cache = None
+
+    def embed(self, texts):
+        self.texts += len(texts)
+        return np.stack([np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(DIM)
+                         for text in texts]).astype(np.float32)
+
+    def close(self):
+        pass
+
+class InterruptedWriter(ingest.IndexWriter):
+    """Interrompe a gravação depois do quarto checkpoint (só com acréscimos, com full_every=2)."""
+
+    def write(self, batch):
+        if self.counts["checkpoints"] >= 4 and self._since_checkpoint:
+            raise RuntimeError("indexação interrompida")
+        super().write(batch)
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    data_dir = str(tmp_path_factory.mktemp("leiloes"))
+    generate_corpus(data_dir, num_leiloes=NUM_LEILOES, pages=3, pdfs=1)
+    return data_dir
+
+def subset(corpus, tmp_path, folders):
+    """Diretório de dados com apenas algumas pastas do corpus."""
+    data_dir = tmp_path / "subset"
+    data_dir.mkdir(exist_ok=True)
+    for folder in os.listdir(data_dir):
+        os.unlink(data_dir / folder)
+    for folder in folders:
+        os.symlink(os.path.join(corpus, folder), data_dir / folder)
+    return str(data_dir)
+
+@pytest.fixture
+def run_ingest(monkeypatch):
+    """Executa ingest.main com checkpoints frequentes e o embedder falso."""
+    monkeypatch.setattr(ingest, "Embedder", FakeEmbedder)
+    monkeypatch.setattr(ingest, "embed_stage", functools.partial(ingest.embed_stage, batch_chunks=6))
+
+    def run(data_dir, index_dir, writer=ingest.IndexWriter, **kwargs):
+        monkeypatch.setattr(ingest, "DATA_DIR", data_dir)
+        monkeypatch.setattr(ingest, "INDEX_DIR", str(index_dir))
+        monkeypatch.setattr(ingest, "IndexWriter", functools.partial(writer, checkpoint_chunks=10, full_every=2))
+        ingest.main(workers=1, use_cache=False, **kwargs)
+    return run
+
+def snapshot(index_dir):
+    """Conteúdo do índice ativo: chunks válidos por pasta e o texto de cada vetor."""
+    path = resolve_index_dir(str(index_dir))
+    store = ChunkStore(path)
+    index = read_index(path, mmap=False)
+    live = store.live_mask()
+    chunks = sorted((store.leilao(i)["folder"], store.text(i)) for i in np.flatnonzero(live))
+    vector_ids = faiss.vector_to_array(index.id_map)
+    # Todo chunk válido aponta para um representante válido, que tem vetor próprio
+    reps = {int(store.canonical[i]) for i in np.flatnonzero(live)}
+    assert all(live[rep] for rep in reps)
+    assert reps == set(vector_ids.tolist())
+    vectors = sorted(store.text(i) for i in vector_ids)
+    store.close()
+    return chunks, vectors
+
+def assert_published(index_dir):
+    """Versão publicada completa, sem logs de checkpoint nem versão em construção."""
+    path = resolve_index_dir(str(index_dir))
+    assert current_version(str(index_dir))
+    assert not os.path.exists(os.path.join(index_dir, BUILDING_FILE))
+    for name in (LEILOES_LOG, MANIFEST_LOG) + INDEX_LOG_FILES:
+        assert not os.path.exists(os.path.join(path, name))
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8"])
+def test_retoma_indexacao_interrompida(corpus, tmp_path, run_ingest, index_type):
+    # sq8 com re-ranking: vectors.bin também é retomado do checkpoint
+    options = {"train_size": 8, "rerank_factor": 4 if index_type == "sq8" else 0}
+    run_ingest(corpus, tmp_path / "completo", index_type=index_type, index_options=options)
+    expected = snapshot(tmp_path / "completo")
+    assert len({folder for folder, _ in expected[0]}) == NUM_LEILOES
+
+    root = tmp_path / "retomado"
+    with pytest.raises(RuntimeError):
+        run_ingest(corpus, root, InterruptedWriter, index_type=index_type, index_options=options)
+    assert current_version(str(root)) is None
+    building = version_dir(str(root), open(root / BUILDING_FILE).read().strip())
+    checkpoint = load_manifest(building)["checkpoint"]
+    assert 0 < checkpoint["chunks"] < len(expected[0])
+    # O último checkpoint gravou só acréscimos: a retomada precisa deles
+    assert checkpoint["index_log_rows"] > 0
+
+    run_ingest(corpus, root, incremental=True, index_type=index_type, index_options=options)
+    assert_published(root)
+    assert snapshot(root) == expected
+    if index_type == "sq8":
+        path = resolve_index_dir(str(root))
+        assert len(load_reranker(path).vectors) == read_index(path).ntotal
+
+def test_rerank_desligado_por_padrao(corpus, tmp_path, run_ingest):
+    run_ingest(corpus, tmp_path, index_type="sq8", index_options={"train_size": 8})
+    path = resolve_index_dir(str(tmp_path))
+    assert load_reranker(path) is None
+    assert not os.path.exists(os.path.join(path, VECTORS_FILE))
+
+def test_incremental_acrescenta_e_remove_pastas(corpus, tmp_path, run_ingest):
+    folders = sorted(f for f in os.listdir(corpus) if f.startswith("leilao_"))
+    root = tmp_path / "incremental"
+    run_ingest(subset(corpus, tmp_path, folders[:8]), root)
+    first = resolve_index_dir(str(root))
+    first_chunks, _ = snapshot(root)
+    assert len({folder for folder, _ in first_chunks}) == 8
+
+    # Remove a primeira pasta e acrescenta as últimas: o resultado é o de uma indexação completa
+    final = folders[1:]
+    run_ingest(subset(corpus, tmp_path, final), root, incremental=True)
+    assert_published(root)
+    second = resolve_index_dir(str(root))
+    assert second != first
+    run_ingest(subset(corpus, tmp_path, final), tmp_path / "completo")
+    assert snapshot(root) == snapshot(tmp_path / "completo")
+
+    # Arquivos só estendidos são compartilhados entre as versões, e a versão
+    # anterior continua lendo apenas os seus chunks
+    assert os.path.samefile(os.path.join(first, TEXTS_FILE), os.path.join(second, TEXTS_FILE))
+    store = ChunkStore(first)
+    assert sorted((store.leilao(i)["folder"], store.text(i)) for i in range(len(store))) == first_chunks
+    store.close()
+
+    run_ingest(subset(corpus, tmp_path, final), root, incremental=True)
+    assert resolve_index_dir(str(root)) == second  # Nada mudou: nenhuma versão nova
+
+def test_benchmark_usa_so_os_vetores_validos(corpus, tmp_path, run_ingest):
+    """vectors.bin guarda as linhas dos chunks removidos; o corpus do benchmark não."""
+    folders = sorted(f for f in os.listdir(corpus) if f.startswith("leilao_"))
+    root = tmp_path / "indice"
+    options = {"train_size": 8, "rerank_factor": 4}
+    run_ingest(subset(corpus, tmp_path, folders), root, index_type="sq8", index_options=options)
+    run_ingest(subset(corpus, tmp_path, folders[2:]), root, incremental=True, index_type="sq8",
+               index_options=options)
+    path = resolve_index_dir(str(root))
+    index = read_index(path, mmap=False)
+    ids, stored = load_full_vectors(path, DIM, load_config(path)["vector_rows"])
+    vectors = load_corpus(path)
+    assert len(stored) > len(vectors) == index.ntotal
+    assert np.array_equal(vectors, stored[np.isin(ids, faiss.vector_to_array(index.id_map))])
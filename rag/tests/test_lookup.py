@@ -0,0 +1,48 @@
+import pytest
+from chunk_store import ChunkStore, ChunkStoreWriter
+from lookup import LookupIndex, build_lookup
+
+LEILOES = [
+    {"codigo_zuk": "33515", "leilao_id": "33287", "product_id": "203736", "bairro": "Vila Independência",
+     "endereco_completo": "Rua Ribeirópolis, 532",
+     "url": "https://www.portalzuk.com.br/imovel/sp/sao-paulo/vila-independencia/rua-ribeiropolis-532/33287-203736"},
+    {"codigo_zuk": "33734", "leilao_id": "33526", "product_id": "205544", "bairro": "Jardim das Laranjeiras",
+     "endereco_completo": "Avenida Professora Ida Kolb, 225", "url": ""},
+    {"codigo_zuk": "40000", "leilao_id": "39000", "product_id": "210000", "bairro": "Vila Independência",
+     "endereco_completo": "Rua Ribeirópolis, 10", "url": ""},
+]
+
+@pytest.fixture
+def lookup(tmp_path):
+    writer = ChunkStoreWriter(str(tmp_path))
+    for metadata in LEILOES:
+        leilao = writer.add_leilao(f"leilao_{metadata['codigo_zuk']}_", metadata)
+        for page in (1, 2):
+            writer.add_chunk(leilao, "01_Edital.pdf", page, f"página {page}")
+    writer.remove_leilao(2)
+    writer.close()
+    store = ChunkStore(str(tmp_path))
+    yield LookupIndex(build_lookup(store), store)
+    store.close()
+
+@pytest.mark.parametrize("query, expected", [
+    ("33515", ("codigo_zuk", [0])),
+    ("cod: 33734", ("codigo_zuk", [1])),
+    ("leilão 33287", ("leilao_id", [0])),
+    ("205544", ("product_id", [1])),
+    ("Vila Independência", ("bairro", [0])),
+    ("bairro jardim das laranjeiras", ("bairro", [1])),
+    ("Rua Ribeiropolis 532", ("endereco", [0])),
+    ("av. professora ida kolb", ("endereco", [1])),
+])
+def test_buscas_exatas(lookup, query, expected):
+    assert lookup.match(query) == expected
+
+@pytest.mark.parametrize("query", ["40000", "rua ribeiropolis 10", "casa com piscina em São Paulo", "99999"])
+def test_sem_busca_exata(lookup, query):
+    """Leilões removidos e perguntas abertas ficam para a busca vetorial."""
+    assert lookup.match(query) is None
+
+def test_primeiro_chunk_de_cada_leilao(lookup):
+    assert lookup.chunk_ids([1, 0]) == [2, 0]
+    assert lookup.chunk_ids([0, 1], top_k=1) == [0]
@@ -0,0 +1,287 @@
+import os
+import json
+import math
+import faiss
+import numpy as np
+
+INDEX_FILE = "faiss.index"
+INDEX_CONFIG_FILE = "index_config.json"
+VECTORS_FILE = "vectors.bin"        # Vetores float32 completos, para o re-ranking (mapeados em memória)
+VECTOR_IDS_FILE = "vector_ids.bin"  # ID do chunk de cada linha de vectors.bin
+INDEX_LOG_FILES = ("index_log.bin", "index_log_ids.bin")  # Vetores e IDs acrescentados ao índice desde a última gravação de faiss.index
+
+# Tipos de índice aceitos pela indexação
+INDEX_TYPES = ["flat", "fp16", "sq8", "ivf-flat", "ivf-pq", "hnsw"]
+# Tipos que precisam de treinamento antes de receber vetores
+TRAINED_TYPES = ["sq8", "ivf-flat", "ivf-pq"]
+# Tipos que guardam os vetores comprimidos (onde o re-ranking opcional recupera o recall)
+COMPRESSED_TYPES = ["fp16", "sq8", "ivf-pq"]
+RERANK_FACTOR = 4  # Fator sugerido para o re-ranking em precisão total (--rerank-factor; desligado por padrão)
+
+DEFAULT_INDEX_PARAMS = {
+    "nlist": None,          # IVF: número de listas (None = automático pelo tamanho do corpus)
+    "nprobe": 8,            # IVF: listas visitadas por busca
+    "pq_m": 16,             # PQ: subquantizadores (deve dividir a dimensão)
+    "pq_nbits": 8,          # PQ: bits por subquantizador
+    "hnsw_m": 32,           # HNSW: vizinhos por nó
+    "ef_construction": 40,  # HNSW: largura da busca na construção
+    "ef_search": 64,        # HNSW: largura da busca na consulta
+    "train_size": 50000,    # Vetores amostrados para o treinamento
+    "rerank_factor": 0,     # Re-ranking: candidatos por resultado (0 = desligado; ligado, grava vectors.bin)
+}
+
+def auto_nlist(num_vectors):
+    """nlist ~ 4*sqrt(n), limitado para haver ~39 vetores de treino por lista."""
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+def index_params(overrides=None):
+    """Parâmetros do índice com os valores padrão preenchidos."""
+    params = dict(DEFAULT_INDEX_PARAMS)
+    params.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    return params
+
+def build_index(index_type, dim, num_vectors, params=None):
+    """Cria um índice vazio (mapeado por IDs) do tipo informado.
+
+    num_vectors é o número de vetores disponíveis para o treinamento; como
+    train_index usa no máximo train_size deles, nlist e pq_nbits automáticos
+    são calculados sobre essa amostra. Retorna (índice, configuração), onde a
+    configuração registra o tipo e os parâmetros efetivos para ser salva
+    junto do índice.
+    """
+    params = index_params(params)
+    num_vectors = min(num_vectors, params["train_size"])
+    if index_type == "flat":
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    elif index_type in ("fp16", "sq8"):
+        # Quantização escalar: 2 bytes (float16) ou 1 byte (int8) por dimensão, em vez de 4
+        qtype = faiss.ScalarQuantizer.QT_fp16 if index_type == "fp16" else faiss.ScalarQuantizer.QT_8bit
+        index = faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_L2))
+    elif index_type in ("ivf-flat", "ivf-pq"):
+        params["nlist"] = params["nlist"] or auto_nlist(num_vectors)
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf-flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, params["nlist"])
+        else:
+            if dim % params["pq_m"]:
+                raise ValueError(f"pq_m={params['pq_m']} não divide a dimensão {dim}")
+            # Precisa haver pelo menos 2^nbits vetores para treinar cada subquantizador
+            params["pq_nbits"] = max(1, min(params["pq_nbits"], int(math.log2(max(num_vectors, 2)))))
+            index = faiss.IndexIVFPQ(quantizer, dim, params["nlist"], params["pq_m"], params["pq_nbits"])
+    elif index_type == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, params["hnsw_m"])
+        hnsw.hnsw.efConstruction = params["ef_construction"]
+        index = faiss.IndexIDMap2(hnsw)
+    else:
+        raise ValueError(f"Tipo de índice desconhecido: {index_type} (use {', '.join(INDEX_TYPES)})")
+
+    config = {"index_type": index_type, "dim": dim, **params}
+    apply_search_params(index, config)
+    return index, config
+
+def train_index(index, vectors, train_size=DEFAULT_INDEX_PARAMS["train_size"], seed=1234):
+    """Treina o índice (se necessário) em uma amostra dos vetores."""
+    if index.is_trained:
+        return
+    if len(vectors) > train_size:
+        rng = np.random.default_rng(seed)
+        vectors = vectors[rng.choice(len(vectors), train_size, replace=False)]
+    print(f"[INFO] Treinando índice com {len(vectors)} vetores...")
+    index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+
+def needs_training(index_type):
+    return index_type in TRAINED_TYPES
+
+def supports_removal(index):
+    """Indica se o índice aceita remove_ids (HNSW não aceita)."""
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    return not isinstance(base, faiss.IndexHNSW)
+
+def apply_search_params(index, config):
+    """Aplica os parâmetros de busca (nprobe, efSearch) salvos na configuração."""
+    index_type = config.get("index_type", "flat")
+    space = faiss.ParameterSpace()
+    if index_type.startswith("ivf"):
+        space.set_index_parameter(index, "nprobe", config["nprobe"])
+    elif index_type == "hnsw":
+        space.set_index_parameter(index, "efSearch", config["ef_search"])
+
+def save_index(index, config, index_dir):
+    """Grava o índice e sua configuração (cada arquivo de forma atômica)."""
+    path = os.path.join(index_dir, INDEX_FILE)
+    faiss.write_index(index, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    path = os.path.join(index_dir, INDEX_CONFIG_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def load_config(index_dir):
+    """Configuração do índice (índices antigos, sem arquivo, são flat)."""
+    path = os.path.join(index_dir, INDEX_CONFIG_FILE)
+    if not os.path.exists(path):
+        return {"index_type": "flat"}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def read_index(index_dir, mmap=True):
+    """Lê o índice FAISS de um diretório e aplica os parâmetros de busca salvos.
+
+    Com mmap=True os vetores ficam mapeados em memória (somente leitura) e são
+    compartilhados pelo page cache entre processos; o índice não pode ser
+    modificado nesse modo. Versões do FAISS sem suporte a mmap fazem a leitura
+    completa.
+    """
+    path = os.path.join(index_dir, INDEX_FILE)
+    index = None
+    if mmap:
+        flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+        if flag is not None:
+            try:
+                index = faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                print(f"[AVISO] Índice não pôde ser mapeado em memória ({e}); lendo por completo.")
+    if index is None:
+        index = faiss.read_index(path)
+    apply_search_params(index, load_config(index_dir))
+    return index
+
+def _search_parameters(index, selector):
+    """Parâmetros de busca com seletor de IDs compatíveis com o tipo do índice."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    return faiss.SearchParameters(sel=selector)
+
+def search(index, query_vecs, top_k, mask=None, reranker=None):
+    """Busca os top_k vizinhos, opcionalmente restrita aos IDs da máscara.
+
+    mask é um array booleano indexado pelo ID do chunk. O filtro é aplicado
+    dentro da busca do FAISS (IDSelectorBitmap), então sempre retornam
+    min(top_k, IDs permitidos) resultados, sem busca extra para compensar
+    resultados descartados. Em índices aproximados (IVF/HNSW) podem voltar
+    menos resultados se os permitidos não estiverem nas regiões visitadas.
+    Com um Reranker, são buscados top_k * fator candidatos, reordenados pela
+    distância exata.
+    """
+    if reranker is not None:
+        _, I = search(index, query_vecs, top_k * reranker.factor, mask)
+        return reranker.rerank(query_vecs, I, top_k)
+    if mask is None:
+        return index.search(query_vecs, top_k)
+
+    k = min(top_k, int(np.count_nonzero(mask)))
+    if k == 0:
+        n = len(query_vecs)
+        return np.zeros((n, 0), dtype=np.float32), np.zeros((n, 0), dtype=np.int64)
+
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+    return index.search(query_vecs, k, params=_search_parameters(index, selector))
+
+def index_vectors(index):
+    """Reconstrói (ids, vetores) de um índice flat mapeado por IDs."""
+    if not isinstance(index, faiss.IndexIDMap2) or not isinstance(faiss.downcast_index(index.index), faiss.IndexFlat):
+        raise ValueError("Apenas índices flat permitem reconstruir os vetores originais")
+    ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+    return ids, index.index.reconstruct_n(0, index.ntotal)
+
+class FullVectorWriter:
+    """Grava os vetores float32 completos ao lado de um índice comprimido.
+
+    As linhas são acrescentadas na ordem em que os vetores entram no índice;
+    vector_ids.bin guarda o ID de cada linha. Ao estender a partir de um
+    checkpoint, as linhas gravadas depois dele são descartadas.
+
+    Com files=INDEX_LOG_FILES o mesmo formato serve de log dos vetores
+    acrescentados ao índice FAISS desde a última gravação do índice.
+    """
+
+    def __init__(self, index_dir, dim, append=False, rows=None, files=(VECTORS_FILE, VECTOR_IDS_FILE)):
+        self.dim = dim
+        self.paths = [os.path.join(index_dir, name) for name in files]
+        mode = "ab" if append else "wb"
+        self._vectors_file = open(self.paths[0], mode)
+        self._ids_file = open(self.paths[1], mode)
+        if append and rows is not None:
+            self._vectors_file.truncate(rows * dim * 4)
+            self._ids_file.truncate(rows * 8)
+            self._vectors_file.seek(0, os.SEEK_END)
+            self._ids_file.seek(0, os.SEEK_END)
+        self.rows = self._ids_file.tell() // 8
+
+    def add(self, ids, vectors):
+        self._vectors_file.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._ids_file.write(np.asarray(ids, dtype=np.int64).tobytes())
+        self.rows += len(ids)
+
+    def flush(self):
+        self._vectors_file.flush()
+        self._ids_file.flush()
+
+    def reset(self):
+        """Descarta todas as linhas gravadas."""
+        for f in (self._vectors_file, self._ids_file):
+            f.truncate(0)
+            f.seek(0)
+        self.rows = 0
+
+    def close(self):
+        self._vectors_file.close()
+        self._ids_file.close()
+
+def load_full_vectors(index_dir, dim, rows=None, files=(VECTORS_FILE, VECTOR_IDS_FILE)):
+    """(IDs, vetores float32 mapeados em memória) salvos para o re-ranking, ou None.
+
+    Com rows, só as primeiras linhas são lidas (as demais foram gravadas
+    depois do checkpoint, ou por uma versão mais nova que compartilha o
+    arquivo).
+    """
+    vectors_path, ids_path = (os.path.join(index_dir, name) for name in files)
+    if not os.path.exists(ids_path) or not os.path.exists(vectors_path):
+        return None
+    ids = np.fromfile(ids_path, dtype=np.int64, count=-1 if rows is None else rows)
+    if not len(ids) or os.path.getsize(vectors_path) < len(ids) * dim * 4:
+        return None
+    vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(len(ids), dim))
+    return ids, vectors
+
+class Reranker:
+    """Reordena os candidatos da busca pela distância L2 exata.
+
+    Os vetores completos ficam mapeados em memória: só as linhas dos
+    candidatos de cada busca são lidas, então a memória residente continua
+    sendo a do índice comprimido.
+    """
+
+    def __init__(self, ids, vectors, factor=RERANK_FACTOR):
+        self.vectors = vectors
+        self.factor = factor
+        self.rows = np.full(int(ids.max()) + 1, -1, dtype=np.int64)
+        self.rows[ids] = np.arange(len(ids))
+
+    def rerank(self, query_vecs, candidates, top_k):
+        k = min(top_k, candidates.shape[1])
+        D = np.full((len(query_vecs), k), np.inf, dtype=np.float32)
+        I = np.full((len(query_vecs), k), -1, dtype=np.int64)
+        for i, (query, ids) in enumerate(zip(query_vecs, candidates)):
+            ids = ids[(ids >= 0) & (ids < len(self.rows))]
+            ids = ids[self.rows[ids] >= 0]
+            if not len(ids):
+                continue
+            distances = ((self.vectors[self.rows[ids]] - query) ** 2).sum(axis=1)
+            order = np.argsort(distances, kind="stable")[:k]
+            D[i, :len(order)] = distances[order]
+            I[i, :len(order)] = ids[order]
+        return D, I
+
+def load_reranker(index_dir):
+    """Reranker do índice, se a configuração pede re-ranking e os vetores existem."""
+    config = load_config(index_dir)
+    if not config.get("rerank_factor"):
+        return None
+    stored = load_full_vectors(index_dir, config["dim"], config.get("vector_rows"))
+    if stored is None:
+        print("[AVISO] Vetores para o re-ranking não encontrados; buscando sem re-ranking.")
+        return None
+    return Reranker(*stored, factor=config["rerank_factor"])
@@ -0,0 +1,126 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+STATE_FILE = "crawl_state.db"
+MAX_AGE_HOURS = 24 * 7  # Imóveis coletados há menos tempo que isso não são buscados de novo
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    url TEXT PRIMARY KEY,
+    codigo_zuk TEXT,
+    folder TEXT,
+    content_hash TEXT,
+    first_seen REAL,
+    last_seen REAL,
+    last_scraped REAL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS queue (
+    run_id INTEGER,
+    position INTEGER,
+    url TEXT,
+    done INTEGER DEFAULT 0,
+    PRIMARY KEY (run_id, url)
+);
+"""
+
+def content_hash(metadata):
+    """Hash dos metadados que dependem do conteúdo do imóvel.
+
+    Ignora a data de extração e as URLs assinadas dos PDFs (que mudam a cada
+    acesso); os documentos entram pelo rótulo e nome do arquivo.
+    """
+    content = {k: v for k, v in metadata.items() if k not in ("data_extracao", "documentos_pdf")}
+    content["documentos_pdf"] = [(d.get("label"), d.get("filename")) for d in metadata.get("documentos_pdf", [])]
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class CrawlState:
+    """Registro persistente (SQLite) do que já foi coletado.
+
+    items guarda, por URL (e código Zuk), quando o imóvel foi visto na
+    listagem, quando foi coletado e o hash do conteúdo. Cada execução registra
+    os links da listagem em queue e marca cada um ao terminar, de modo que uma
+    execução interrompida pode ser retomada de onde parou. Pode ser usado por
+    várias threads.
+    """
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def unfinished_run(self):
+        """ID da última execução interrompida (com links pendentes), ou None."""
+        rows = self._execute("SELECT id FROM runs WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1")
+        return rows[0][0] if rows else None
+
+    def start_run(self, links):
+        """Inicia uma execução com os links coletados da listagem."""
+        now = time.time()
+        with self._lock, self._conn:
+            # Execuções antigas não terminadas são substituídas por esta
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE finished_at IS NULL", (now,))
+            run_id = self._conn.execute("INSERT INTO runs (started_at) VALUES (?)", (now,)).lastrowid
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO queue (run_id, position, url) VALUES (?, ?, ?)",
+                [(run_id, i, url) for i, url in enumerate(links)],
+            )
+            self._conn.executemany(
+                "INSERT INTO items (url, first_seen, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET last_seen = excluded.last_seen",
+                [(url, now, now) for url in links],
+            )
+        return run_id
+
+    def pending(self, run_id):
+        """Links da execução ainda não processados, na ordem da listagem."""
+        rows = self._execute("SELECT url FROM queue WHERE run_id = ? AND done = 0 ORDER BY position", (run_id,))
+        return [url for url, in rows]
+
+    def mark_done(self, run_id, url):
+        self._execute("UPDATE queue SET done = 1 WHERE run_id = ? AND url = ?", (run_id, url))
+
+    def finish_run(self, run_id):
+        self._execute("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), run_id))
+
+    def is_fresh(self, url, max_age_hours=MAX_AGE_HOURS):
+        """Indica se o imóvel foi coletado há menos de max_age_hours."""
+        rows = self._execute("SELECT last_scraped FROM items WHERE url = ?", (url,))
+        return bool(rows and rows[0][0] and time.time() - rows[0][0] < max_age_hours * 3600)
+
+    def get(self, url):
+        """Registro de um imóvel (dict) ou None."""
+        rows = self._execute("SELECT codigo_zuk, folder, content_hash, last_scraped FROM items WHERE url = ?", (url,))
+        if not rows:
+            return None
+        return dict(zip(("codigo_zuk", "folder", "content_hash", "last_scraped"), rows[0]))
+
+    def record(self, url, codigo_zuk, folder, digest):
+        """Registra uma coleta do imóvel."""
+        now = time.time()
+        self._execute(
+            "INSERT INTO items (url, codigo_zuk, folder, content_hash, first_seen, last_seen, last_scraped) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET codigo_zuk = excluded.codigo_zuk, "
+            "folder = excluded.folder, content_hash = excluded.content_hash, last_seen = excluded.last_seen, "
+            "last_scraped = excluded.last_scraped",
+            (url, codigo_zuk, folder, digest, now, now, now),
+        )
+
+    def invalidate(self, url):
+        """Faz o imóvel ser coletado de novo na próxima execução."""
+        self._execute("UPDATE items SET last_scraped = NULL WHERE url = ?", (url,))
+
+    def close(self):
+        self._conn.close()
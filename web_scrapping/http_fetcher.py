@@ -0,0 +1,82 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from stage_timer import StageTimer
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36'
+}
+CONCURRENCY = 8    # Páginas buscadas em paralelo
+RATE_LIMIT = 4.0   # Máximo de requisições por segundo (0 = sem limite)
+TIMEOUT = 30
+
+class RateLimiter:
+    """Espaça as requisições (de todas as threads) em no mínimo 1/rate segundos."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+def create_session(pool_size=CONCURRENCY, retries=3):
+    """Sessão HTTP com pool de conexões reutilizáveis e retentativas com backoff."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET", "HEAD"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_html(session, url, rate_limiter=None, timeout=TIMEOUT):
+    """Baixa uma página e retorna (URL final, HTML)."""
+    if rate_limiter:
+        rate_limiter.wait()
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    # O portal é UTF-8; sem charset no cabeçalho o requests assumiria ISO-8859-1
+    if "charset" not in response.headers.get("Content-Type", ""):
+        response.encoding = "utf-8"
+    return response.url, response.text
+
+def fetch_pages(links, handler, concurrency=CONCURRENCY, rate_limit=RATE_LIMIT, session=None, timer=None):
+    """Busca as páginas em paralelo e chama handler(link, url_final, html) para cada uma.
+
+    O handler roda na thread que buscou a página. O tempo das requisições é
+    acumulado na etapa "navegar" do timer. Retorna a lista de
+    (link, resultado do handler ou None, erro ou None) na ordem de conclusão.
+    """
+    session = session or create_session(concurrency)
+    rate_limiter = RateLimiter(rate_limit)
+    timer = timer or StageTimer()
+
+    def task(link):
+        with timer.stage("navegar"):
+            url, html = fetch_html(session, link, rate_limiter)
+        return handler(link, url, html)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(task, link): link for link in links}
+        for future in as_completed(futures):
+            link = futures[future]
+            try:
+                results.append((link, future.result(), None))
+            except Exception as e:
+                print(f"[ERRO] Falha ao processar {link}: {e}")
+                results.append((link, None, e))
+    return results
@@ -0,0 +1,247 @@
+"""Processamento das páginas dos imóveis (sem o navegador).
+
+As páginas são buscadas por HTTP; cada imóvel ganha uma pasta em leiloes/
+com o metadata.json, o HTML da página e os PDFs. O Selenium só é usado em
+zuk_scrapper.py, para percorrer a listagem.
+"""
+import os
+import re
+import json
+import time
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+from property_parser import parse_property_html
+from http_fetcher import CONCURRENCY, RATE_LIMIT, create_session, fetch_pages
+from crawl_state import MAX_AGE_HOURS, content_hash
+from pdf_downloader import PDF_RATE_LIMIT, PDF_WORKERS, PdfDownloader, download_file, pdf_filename
+from stage_timer import StageTimer
+
+def find_leilao_folder(metadata, base_path="leiloes"):
+    """Pasta já existente do mesmo imóvel, ou None.
+
+    O nome da pasta inclui o endereço extraído da página, que pode mudar
+    (endereço corrigido no site ou na extração). O código Zuk não identifica
+    o imóvel (vários imóveis compartilham o mesmo código), então ele só
+    restringe a busca: a pasta é a que tem no metadata.json a mesma URL ou o
+    mesmo product_id.
+    """
+    codigo = metadata.get('codigo_zuk')
+    if not codigo or not os.path.isdir(base_path):
+        return None
+    prefix = f"leilao_{codigo}_"
+    keys = [(field, metadata[field]) for field in ('url', 'product_id') if metadata.get(field)]
+    for name in sorted(os.listdir(base_path)):
+        folder_path = os.path.join(base_path, name)
+        if not name.startswith(prefix) or not os.path.isdir(folder_path):
+            continue
+        try:
+            with open(os.path.join(folder_path, "metadata.json"), 'r', encoding='utf-8') as f:
+                existing = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if any(existing.get(field) == value for field, value in keys):
+            return folder_path
+    return None
+
+def create_leilao_folder(metadata, base_path="leiloes"):
+    """Cria pasta para o leilão baseada nos metadados (ou reaproveita a pasta já existente do imóvel).
+
+    Se já existe uma pasta com o mesmo nome de outro imóvel (mesmo código e
+    endereço), o nome recebe um sufixo numérico.
+    """
+    existing = find_leilao_folder(metadata, base_path)
+    if existing:
+        return existing
+    try:
+        # Criar nome da pasta limpo
+        codigo = metadata.get('codigo_zuk', 'sem_codigo')
+        endereco = metadata.get('endereco_completo', metadata.get('bairro', 'sem_endereco'))
+        
+        # Limpar caracteres especiais
+        endereco_limpo = re.sub(r'[^\w\s-]', '', endereco)
+        endereco_limpo = re.sub(r'\s+', '_', endereco_limpo.strip())[:50]
+        
+        folder_name = f"leilao_{codigo}_{endereco_limpo}"
+        folder_path = os.path.join(base_path, folder_name)
+        os.makedirs(base_path, exist_ok=True)
+        n = 1
+        while True:
+            try:
+                # Sem exist_ok: duas threads nunca recebem a mesma pasta
+                os.mkdir(folder_path)
+                return folder_path
+            except FileExistsError:
+                n += 1
+                folder_path = os.path.join(base_path, f"{folder_name}_{n}")
+        
+    except Exception as e:
+        print(f"[ERRO] Erro ao criar pasta: {e}")
+        # Pasta padrão se der erro
+        folder_path = os.path.join(base_path, f"leilao_{int(time.time())}")
+        os.makedirs(folder_path, exist_ok=True)
+        return folder_path
+
+def download_pdf(url, folder_path, filename=None, session=None):
+    """Baixa um arquivo PDF para a pasta especificada."""
+    try:
+        if not filename:
+            filename = os.path.basename(urlparse(url).path)
+            if not filename.endswith('.pdf'):
+                filename = f"documento_{int(time.time())}.pdf"
+        
+        file_path = os.path.join(folder_path, filename)
+        
+        # Arquivos existentes só são reaproveitados se forem PDFs completos
+        if download_file(session or create_session(1), url, file_path) == "existente":
+            print(f"[INFO] PDF já existe: {filename}")
+        else:
+            print(f"[SUCESSO] PDF baixado: {filename}")
+        return file_path
+        
+    except Exception as e:
+        print(f"[ERRO] Erro ao baixar PDF {url}: {e}")
+        return None
+
+def save_metadata(metadata, folder_path):
+    """Salva metadados em arquivo JSON.
+
+    O arquivo é escrito em um temporário da mesma pasta e trocado com
+    os.replace: quem lê (ou outra thread gravando) nunca vê um JSON pela metade.
+    """
+    try:
+        metadata_path = os.path.join(folder_path, "metadata.json")
+        tmp_path = f"{metadata_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, metadata_path)
+        print(f"[SUCESSO] Metadados salvos em: {metadata_path}")
+    except Exception as e:
+        print(f"[ERRO] Erro ao salvar metadados: {e}")
+
+
+def registered_folder(state, link, base_path="leiloes"):
+    """Pasta de base_path registrada no registro de coleta para a URL, ou None.
+
+    Só a própria URL conta: o código Zuk se repete entre imóveis, então uma
+    URL nova nunca herda a pasta de outra URL com o mesmo código.
+    """
+    previous = state.get(link) if state else None
+    folder = previous["folder"] if previous else None
+    if folder and os.path.dirname(os.path.normpath(folder)) == os.path.normpath(base_path):
+        return folder
+    return None
+
+def process_property(link, url, html, base_path="leiloes", state=None, downloader=None, timer=None):
+    """Extrai os metadados do HTML do imóvel, salva a pasta do leilão e baixa os PDFs.
+    
+    Com o registro de coleta (state), imóveis cujo conteúdo não mudou desde a
+    última coleta (e com os PDFs já baixados) não são regravados. Com um
+    downloader, os PDFs são apenas enfileirados. Retorna "novo", "alterado"
+    ou "inalterado".
+    """
+    timer = timer or StageTimer()
+    with timer.stage("extrair"):
+        metadata = parse_property_html(html, url)
+        digest = content_hash(metadata)
+        pdf_files = [pdf_filename(j, pdf_info['label']) for j, pdf_info in enumerate(metadata.get('documentos_pdf', []))]
+    
+    previous = state.get(link) if state else None
+    if previous and previous["content_hash"] == digest and os.path.isdir(previous["folder"] or "") and \
+            all(os.path.exists(os.path.join(previous["folder"], f)) for f in pdf_files):
+        state.record(link, metadata.get('codigo_zuk'), previous["folder"], digest)
+        print(f"[INFO] Sem mudanças: {link}")
+        return "inalterado"
+    
+    with timer.stage("salvar"):
+        # Imóveis já registrados continuam na mesma pasta, mesmo que o endereço mude
+        folder_path = registered_folder(state, link, base_path)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+        else:
+            folder_path = create_leilao_folder(metadata, base_path)
+        
+        # Salvar metadados
+        save_metadata(metadata, folder_path)
+        
+        # Salvar HTML da página do imóvel na pasta do leilão
+        html_filename = f"pagina_imovel.html"
+        html_path = os.path.join(folder_path, html_filename)
+        try:
+            with open(html_path, 'w', encoding='utf-8') as f:
+                f.write(html)
+            print(f"[SUCESSO] HTML salvo: {html_filename}")
+        except Exception as e:
+            print(f"[ERRO] Erro ao salvar HTML: {e}")
+    
+    # Baixar PDFs (em segundo plano quando há um downloader)
+    for pdf_info, filename in zip(metadata.get('documentos_pdf', []), pdf_files):
+        if downloader:
+            downloader.submit(pdf_info['url'], folder_path, filename, tag=link)
+        else:
+            with timer.stage("download"):
+                download_pdf(pdf_info['url'], folder_path, filename)
+    
+    if state:
+        state.record(link, metadata.get('codigo_zuk'), folder_path, digest)
+    
+    print(f"[SUCESSO] Leilão processado: {link} -> {folder_path}")
+    print(f"[INFO] Metadados: Código {metadata.get('codigo_zuk')}, Preço R$ {metadata.get('preco')}")
+    return "alterado" if previous and previous["content_hash"] else "novo"
+
+
+def process_links(links, concurrency=CONCURRENCY, rate_limit=RATE_LIMIT, base_path="leiloes",
+                  state=None, run_id=None, max_age_hours=MAX_AGE_HOURS,
+                  pdf_workers=PDF_WORKERS, pdf_rate_limit=PDF_RATE_LIMIT, timer=None):
+    """Busca as páginas dos imóveis por HTTP, em paralelo, e processa cada uma.
+    
+    O navegador só é necessário para coletar os links da listagem; as páginas
+    dos imóveis são baixadas com conexões reutilizadas (pool), com no máximo
+    concurrency requisições simultâneas e rate_limit requisições por segundo.
+    Com o registro de coleta, imóveis coletados há menos de max_age_hours são
+    pulados e cada link concluído é marcado na execução run_id. Os PDFs são
+    baixados por um pool próprio (pdf_workers) enquanto as páginas seguintes
+    são processadas. O tempo de cada etapa é acumulado em timer.
+    
+    Retorna um Counter com o total por situação (novo, alterado, inalterado,
+    recente, falha) e dos PDFs (pdf_baixado, pdf_existente, pdf_falha).
+    """
+    counts = Counter()
+    if state and max_age_hours:
+        recent = [link for link in links if state.is_fresh(link, max_age_hours)]
+        for link in recent:
+            state.mark_done(run_id, link)
+        counts["recente"] = len(recent)
+        recent = set(recent)
+        links = [link for link in links if link not in recent]
+    
+    timer = timer or StageTimer()
+    downloader = PdfDownloader(pdf_workers, pdf_rate_limit, timer=timer)
+    
+    def handle(link, url, html):
+        status = process_property(link, url, html, base_path, state, downloader, timer)
+        if state:
+            state.mark_done(run_id, link)
+        return status
+    
+    print(f"\n[INFO] Processando {len(links)} imóveis ({concurrency} em paralelo, até {rate_limit} req/s)")
+    if counts["recente"]:
+        print(f"[INFO] {counts['recente']} imóveis coletados há menos de {max_age_hours}h foram pulados")
+    session = create_session(concurrency)
+    results = fetch_pages(links, handle, concurrency=concurrency, rate_limit=rate_limit, session=session,
+                          timer=timer)
+    session.close()
+    
+    print("[INFO] Aguardando os downloads de PDFs pendentes...")
+    for status, count in downloader.close().items():
+        counts[f"pdf_{status}"] = count
+    if state:
+        # Imóveis com PDFs faltando são buscados de novo na próxima execução
+        for link in downloader.failed:
+            state.invalidate(link)
+    
+    for _, status, error in results:
+        counts["falha" if error else status] += 1
+    if counts["falha"]:
+        print(f"[AVISO] {counts['falha']} imóveis falharam.")
+    return counts
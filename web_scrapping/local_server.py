@@ -0,0 +1,125 @@
+import os
+import re
+import json
+import time
+import random
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, unquote
+from pdf_downloader import pdf_filename
+
+DATA_DIR = "leiloes"
+# Hosts dos documentos; na página servida os links apontam para /docs/<host>/...
+DOC_HOSTS = re.compile(r"https?://(documentacao(?:leilao)?\.portalzuk\.com\.br)")
+SITE_HOST = re.compile(r"https?://www\.portalzuk\.com\.br")
+
+def load_routes(data_dir):
+    """Mapeia os caminhos das URLs originais para os arquivos salvos nas pastas."""
+    pages, docs = {}, {}
+    for folder in sorted(os.listdir(data_dir)):
+        folder_path = os.path.join(data_dir, folder)
+        metadata_path = os.path.join(folder_path, "metadata.json")
+        html_path = os.path.join(folder_path, "pagina_imovel.html")
+        if not (os.path.exists(metadata_path) and os.path.exists(html_path)):
+            continue
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        pages[unquote(urlparse(metadata["url"]).path)] = html_path
+        for i, doc in enumerate(metadata.get("documentos_pdf", [])):
+            pdf_path = os.path.join(folder_path, pdf_filename(i, doc["label"]))
+            if os.path.exists(pdf_path):
+                url = urlparse(doc["url"])
+                docs[f"/docs/{url.netloc}{unquote(url.path)}"] = pdf_path
+    return pages, docs
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serve as páginas de imóveis salvas como se fossem o portal."""
+
+    pages = {}
+    docs = {}
+    delay = 0.0
+    drop_rate = 0.0
+
+    def do_GET(self):
+        path = unquote(urlparse(self.path).path)
+        base = f"http://{self.headers.get('Host')}"
+        if path == "/links.txt":
+            body = "\n".join(base + p for p in self.pages).encode("utf-8")
+            return self.send_body(body, "text/plain; charset=utf-8")
+        if path in self.pages:
+            if self.delay:
+                time.sleep(self.delay)
+            with open(self.pages[path], "r", encoding="utf-8") as f:
+                html = f.read()
+            html = DOC_HOSTS.sub(lambda m: f"{base}/docs/{m.group(1)}", html)
+            html = SITE_HOST.sub(base, html)
+            return self.send_body(html.encode("utf-8"), "text/html; charset=UTF-8")
+        if path in self.docs:
+            with open(self.docs[path], "rb") as f:
+                return self.send_pdf(f.read())
+        self.send_error(404)
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_pdf(self, body):
+        """Serve o PDF com suporte a Range; com drop_rate, corta parte das respostas no meio."""
+        start = 0
+        range_match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        if range_match:
+            start = int(range_match.group(1))
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        if random.random() < self.drop_rate:
+            # Conexão interrompida no meio do download
+            self.wfile.write(body[start:start + (len(body) - start) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+def create_server(data_dir=DATA_DIR, host="127.0.0.1", port=8000, delay=0.0, drop_rate=0.0):
+    pages, docs = load_routes(data_dir)
+    handler = type("Handler", (StandInHandler,),
+                   {"pages": pages, "docs": docs, "delay": delay, "drop_rate": drop_rate})
+    return ThreadingHTTPServer((host, port), handler)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Servidor local que imita o portal com as páginas salvas")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="Latência simulada por página, em segundos")
+    parser.add_argument("--drop-rate", type=float, default=0.0,
+                        help="Fração dos downloads de PDF interrompidos no meio (testa a retomada)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = create_server(args.data_dir, port=args.port, delay=args.delay, drop_rate=args.drop_rate)
+    host, port = server.server_address
+    print(f"[INFO] {len(server.RequestHandlerClass.pages)} páginas de imóveis em http://{host}:{port}/")
+    print(f"[INFO] Links: http://{host}:{port}/links.txt")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,161 @@
+import os
+import re
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from http_fetcher import RateLimiter, TIMEOUT, create_session
+from stage_timer import StageTimer
+
+PDF_WORKERS = 4        # Downloads simultâneos
+PDF_RATE_LIMIT = 2.0   # Máximo de requisições por segundo para cada host (0 = sem limite)
+RETRIES = 4
+BACKOFF = 1.0          # Espera base entre tentativas (dobra a cada falha)
+PART_SUFFIX = ".part"
+CHUNK_SIZE = 64 * 1024
+
+class IntegrityError(Exception):
+    """O arquivo baixado não é um PDF completo."""
+
+def pdf_filename(index, label):
+    """Nome do documento na pasta do leilão: 01_Edital_de_venda.pdf"""
+    safe_label = re.sub(r'[^\w\s-]', '', label)
+    safe_label = re.sub(r'\s+', '_', safe_label.strip())
+    return f"{index + 1:02d}_{safe_label}.pdf"
+
+def is_complete_pdf(path):
+    """Verifica o cabeçalho %PDF- e o marcador %%EOF no final do arquivo."""
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            if f.read(5) != b"%PDF-":
+                return False
+            f.seek(max(0, size - 2048))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+class HostRateLimiter:
+    """Um RateLimiter por host."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            limiter = self._limiters.setdefault(host, RateLimiter(self.rate))
+        limiter.wait()
+
+def _expected_size(response, offset):
+    """Tamanho final do arquivo segundo Content-Range/Content-Length (ou None)."""
+    content_range = response.headers.get("Content-Range", "")
+    if "/" in content_range and not content_range.endswith("/*"):
+        return int(content_range.rsplit("/", 1)[1])
+    length = response.headers.get("Content-Length")
+    if length is None or response.headers.get("Content-Encoding"):
+        return None
+    return offset + int(length)
+
+def download_file(session, url, file_path, rate_limiter=None, retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT):
+    """Baixa um PDF de forma segura e retomável.
+
+    O download é gravado em <arquivo>.part e só é renomeado (atomicamente)
+    para o nome final depois de conferir o Content-Length e a integridade do
+    PDF. Falhas de rede são repetidas com backoff exponencial, continuando do
+    ponto em que pararam (requisição com Range). Retorna "existente" ou "baixado".
+    """
+    if os.path.exists(file_path) and is_complete_pdf(file_path):
+        return "existente"
+
+    part_path = file_path + PART_SUFFIX
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            if rate_limiter:
+                rate_limiter.wait(url)
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 416 and offset:
+                    # O .part já tem o arquivo inteiro
+                    expected = offset
+                else:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        offset = 0  # O servidor ignorou o Range: recomeçar
+                    expected = _expected_size(response, offset)
+                    with open(part_path, "ab" if offset else "wb") as f:
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            f.write(chunk)
+
+            size = os.path.getsize(part_path)
+            if expected is not None and size != expected:
+                raise requests.exceptions.ConnectionError(f"download incompleto ({size} de {expected} bytes)")
+            if not is_complete_pdf(part_path):
+                os.remove(part_path)
+                raise IntegrityError(f"{url} não é um PDF completo")
+            os.replace(part_path, file_path)
+            return "baixado"
+
+        except requests.exceptions.HTTPError as e:
+            # 4xx não melhora com novas tentativas (links assinados expirados, por exemplo)
+            if e.response is not None and e.response.status_code < 500:
+                raise
+            error = e
+        except requests.exceptions.RequestException as e:
+            error = e
+
+        if attempt < retries:
+            delay = backoff * 2 ** attempt
+            print(f"[AVISO] Falha ao baixar {os.path.basename(file_path)} ({error}); nova tentativa em {delay:.1f}s")
+            time.sleep(delay)
+    raise error
+
+class PdfDownloader:
+    """Fila de downloads de PDFs atendida por um pool de threads.
+
+    Os downloads compartilham uma sessão HTTP (conexões reutilizadas) e
+    respeitam um limite de requisições por host. submit() não bloqueia, então
+    os PDFs são baixados enquanto as páginas seguintes são processadas.
+    """
+
+    def __init__(self, workers=PDF_WORKERS, rate_limit=PDF_RATE_LIMIT, session=None, timer=None):
+        self.session = session or create_session(workers)
+        self.timer = timer or StageTimer()
+        self.rate_limiter = HostRateLimiter(rate_limit)
+        self.counts = Counter()
+        self.failed = set()   # Tags (ex.: link do imóvel) com algum download que falhou
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def _download(self, url, file_path, tag):
+        filename = os.path.basename(file_path)
+        try:
+            with self.timer.stage("download"):
+                status = download_file(self.session, url, file_path, self.rate_limiter)
+            if status == "existente":
+                print(f"[INFO] PDF já existe: {filename}")
+            else:
+                print(f"[SUCESSO] PDF baixado: {filename}")
+        except Exception as e:
+            print(f"[ERRO] Erro ao baixar PDF {url}: {e}")
+            status = "falha"
+        with self._lock:
+            self.counts[status] += 1
+            if status == "falha" and tag is not None:
+                self.failed.add(tag)
+        return status
+
+    def submit(self, url, folder_path, filename, tag=None):
+        """Enfileira um download. Retorna um Future com o resultado."""
+        return self._executor.submit(self._download, url, os.path.join(folder_path, filename), tag)
+
+    def close(self):
+        """Aguarda os downloads pendentes e retorna as contagens por resultado."""
+        self._executor.shutdown(wait=True)
+        self.session.close()
+        return self.counts
@@ -0,0 +1,123 @@
+import os
+import re
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+# Objeto literal do dataLayer embutido na página: dataLayer=[{ 'chave':'valor', ... }]
+DATA_LAYER_PATTERN = re.compile(r"dataLayer\s*=\s*\[\s*\{(.*?)\}\s*\]", re.S)
+DATA_LAYER_ENTRY = re.compile(r"'(\w+)'\s*:\s*'((?:[^'\\]|\\.)*)'")
+
+ENDERECO_PATTERN = re.compile(r"localizado em [^/]*/[A-Z]{2} - (.+?) - \.")
+
+DATA_LAYER_FIELDS = {
+    'leilao_id': 'leilaoId',
+    'codigo_zuk': 'codZ',
+    'product_id': 'productId',
+    'preco': 'price',
+    'tipo_imovel': 'tipoImovel',
+    'uf': 'uf',
+    'cidade': 'cidade',
+    'bairro': 'bairro',
+    'comitente': 'comitente',
+}
+
+class PropertyPageParser(HTMLParser):
+    """Coleta título, meta description, scripts e links de PDF de uma página de imóvel."""
+
+    def __init__(self, base_url=""):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.title = ""
+        self.description = ""
+        self.scripts = []
+        self.pdf_links = []
+        self._in_title = False
+        self._in_script = False
+        self._pdf = None         # Link de PDF aberto (<a> ainda não fechado)
+        self._in_label = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "title":
+            self._in_title = True
+        elif tag == "script":
+            self._in_script = True
+            self.scripts.append("")
+        elif tag == "meta" and attrs.get("name") == "description":
+            self.description = attrs.get("content") or ""
+        elif tag == "a" and ".pdf" in (attrs.get("href") or ""):
+            self._pdf = {"url": urljoin(self.base_url, attrs["href"].strip()), "label": ""}
+        elif tag == "span" and self._pdf is not None and \
+                "property-documents-item-label" in (attrs.get("class") or "").split():
+            self._in_label = True
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag == "script":
+            self._in_script = False
+        elif tag == "span":
+            self._in_label = False
+        elif tag == "a" and self._pdf is not None:
+            self.pdf_links.append(self._pdf)
+            self._pdf = None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif self._in_script:
+            self.scripts[-1] += data
+        elif self._in_label:
+            self._pdf["label"] += data
+
+def parse_data_layer(html):
+    """Extrai os pares chave/valor do primeiro dataLayer da página."""
+    match = DATA_LAYER_PATTERN.search(html)
+    if not match:
+        return {}
+    return {key: value.replace("\\'", "'") for key, value in DATA_LAYER_ENTRY.findall(match.group(1))}
+
+def extract_endereco(meta_desc):
+    """Extrai o endereço da meta description.
+
+    Formato: "Leilão de <tipo> localizado em <cidade>/<UF> - <endereço> - .<descrição> - <bairro> cod:..."
+    A descrição sempre começa com "." (ou é apenas ".." quando vazia).
+    """
+    endereco_match = ENDERECO_PATTERN.search(meta_desc)
+    if not endereco_match:
+        return ""
+    endereco = " ".join(endereco_match.group(1).split())
+    return endereco.replace(" ,", ",")
+
+def parse_property_html(html, url):
+    """Extrai os metadados de um imóvel a partir do HTML da página.
+
+    Retorna o mesmo dicionário que a extração pelo navegador: campos do
+    dataLayer, título, endereço (meta description), URL e documentos PDF.
+    """
+    parser = PropertyPageParser(url)
+    parser.feed(html)
+    parser.close()
+
+    metadata = {}
+    scripts = "\n".join(s for s in parser.scripts if "dataLayer" in s)
+    data_layer = parse_data_layer(scripts)
+    if data_layer:
+        metadata.update({field: data_layer.get(key, '') for field, key in DATA_LAYER_FIELDS.items()})
+
+    metadata['titulo'] = parser.title.strip()
+    metadata['endereco_completo'] = extract_endereco(parser.description)
+    metadata['url'] = url
+
+    pdf_links = []
+    for link in parser.pdf_links:
+        pdf_links.append({
+            'url': link['url'],
+            'label': " ".join(link['label'].split()) or "Documento",
+            'filename': os.path.basename(urlparse(link['url']).path)
+        })
+    metadata['documentos_pdf'] = pdf_links
+    metadata['total_documentos'] = len(pdf_links)
+    metadata['data_extracao'] = time.strftime("%Y-%m-%d %H:%M:%S")
+    return metadata
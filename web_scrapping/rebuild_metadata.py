@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from property_parser import parse_property_html
+
+DATA_DIR = "leiloes"
+HTML_FILE = "pagina_imovel.html"
+METADATA_FILE = "metadata.json"
+WORKERS = os.cpu_count() or 1
+# Campos que dependem do momento da coleta, não do HTML
+PRESERVED_FIELDS = ["url", "data_extracao"]
+
+def load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_metadata(metadata, folder_path):
+    """Grava metadata.json de forma atômica."""
+    path = os.path.join(folder_path, METADATA_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def rebuild_folder(folder_path, dry_run=False):
+    """Reextrai os metadados de uma pasta a partir do HTML salvo.
+
+    Retorna (pasta, {campo: (valor antigo, valor novo)}) com os campos alterados.
+    """
+    old = load_json(os.path.join(folder_path, METADATA_FILE))
+    with open(os.path.join(folder_path, HTML_FILE), "r", encoding="utf-8") as f:
+        html = f.read()
+
+    metadata = parse_property_html(html, old.get("url", ""))
+    for field in PRESERVED_FIELDS:
+        if field in old:
+            metadata[field] = old[field]
+
+    changes = {field: (old.get(field), metadata.get(field))
+               for field in dict.fromkeys(list(old) + list(metadata))
+               if old.get(field) != metadata.get(field)}
+    if changes and not dry_run:
+        write_metadata(metadata, folder_path)
+    return folder_path, changes
+
+def _rebuild_task(args):
+    return rebuild_folder(*args)
+
+def list_folders(data_dir):
+    """Pastas de leilão que têm a página do imóvel salva."""
+    return [os.path.join(data_dir, folder) for folder in sorted(os.listdir(data_dir))
+            if os.path.exists(os.path.join(data_dir, folder, HTML_FILE))]
+
+def rebuild_all(data_dir=DATA_DIR, workers=WORKERS, dry_run=False):
+    """Reextrai os metadados de todas as pastas em um pool de processos."""
+    folders = list_folders(data_dir)
+    tasks = [(folder, dry_run) for folder in folders]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_rebuild_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    return [_rebuild_task(task) for task in tasks]
+
+def print_report(results, verbose=False):
+    changed = [(folder, changes) for folder, changes in results if changes]
+    field_counts = Counter(field for _, changes in changed for field in changes)
+
+    print(f"\n[RELATÓRIO] {len(results)} pastas processadas, {len(changed)} com metadados alterados")
+    for field, count in field_counts.most_common():
+        print(f"  - {field}: {count} pastas")
+    if verbose:
+        for folder, changes in changed:
+            print(f"\n{os.path.basename(folder)}")
+            for field, (old, new) in changes.items():
+                print(f"  {field}: {old!r} -> {new!r}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reconstrói os metadata.json a partir das páginas salvas")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Processos para a extração")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas relata as mudanças, sem gravar")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os valores antigos e novos")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    start = time.perf_counter()
+    results = rebuild_all(args.data_dir, args.workers, args.dry_run)
+    print_report(results, args.verbose)
+    action = "simulada" if args.dry_run else "concluída"
+    print(f"\n[SUCESSO] Reextração {action} em {time.perf_counter() - start:.2f}s ({args.workers} processos)")
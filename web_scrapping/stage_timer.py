@@ -0,0 +1,38 @@
+import time
+import threading
+from contextlib import contextmanager
+
+class StageTimer:
+    """Acumula o tempo gasto em cada etapa da coleta (seguro entre threads).
+
+    Com várias threads, o tempo somado das etapas pode passar do tempo total
+    de execução; a coluna de percentual é relativa à soma das etapas.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def report(self):
+        """Linhas da tabela de tempos por etapa."""
+        total = sum(self.totals.values()) or 1.0
+        lines = [f"{'etapa':<12} {'total (s)':>10} {'vezes':>7} {'média (ms)':>11} {'%':>6}"]
+        for stage, seconds in self.totals.items():
+            count = self.counts[stage]
+            lines.append(f"{stage:<12} {seconds:>10.2f} {count:>7} {seconds / count * 1000:>11.1f} "
+                         f"{seconds / total * 100:>6.1f}")
+        return lines
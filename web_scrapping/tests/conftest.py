@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos da coleta são scripts do diretório web_scrapping/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
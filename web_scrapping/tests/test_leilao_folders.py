@@ -0,0 +1,118 @@
+import os
+import json
+import shutil
+import pytest
+from crawl_state import CrawlState
+from http_scraper import create_leilao_folder, find_leilao_folder, process_property, save_metadata
+
+LEILOES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "leiloes")
+FOLDER = "leilao_33734_Avenida_Professora_Ida_Kolb_225"
+URL = "https://www.portalzuk.com.br/imovel/sp/sao-paulo/jardim-das-laranjeiras/avenida-professora-ida-kolb-225/33526-205544"
+OTHER_URL = "https://www.portalzuk.com.br/imovel/sp/sao-paulo/jardim-das-laranjeiras/rua-b-10/33527-205545"
+
+class QueueDownloader:
+    """Registra os PDFs enfileirados, sem baixar."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, url, folder_path, filename, tag=None):
+        self.submitted.append((folder_path, filename))
+
+@pytest.fixture
+def html():
+    with open(os.path.join(LEILOES_DIR, FOLDER, "pagina_imovel.html"), "r", encoding="utf-8") as f:
+        return f.read()
+
+@pytest.fixture
+def state(tmp_path):
+    state = CrawlState(str(tmp_path / "crawl_state.db"))
+    yield state
+    state.close()
+
+def other_property(html):
+    """Mesma página com outro product_id: outro imóvel com o mesmo código Zuk."""
+    assert "productId':'205544'" in html
+    return html.replace("productId':'205544'", "productId':'205545'")
+
+def read_metadata(folder):
+    with open(os.path.join(folder, "metadata.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def make_folder(base, name, **metadata):
+    os.makedirs(os.path.join(base, name))
+    with open(os.path.join(base, name, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump({"codigo_zuk": name.split("_")[1], **metadata}, f)
+    return os.path.join(base, name)
+
+def test_pasta_com_endereco_antigo_e_reaproveitada(tmp_path):
+    """A correção da extração do endereço não cria uma segunda pasta para o imóvel."""
+    base = str(tmp_path)
+    other = make_folder(base, "leilao_33734_", url=OTHER_URL, product_id="205545")
+    old = make_folder(base, "leilao_33734_Avenida", url=URL, product_id="205544")
+    metadata = {"codigo_zuk": "33734", "endereco_completo": "Avenida Professora Ida Kolb, 225", "url": URL,
+                "product_id": "205544"}
+    assert find_leilao_folder(metadata, base) == old
+    assert create_leilao_folder(metadata, base) == old
+    # URL diferente (parâmetros na URL, por exemplo), mesmo product_id
+    assert find_leilao_folder(dict(metadata, url=URL + "?v=2"), base) == old
+    assert find_leilao_folder({"codigo_zuk": "33734", "url": OTHER_URL}, base) == other
+
+def test_mesmo_codigo_outro_imovel_ganha_pasta_propria(tmp_path):
+    """O código Zuk se repete entre imóveis: sem URL ou product_id iguais, a pasta é nova."""
+    base = str(tmp_path)
+    existing = make_folder(base, "leilao_33768_", url=URL, product_id="205544")
+    metadata = {"codigo_zuk": "33768", "endereco_completo": "", "url": OTHER_URL, "product_id": "205545"}
+    assert find_leilao_folder(metadata, base) is None
+    folder = create_leilao_folder(metadata, base)
+    assert folder == os.path.join(base, "leilao_33768__2")
+    assert folder != existing
+    assert create_leilao_folder({"codigo_zuk": "40000", "endereco_completo": "Rua A, 1"}, base) == \
+        os.path.join(base, "leilao_40000_Rua_A_1")
+
+def test_process_property_usa_a_pasta_do_registro(tmp_path, html, state):
+    base = str(tmp_path / "leiloes")
+    assert process_property(URL, URL, html, base, state, QueueDownloader()) == "novo"
+    assert os.listdir(base) == [FOLDER]
+
+    # A pasta registrada para a URL é mantida mesmo com outro nome (endereço mudou)
+    renamed = os.path.join(base, "leilao_33734_")
+    shutil.move(os.path.join(base, FOLDER), renamed)
+    state.record(URL, "33734", renamed, "hash antigo")
+    downloader = QueueDownloader()
+    assert process_property(URL, URL, html, base, state, downloader) == "alterado"
+    assert os.listdir(base) == ["leilao_33734_"]
+    assert {folder for folder, _ in downloader.submitted} == {renamed}
+
+    # Uma segunda URL com o mesmo código Zuk não herda a pasta registrada
+    downloader = QueueDownloader()
+    assert process_property(OTHER_URL, OTHER_URL, other_property(html), base, state, downloader) == "novo"
+    folder = state.get(OTHER_URL)["folder"]
+    assert folder != renamed
+    assert sorted(os.listdir(base)) == sorted(["leilao_33734_", os.path.basename(folder)])
+    assert {path for path, _ in downloader.submitted} == {folder}
+
+def test_urls_com_o_mesmo_codigo_mantem_metadados_separados(tmp_path, html, state):
+    base = str(tmp_path / "leiloes")
+    process_property(URL, URL, html, base, state, QueueDownloader())
+    process_property(OTHER_URL, OTHER_URL, other_property(html), base, state, QueueDownloader())
+    # Nova coleta das duas: cada uma volta para a própria pasta
+    state.record(URL, "33734", state.get(URL)["folder"], "hash antigo")
+    state.record(OTHER_URL, "33734", state.get(OTHER_URL)["folder"], "hash antigo")
+    process_property(OTHER_URL, OTHER_URL, other_property(html), base, state, QueueDownloader())
+    process_property(URL, URL, html, base, state, QueueDownloader())
+
+    first, second = read_metadata(state.get(URL)["folder"]), read_metadata(state.get(OTHER_URL)["folder"])
+    assert state.get(URL)["folder"] != state.get(OTHER_URL)["folder"]
+    assert first["codigo_zuk"] == second["codigo_zuk"] == "33734"
+    assert (first["url"], first["product_id"]) == (URL, "205544")
+    assert (second["url"], second["product_id"]) == (OTHER_URL, "205545")
+    assert len(os.listdir(base)) == 2
+
+def test_save_metadata_substitui_o_arquivo_inteiro(tmp_path):
+    folder = str(tmp_path)
+    save_metadata({"codigo_zuk": "1", "descricao": "x" * 1000}, folder)
+    save_metadata({"codigo_zuk": "1"}, folder)
+    assert read_metadata(folder) == {"codigo_zuk": "1"}
+    # O temporário é trocado pelo metadata.json, sem sobrar na pasta
+    assert os.listdir(folder) == ["metadata.json"]
@@ -0,0 +1,46 @@
+import os
+import json
+import pytest
+from property_parser import extract_endereco, parse_property_html
+
+# Páginas de imóveis salvas pela coleta (leiloes/ na raiz do repositório)
+LEILOES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "leiloes")
+
+FOLDERS = sorted(f for f in os.listdir(LEILOES_DIR)
+                 if os.path.exists(os.path.join(LEILOES_DIR, f, "pagina_imovel.html")))
+
+def read_page(folder):
+    with open(os.path.join(LEILOES_DIR, folder, "pagina_imovel.html"), "r", encoding="utf-8") as f:
+        return f.read()
+
+def read_metadata(folder):
+    with open(os.path.join(LEILOES_DIR, folder, "metadata.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_endereco_da_meta_description():
+    desc = ("Leilão de Apartamento localizado em São Paulo/SP - Rua Ribeirópolis , 532 - .Apto 12 - "
+            "Vila Independência cod: 203736")
+    assert extract_endereco(desc) == "Rua Ribeirópolis, 532"
+    # Descrição vazia ("..") e cidades com "-" no nome
+    assert extract_endereco("Leilão de Casa localizado em Embu-Guaçu/SP - Rua A, 1 - .. - Centro") == "Rua A, 1"
+    assert extract_endereco("Leilão de Casa em São Paulo") == ""
+
+@pytest.mark.parametrize("folder, codigo, endereco", [
+    ("leilao_33515_", "33515", "Rua Ribeirópolis, 532"),
+    ("leilao_33734_Avenida_Professora_Ida_Kolb_225", "33734", "Avenida Professora Ida Kolb, 225"),
+])
+def test_paginas_salvas(folder, codigo, endereco):
+    metadata = parse_property_html(read_page(folder), "https://www.portalzuk.com.br/imovel/x")
+    assert metadata["codigo_zuk"] == codigo
+    assert metadata["endereco_completo"] == endereco
+    assert metadata["total_documentos"] == len(metadata["documentos_pdf"]) >= 1
+
+@pytest.mark.parametrize("folder", FOLDERS)
+def test_paginas_salvas_coincidem_com_metadata(folder):
+    """Todas as páginas salvas têm endereço e os demais campos iguais aos do metadata.json."""
+    old = read_metadata(folder)
+    metadata = parse_property_html(read_page(folder), old["url"])
+    assert metadata["endereco_completo"]
+    for field, value in old.items():
+        if field not in ("endereco_completo", "data_extracao"):
+            assert metadata[field] == value, field